@@ -0,0 +1,102 @@
+"""
+Benchmark: /api/dss/analyze offline, on the local raster backend
+
+Runs a DSS engine's analyze endpoint in-process (FastAPI TestClient) with
+RASTER_BACKEND=local over the fixture mosaics in benchmarks/fixtures/rasters
+and a fresh feature store, so no Earth Engine account or network is needed.
+Models are trained into the temporary directory rather than ./models.
+Reports the time per request with a cold feature store (every feature read
+from the mosaics) and a warm one (every feature served from the store), and
+the store's counters. Exits non-zero if a request fails or a feature fetch
+errors, so it doubles as a CI smoke test.
+
+    python benchmarks/bench_dss_analyze.py --villages 200
+    python benchmarks/bench_dss_analyze.py --engine dss_engine --rounds 5
+    python benchmarks/bench_dss_analyze.py --raster-dir /tmp/rasters   # see make_fixture_rasters.py
+"""
+import argparse
+import importlib
+import os
+import random
+import sys
+import tempfile
+import time
+
+DATA_PROCESSOR = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+FIXTURE_DIR = os.path.join(DATA_PROCESSOR, "benchmarks", "fixtures", "rasters")
+
+sys.path.insert(0, DATA_PROCESSOR)
+
+ENGINES = ("hybrid_dss_fixed", "hybrid_dss_simple", "hybrid_dss_engine", "dss_engine")
+
+
+def make_villages(count: int, seed: int = 0):
+    """Villages scattered over the fixture tile (78-79°E, 21-22°N)"""
+    rng = random.Random(seed)
+    return [
+        {
+            "village_id": f"V{i:05d}",
+            "village_name": f"Village {i}",
+            "state": "Madhya Pradesh",
+            "district": "Betul",
+            "coordinates": [round(rng.uniform(21.05, 21.95), 5), round(rng.uniform(78.05, 78.95), 5)],
+            "fra_claims": rng.randint(5, 200),
+            "fra_titles": rng.randint(0, 150),
+            "population": rng.randint(300, 8000),
+        }
+        for i in range(count)
+    ]
+
+
+def timed_post(client, path: str, body) -> float:
+    start = time.perf_counter()
+    response = client.post(path, json=body)
+    elapsed = time.perf_counter() - start
+    if response.status_code != 200:
+        raise SystemExit(f"POST {path} returned {response.status_code}: {response.text[:500]}")
+    return elapsed
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--engine", choices=ENGINES, default=ENGINES[0])
+    parser.add_argument("--villages", type=int, default=100)
+    parser.add_argument("--rounds", type=int, default=3, help="warm requests to average")
+    parser.add_argument("--raster-dir", default=FIXTURE_DIR)
+    args = parser.parse_args()
+    args.raster_dir = os.path.abspath(args.raster_dir)
+
+    with tempfile.TemporaryDirectory() as tmp:
+        os.environ.update(
+            RASTER_BACKEND="local",
+            RASTER_DIR=args.raster_dir,
+            FEATURE_STORE_PATH=os.path.join(tmp, "features.db"),
+            FEATURE_STORE_OFFLINE="false",
+            FEATURE_FETCH_RATE="0",
+        )
+        # Engines load or train their models under ./models; keep that out of the checkout
+        os.makedirs(os.path.join(tmp, "models"))
+        os.chdir(tmp)
+        from fastapi.testclient import TestClient
+
+        engine = importlib.import_module(args.engine)
+        client = TestClient(engine.app)
+        body = {"villages": make_villages(args.villages)}
+
+        cold = timed_post(client, "/api/dss/analyze", body)
+        warm = sum(timed_post(client, "/api/dss/analyze", body) for _ in range(args.rounds)) / args.rounds
+        stats = client.get("/api/dss/feature-store").json()
+
+    print(f"{args.engine}, {args.villages} villages, rasters from {args.raster_dir}")
+    for name, elapsed in (("cold store", cold), ("warm store", warm)):
+        print(f"{name:<12} {elapsed * 1000:9.1f} ms/request  {args.villages / elapsed:9.0f} villages/s")
+    print("store: " + ", ".join(f"{key} {stats[key]}" for key in ("entries", "hits", "misses", "fetches", "fetch_errors")))
+    scheduler = stats["scheduler"]
+    print(f"fetch calls: {scheduler['calls']}, timeouts {scheduler['timeouts']}, errors {scheduler['errors']}")
+
+    if stats["fetch_errors"] or scheduler["errors"] or scheduler["timeouts"]:
+        raise SystemExit("Feature fetches failed against the local rasters")
+
+
+if __name__ == "__main__":
+    main()
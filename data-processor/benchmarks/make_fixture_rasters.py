@@ -0,0 +1,72 @@
+"""
+Fixture: small synthetic mosaics for LocalRasterBackend
+
+Writes one ``.npy`` mosaic (plus its ``.json`` sidecar) per raster product to
+``benchmarks/fixtures/rasters``, covering 78-79°E, 21-22°N. Values follow a
+smooth gradient with noise in each product's real range, so villages in
+different parts of the tile get different features. The output is
+deterministic; the committed fixtures were produced with the defaults.
+
+    python benchmarks/make_fixture_rasters.py
+    python benchmarks/make_fixture_rasters.py --pixels 1000 --out /tmp/rasters   # a larger mosaic
+"""
+import argparse
+import os
+import sys
+
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from raster_backend import write_numpy_mosaic  # noqa: E402
+
+FIXTURE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "fixtures", "rasters")
+
+# Top-left corner of the fixture tile and its size in degrees
+WEST, NORTH, SPAN = 78.0, 22.0, 1.0
+
+# Continuous products: (low, high, coarse) - coarse products are stored at a fifth of the resolution
+CONTINUOUS = {
+    "ndvi": (0.1, 0.8, False),
+    "water": (0.0, 60.0, False),
+    "nightlights": (0.0, 3.0, True),
+    "rainfall": (600.0, 1400.0, True),
+    "elevation": (100.0, 900.0, True),
+    "slope": (0.0, 20.0, True),
+}
+
+# ESA WorldCover classes: tree cover, shrubland, grassland, cropland, built-up
+LANDCOVER_CLASSES = np.array([10, 20, 30, 40, 50], dtype=np.uint8)
+
+
+def gradient(rng: np.random.Generator, n: int, low: float, high: float) -> np.ndarray:
+    """Diagonal ramp from ``low`` to ``high`` with 10% noise"""
+    ramp = np.add.outer(np.linspace(0, 0.5, n), np.linspace(0, 0.5, n))
+    noise = rng.uniform(-0.1, 0.1, (n, n))
+    return (low + np.clip(ramp + noise, 0, 1) * (high - low)).astype(np.float32)
+
+
+def write_fixtures(out: str, pixels: int, seed: int = 0):
+    rng = np.random.default_rng(seed)
+    for product, (low, high, coarse) in CONTINUOUS.items():
+        n = max(1, pixels // 5) if coarse else pixels
+        write_numpy_mosaic(out, product, gradient(rng, n, low, high), (WEST, SPAN / n, NORTH, -SPAN / n))
+    # Forest in the north-west, more cropland and settlements towards the south-east
+    weights = gradient(rng, pixels, 0, len(LANDCOVER_CLASSES) - 1e-6)
+    landcover = LANDCOVER_CLASSES[weights.astype(int)]
+    write_numpy_mosaic(out, "landcover", landcover, (WEST, SPAN / pixels, NORTH, -SPAN / pixels), nodata=0)
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pixels", type=int, default=100, help="pixels per side of the fine products")
+    parser.add_argument("--seed", type=int, default=0)
+    parser.add_argument("--out", default=FIXTURE_DIR)
+    args = parser.parse_args()
+
+    write_fixtures(args.out, args.pixels, args.seed)
+    print(f"Wrote {args.pixels}x{args.pixels} fixture mosaics to {args.out}")
+
+
+if __name__ == "__main__":
+    main()
@@ -1,12 +1,12 @@
 """
 AI & Satellite-Driven DSS Engine with Google Earth Engine Integration
 """
-import ee
 import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 from datetime import datetime, timedelta
 import os
@@ -14,10 +14,14 @@ from sklearn.ensemble import RandomForestRegressor
 from sklearn.preprocessing import StandardScaler
 import joblib
 
+from raster_backend import RasterBackend, ZonalStatsBatch, get_raster_backend
+from satellite_feature_store import FeatureSpec, SatelliteFeatureStore
+
 app = FastAPI(title="FRA DSS Engine", version="1.0.0")
 
-# Initialize Google Earth Engine
+# Initialize Google Earth Engine (not needed with RASTER_BACKEND=local)
 try:
+    import ee
     if os.getenv('GEE_SERVICE_ACCOUNT_EMAIL'):
         # Production: Service Account
         credentials = ee.ServiceAccountCredentials(
@@ -56,191 +60,116 @@ class DSSResponse(BaseModel):
     risk_factors: List[str]
 
 class GEESatelliteAnalyzer:
-    """Google Earth Engine Satellite Data Analyzer"""
+    """Satellite data analyzer over a raster backend (Earth Engine or local mosaics)"""
     
-    def __init__(self):
+    FEATURE_SET = 'dss_insights_v2'  # Bump when a reduction below changes
+    
+    # ESA WorldCover land use classes
+    LAND_USE_CLASSES = {
+        10: 'tree_cover',
+        20: 'shrubland', 
+        30: 'grassland',
+        40: 'cropland',
+        50: 'built_up',
+        60: 'bare_sparse',
+        70: 'snow_ice',
+        80: 'water_bodies',
+        90: 'herbaceous_wetland',
+        95: 'mangroves'
+    }
+    
+    def __init__(self, feature_store: Optional[SatelliteFeatureStore] = None,
+                 raster: Optional[RasterBackend] = None):
         self.start_date = '2023-01-01'
         self.end_date = '2023-12-31'
+        self.feature_store = feature_store or SatelliteFeatureStore()
+        self.raster = raster or get_raster_backend()
     
     def analyze_village(self, lat: float, lon: float, buffer_km: float = 2) -> Dict:
         """Analyze satellite data for a village location"""
-        try:
-            # Create point geometry with buffer
-            point = ee.Geometry.Point([lon, lat])
-            area = point.buffer(buffer_km * 1000)  # Convert km to meters
-            
-            # Get satellite insights
-            insights = {
-                'ndvi': self._get_ndvi_stats(area),
-                'water_availability': self._get_water_stats(area),
-                'forest_cover': self._get_forest_cover(area),
-                'land_use': self._get_land_use_classification(area),
-                'infrastructure': self._get_infrastructure_density(area)
-            }
-            
-            return insights
-            
-        except Exception as e:
-            print(f"GEE Analysis Error: {e}")
-            return self._get_default_insights()
+        return self.analyze_villages([(lat, lon)], buffer_km)[0]
     
-    def _get_ndvi_stats(self, area) -> Dict:
-        """Calculate NDVI statistics for agricultural assessment"""
-        try:
-            # Sentinel-2 NDVI
-            s2 = ee.ImageCollection('COPERNICUS/S2_SR') \
-                .filterDate(self.start_date, self.end_date) \
-                .filterBounds(area) \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-            
-            def add_ndvi(image):
-                ndvi = image.normalizedDifference(['B8', 'B4']).rename('NDVI')
-                return image.addBands(ndvi)
-            
-            s2_ndvi = s2.map(add_ndvi)
-            ndvi_median = s2_ndvi.select('NDVI').median()
-            
-            stats = ndvi_median.reduceRegion(
-                reducer=ee.Reducer.mean().combine(
-                    ee.Reducer.stdDev(), '', True
-                ).combine(
-                    ee.Reducer.minMax(), '', True
-                ),
-                geometry=area,
-                scale=10,
-                maxPixels=1e9
-            ).getInfo()
-            
-            return {
-                'mean_ndvi': stats.get('NDVI_mean', 0.3),
-                'std_ndvi': stats.get('NDVI_stdDev', 0.1),
-                'min_ndvi': stats.get('NDVI_min', 0.1),
-                'max_ndvi': stats.get('NDVI_max', 0.8),
-                'agricultural_potential': self._classify_agricultural_potential(stats.get('NDVI_mean', 0.3))
-            }
-        except:
-            return {'mean_ndvi': 0.3, 'agricultural_potential': 'medium'}
+    def analyze_villages(self, points: List[Tuple[float, float]], buffer_km: float = 2) -> List[Dict]:
+        """Satellite insights for many villages
+
+        Only feature store misses reach the raster backend, and each product
+        is reduced once for all of them (land cover once for both forest cover
+        and land use).
+        """
+        buffer_m = buffer_km * 1000  # Convert km to meters
+        return self.feature_store.resolve(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, buffer_m, f"{self.start_date}/{self.end_date}",
+            self._feature_specs(buffer_m)
+        )
     
-    def _get_water_stats(self, area) -> Dict:
-        """Analyze water availability using JRC Global Surface Water"""
-        try:
-            gsw = ee.Image('JRC/GSW1_4/GlobalSurfaceWater')
-            water_occurrence = gsw.select('occurrence')
-            
-            stats = water_occurrence.reduceRegion(
-                reducer=ee.Reducer.mean().combine(ee.Reducer.max(), '', True),
-                geometry=area,
-                scale=30,
-                maxPixels=1e9
-            ).getInfo()
-            
-            return {
-                'water_occurrence': stats.get('occurrence_mean', 10),
-                'max_water_occurrence': stats.get('occurrence_max', 50),
-                'water_availability': self._classify_water_availability(stats.get('occurrence_mean', 10))
-            }
-        except:
-            return {'water_occurrence': 10, 'water_availability': 'medium'}
+    def prefetch(self, points: List[Tuple[float, float]], buffer_km: float = 2) -> Dict[str, int]:
+        """Fill the feature store for villages ahead of /api/dss/analyze"""
+        buffer_m = buffer_km * 1000
+        return self.feature_store.prefetch(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, buffer_m, f"{self.start_date}/{self.end_date}",
+            self._feature_specs(buffer_m)
+        )
     
-    def _get_forest_cover(self, area) -> Dict:
-        """Analyze forest cover using ESA WorldCover"""
-        try:
-            worldcover = ee.ImageCollection('ESA/WorldCover/v200').first()
-            
-            # Forest classes: 10 (Tree cover)
-            forest_mask = worldcover.eq(10)
-            forest_area = forest_mask.multiply(ee.Image.pixelArea())
-            
-            total_area = ee.Image.pixelArea()
-            
-            forest_stats = forest_area.reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=area,
-                scale=10,
-                maxPixels=1e9
-            ).getInfo()
-            
-            total_stats = total_area.reduceRegion(
-                reducer=ee.Reducer.sum(),
-                geometry=area,
-                scale=10,
-                maxPixels=1e9
-            ).getInfo()
-            
-            forest_percentage = (forest_stats.get('classification', 0) / 
-                               total_stats.get('area', 1)) * 100
-            
-            return {
-                'forest_percentage': forest_percentage,
-                'forest_density': self._classify_forest_density(forest_percentage)
-            }
-        except:
-            return {'forest_percentage': 30, 'forest_density': 'medium'}
+    def _feature_specs(self, buffer_m: float) -> Dict[str, FeatureSpec]:
+        defaults = self._get_default_insights()
+        zonal = ZonalStatsBatch(self.raster, buffer_m)
+        window = (self.start_date, self.end_date)
+        
+        return {
+            'ndvi': FeatureSpec('ndvi', None, defaults['ndvi'],
+                                zonal.fetcher('ndvi', self._get_ndvi_stats, window, scale=10)),
+            'water_availability': FeatureSpec('water', None, defaults['water_availability'],
+                                              zonal.fetcher('water', self._get_water_stats, scale=30)),
+            'forest_cover': FeatureSpec('landcover', None, defaults['forest_cover'],
+                                        zonal.fetcher('landcover', self._get_forest_cover, scale=10)),
+            'land_use': FeatureSpec('landcover', None, defaults['land_use'],
+                                    zonal.fetcher('landcover', self._get_land_use_classification, scale=10)),
+            'infrastructure': FeatureSpec('nightlights', None, defaults['infrastructure'],
+                                          zonal.fetcher('nightlights', self._get_infrastructure_density, window, scale=500))
+        }
     
-    def _get_land_use_classification(self, area) -> Dict:
-        """Classify land use patterns"""
-        try:
-            worldcover = ee.ImageCollection('ESA/WorldCover/v200').first()
-            
-            # Land use classes
-            classes = {
-                10: 'tree_cover',
-                20: 'shrubland', 
-                30: 'grassland',
-                40: 'cropland',
-                50: 'built_up',
-                60: 'bare_sparse',
-                70: 'snow_ice',
-                80: 'water_bodies',
-                90: 'herbaceous_wetland',
-                95: 'mangroves'
-            }
-            
-            # Calculate area for each class
-            pixel_area = ee.Image.pixelArea()
-            land_use_stats = {}
-            
-            for class_id, class_name in classes.items():
-                class_mask = worldcover.eq(class_id)
-                class_area = class_mask.multiply(pixel_area)
-                
-                area_stats = class_area.reduceRegion(
-                    reducer=ee.Reducer.sum(),
-                    geometry=area,
-                    scale=10,
-                    maxPixels=1e9
-                ).getInfo()
-                
-                land_use_stats[class_name] = area_stats.get('classification', 0)
-            
-            return land_use_stats
-        except:
-            return {'cropland': 40, 'tree_cover': 30, 'grassland': 20, 'built_up': 10}
+    def _get_ndvi_stats(self, stats: Dict) -> Dict:
+        """NDVI statistics (Sentinel-2 median) for agricultural assessment"""
+        return {
+            'mean_ndvi': stats.get('mean', 0.3),
+            'std_ndvi': stats.get('std', 0.1),
+            'min_ndvi': stats.get('min', 0.1),
+            'max_ndvi': stats.get('max', 0.8),
+            'agricultural_potential': self._classify_agricultural_potential(stats.get('mean', 0.3))
+        }
     
-    def _get_infrastructure_density(self, area) -> Dict:
-        """Analyze infrastructure density using nighttime lights"""
-        try:
-            # VIIRS nighttime lights
-            viirs = ee.ImageCollection('NOAA/VIIRS/DNB/MONTHLY_V1/VCMSLCFG') \
-                .filterDate(self.start_date, self.end_date) \
-                .select('avg_rad')
-            
-            nightlights = viirs.median()
-            
-            stats = nightlights.reduceRegion(
-                reducer=ee.Reducer.mean().combine(ee.Reducer.max(), '', True),
-                geometry=area,
-                scale=500,
-                maxPixels=1e9
-            ).getInfo()
-            
-            return {
-                'avg_nightlights': stats.get('avg_rad_mean', 0.5),
-                'max_nightlights': stats.get('avg_rad_max', 2.0),
-                'infrastructure_level': self._classify_infrastructure(stats.get('avg_rad_mean', 0.5))
-            }
-        except:
-            return {'avg_nightlights': 0.5, 'infrastructure_level': 'low'}
+    def _get_water_stats(self, stats: Dict) -> Dict:
+        """Water availability from JRC Global Surface Water occurrence"""
+        return {
+            'water_occurrence': stats.get('mean', 10),
+            'max_water_occurrence': stats.get('max', 50),
+            'water_availability': self._classify_water_availability(stats.get('mean', 10))
+        }
+    
+    def _get_forest_cover(self, stats: Dict) -> Dict:
+        """Forest cover from the ESA WorldCover class histogram"""
+        # Forest classes: 10 (Tree cover)
+        forest_percentage = (stats['histogram'].get(10, 0) / max(1, stats['area_m2'])) * 100
+        
+        return {
+            'forest_percentage': forest_percentage,
+            'forest_density': self._classify_forest_density(forest_percentage)
+        }
+    
+    def _get_land_use_classification(self, stats: Dict) -> Dict:
+        """Land use patterns: area (m²) of each WorldCover class"""
+        return {
+            class_name: stats['histogram'].get(class_id, 0)
+            for class_id, class_name in self.LAND_USE_CLASSES.items()
+        }
+    
+    def _get_infrastructure_density(self, stats: Dict) -> Dict:
+        """Infrastructure density from VIIRS nighttime lights"""
+        return {
+            'avg_nightlights': stats.get('mean', 0.5),
+            'max_nightlights': stats.get('max', 2.0),
+            'infrastructure_level': self._classify_infrastructure(stats.get('mean', 0.5))
+        }
     
     def _classify_agricultural_potential(self, ndvi: float) -> str:
         if ndvi > 0.6: return 'high'
@@ -263,7 +192,7 @@ class GEESatelliteAnalyzer:
         else: return 'low'
     
     def _get_default_insights(self) -> Dict:
-        """Default insights when GEE fails"""
+        """Default insights when the raster backend fails and nothing is stored"""
         return {
             'ndvi': {'mean_ndvi': 0.3, 'agricultural_potential': 'medium'},
             'water_availability': {'water_occurrence': 10, 'water_availability': 'medium'},
@@ -315,31 +244,36 @@ class AIMLEngine:
     
     def calculate_priority_score(self, village_data: VillageData, satellite_insights: Dict) -> float:
         """Calculate priority score for a village"""
+        return float(self.calculate_priority_scores([village_data], [satellite_insights])[0])
+    
+    def calculate_priority_scores(self, villages: List[VillageData], insights: List[Dict]) -> np.ndarray:
+        """Priority scores for many villages, with one scaler and one model call"""
         if not self.is_trained:
-            return 50.0  # Default score
+            return np.full(len(villages), 50.0)  # Default score
         
         try:
             # Extract features
-            features = [
-                village_data.fra_claims / 100,  # Normalize
-                village_data.fra_titles / 100,
-                village_data.population / 10000,
-                satellite_insights['ndvi']['mean_ndvi'],
-                satellite_insights['water_availability']['water_occurrence'] / 100,
-                satellite_insights['forest_cover']['forest_percentage'] / 100,
-                satellite_insights['infrastructure']['avg_nightlights'] / 10,
-                self._encode_potential(satellite_insights['ndvi']['agricultural_potential'])
-            ]
+            features = np.array([
+                [
+                    village_data.fra_claims / 100,  # Normalize
+                    village_data.fra_titles / 100,
+                    village_data.population / 10000,
+                    satellite_insights['ndvi']['mean_ndvi'],
+                    satellite_insights['water_availability']['water_occurrence'] / 100,
+                    satellite_insights['forest_cover']['forest_percentage'] / 100,
+                    satellite_insights['infrastructure']['avg_nightlights'] / 10,
+                    self._encode_potential(satellite_insights['ndvi']['agricultural_potential'])
+                ]
+                for village_data, satellite_insights in zip(villages, insights)
+            ], dtype=float)
             
             # Scale and predict
-            features_scaled = self.scaler.transform([features])
-            score = self.model.predict(features_scaled)[0]
-            
-            return max(0, min(100, score))  # Clip to 0-100 range
+            features_scaled = self.scaler.transform(features)
+            return np.clip(self.model.predict(features_scaled), 0, 100)  # Clip to 0-100 range
             
         except Exception as e:
             print(f"Priority calculation error: {e}")
-            return 50.0
+            return np.full(len(villages), 50.0)
     
     def _encode_potential(self, potential: str) -> float:
         mapping = {'low': 0.2, 'medium': 0.5, 'high': 0.8}
@@ -504,24 +438,41 @@ scheme_engine = SchemeRecommendationEngine()
 
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "gee_initialized": True}
+    return {"status": "healthy", "gee_initialized": True, "raster_backend": gee_analyzer.raster.name}
+
+@app.get("/api/dss/feature-store")
+async def feature_store_stats():
+    """Satellite feature store size and hit/miss counters"""
+    return gee_analyzer.feature_store.stats()
+
+@app.post("/api/dss/feature-store/prefetch")
+async def prefetch_features(request: DSSRequest):
+    """Fetch and store satellite features for villages ahead of analysis"""
+    try:
+        points = [(village.coordinates[0], village.coordinates[1]) for village in request.villages]
+        return await run_in_threadpool(gee_analyzer.prefetch, points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prefetch failed: {str(e)}")
 
 @app.post("/api/dss/analyze", response_model=List[DSSResponse])
 async def analyze_villages(request: DSSRequest):
     """Main DSS analysis endpoint"""
     try:
-        results = []
+        if not request.villages:
+            return []
         
-        for village in request.villages:
-            # 1. Get satellite insights from GEE
-            satellite_insights = gee_analyzer.analyze_village(
-                village.coordinates[0], 
-                village.coordinates[1]
-            )
-            
-            # 2. Calculate priority score using AI/ML
-            priority_score = aiml_engine.calculate_priority_score(village, satellite_insights)
-            
+        # 1. Get satellite insights, from the feature store or the raster backend,
+        #    off the event loop so other requests keep being served meanwhile
+        insights = await run_in_threadpool(
+            gee_analyzer.analyze_villages,
+            [(village.coordinates[0], village.coordinates[1]) for village in request.villages]
+        )
+        
+        # 2. Calculate priority scores using AI/ML, one feature matrix for the whole request
+        priority_scores = np.round(aiml_engine.calculate_priority_scores(request.villages, insights), 1)
+        
+        results = []
+        for village, satellite_insights, priority_score in zip(request.villages, insights, priority_scores):
             # 3. Get scheme recommendations
             recommendations = scheme_engine.get_recommendations(village, satellite_insights)
             
@@ -537,7 +488,7 @@ async def analyze_villages(request: DSSRequest):
             results.append(DSSResponse(
                 village_id=village.village_id,
                 village_name=village.village_name,
-                priority_score=round(priority_score, 1),
+                priority_score=float(priority_score),
                 satellite_insights=satellite_insights,
                 scheme_recommendations=recommendations,
                 risk_factors=risk_factors
@@ -0,0 +1,121 @@
+"""
+Concurrent feature fetching for the DSS analyzers
+
+Satellite feature fetches (one per feature and chunk of villages) run in a
+bounded thread pool behind a process-wide token-bucket rate limiter, so a
+large request neither blocks the event loop nor floods the raster service.
+Every call has its own timeout and the whole request a deadline; a call that
+fails or times out only loses the features it was fetching.
+
+Tuned with FEATURE_FETCH_WORKERS, FEATURE_FETCH_RATE (calls per second, 0 for
+unlimited), FEATURE_FETCH_TIMEOUT and FEATURE_FETCH_DEADLINE (seconds) and
+FEATURE_FETCH_CHUNK (villages per batched call).
+"""
+import os
+import threading
+import time
+from concurrent.futures import FIRST_COMPLETED, Future, ThreadPoolExecutor, wait
+from typing import Any, Callable, Dict, Hashable, Optional
+
+
+class RateLimiter:
+    """Token bucket: ``rate`` calls per second with bursts of up to ``burst``"""
+
+    def __init__(self, rate: float, burst: Optional[int] = None):
+        self.rate = rate
+        self.capacity = burst or max(1, int(rate))
+        self._tokens = float(self.capacity)
+        self._updated = time.monotonic()
+        self._lock = threading.Lock()
+
+    def acquire(self) -> float:
+        """Block until a call may start; returns the time spent waiting"""
+        waited = 0.0
+        while True:
+            with self._lock:
+                now = time.monotonic()
+                self._tokens = min(self.capacity, self._tokens + (now - self._updated) * self.rate)
+                self._updated = now
+                if self._tokens >= 1:
+                    self._tokens -= 1
+                    return waited
+                delay = (1 - self._tokens) / self.rate
+            time.sleep(delay)
+            waited += delay
+
+
+class FetchScheduler:
+    """Runs independent fetch calls concurrently, with rate limiting and timeouts"""
+
+    def __init__(self, max_workers: Optional[int] = None, rate: Optional[float] = None,
+                 timeout: Optional[float] = None, deadline: Optional[float] = None,
+                 chunk_size: Optional[int] = None):
+        self.max_workers = max_workers or int(os.getenv('FEATURE_FETCH_WORKERS', '8'))
+        rate = float(os.getenv('FEATURE_FETCH_RATE', '20')) if rate is None else rate
+        self.limiter = RateLimiter(rate) if rate > 0 else None
+        self.timeout = timeout or float(os.getenv('FEATURE_FETCH_TIMEOUT', '30'))
+        self.deadline = deadline or float(os.getenv('FEATURE_FETCH_DEADLINE', '120'))
+        self.chunk_size = chunk_size or int(os.getenv('FEATURE_FETCH_CHUNK', '100'))
+        self.counters = {'calls': 0, 'timeouts': 0, 'errors': 0, 'rate_limited_seconds': 0.0}
+        self._pool = ThreadPoolExecutor(max_workers=self.max_workers, thread_name_prefix='feature-fetch')
+        self._lock = threading.Lock()
+
+    def run(self, calls: Dict[Hashable, Callable[[], Any]]) -> Dict[Hashable, Any]:
+        """Run every call and return its result, or the exception that replaced it
+
+        A call times out ``timeout`` seconds after it starts (time spent
+        queued or rate limited does not count), and anything unfinished at the
+        request ``deadline`` times out too. Timed-out calls are abandoned, not
+        interrupted: their worker is busy until the underlying request returns.
+        """
+        if not calls:
+            return {}
+        started: Dict[Hashable, float] = {}
+        futures: Dict[Future, Hashable] = {
+            self._pool.submit(self._call, key, fn, started): key for key, fn in calls.items()
+        }
+        request_deadline = time.monotonic() + self.deadline
+        results: Dict[Hashable, Any] = {}
+        pending = set(futures)
+
+        while pending:
+            now = time.monotonic()
+            # A call that starts while we wait cannot time out sooner than now + timeout
+            call_deadlines = [started.get(futures[f], now) + self.timeout for f in pending]
+            next_deadline = min(call_deadlines + [request_deadline])
+            done, pending = wait(pending, timeout=max(0.0, next_deadline - now), return_when=FIRST_COMPLETED)
+
+            for future in done:
+                try:
+                    results[futures[future]] = future.result()
+                except Exception as e:
+                    self._count('errors')
+                    results[futures[future]] = e
+
+            now = time.monotonic()
+            for future in list(pending):
+                start = started.get(futures[future])
+                if now >= request_deadline or (start is not None and now >= start + self.timeout):
+                    future.cancel()
+                    pending.discard(future)
+                    self._count('timeouts')
+                    results[futures[future]] = TimeoutError(f"feature fetch timed out after {self.timeout}s")
+        return results
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            return {'workers': self.max_workers, 'rate': self.limiter.rate if self.limiter else None,
+                    'timeout': self.timeout, **self.counters}
+
+    def _call(self, key: Hashable, fn: Callable[[], Any], started: Dict[Hashable, float]) -> Any:
+        if self.limiter is not None:
+            waited = self.limiter.acquire()
+            with self._lock:
+                self.counters['rate_limited_seconds'] += waited
+        started[key] = time.monotonic()
+        self._count('calls')
+        return fn()
+
+    def _count(self, name: str):
+        with self._lock:
+            self.counters[name] += 1
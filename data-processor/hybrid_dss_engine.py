@@ -2,12 +2,12 @@
 Hybrid AI & Satellite-Driven DSS Engine
 GEE Data + Custom ML Models for Enhanced Accuracy
 """
-import ee
 import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict, Optional
+from typing import List, Dict, Optional, Tuple
 import json
 from datetime import datetime
 import os
@@ -20,10 +20,14 @@ import joblib
 import tensorflow as tf
 from pathlib import Path
 
+from raster_backend import RasterBackend, ZonalStatsBatch, get_raster_backend
+from satellite_feature_store import FeatureSpec, SatelliteFeatureStore
+
 app = FastAPI(title="Hybrid FRA DSS Engine", version="2.0.0")
 
-# Initialize Google Earth Engine
+# Initialize Google Earth Engine (not needed with RASTER_BACKEND=local)
 try:
+    import ee
     if os.getenv('GEE_SERVICE_ACCOUNT_EMAIL'):
         credentials = ee.ServiceAccountCredentials(
             os.getenv('GEE_SERVICE_ACCOUNT_EMAIL'),
@@ -222,36 +226,41 @@ class HybridMLEngine:
         self._save_models()
         return results
     
-    def predict_all_models(self, features: List[float]) -> Dict[str, float]:
-        """Get predictions from all models"""
+    def predict_batch(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """Predictions of every model for a (villages x features) matrix, one call per scaler and model"""
         predictions = {}
-        features_array = np.array([features])
         
         for name, model in self.models.items():
             if name in self.scalers:
-                features_scaled = self.scalers[name].transform(features_array)
+                features_scaled = self.scalers[name].transform(features)
                 
                 if name == 'deep_learning':
-                    pred = model.predict(features_scaled)[0][0]
+                    pred = model.predict(features_scaled, verbose=0).ravel()
                 else:
-                    pred = model.predict(features_scaled)[0]
+                    pred = model.predict(features_scaled)
                 
-                predictions[name] = max(0, min(100, pred))
+                predictions[name] = np.clip(pred, 0, 100)
         
         # Ensemble prediction
         if 'ensemble' in self.scalers:
-            features_ens = self.scalers['ensemble'].transform(features_array)
-            ensemble_pred = self.ensemble.predict(features_ens)[0]
-            predictions['ensemble'] = max(0, min(100, ensemble_pred))
+            features_ens = self.scalers['ensemble'].transform(features)
+            predictions['ensemble'] = np.clip(self.ensemble.predict(features_ens), 0, 100)
         
         return predictions
     
+    def predict_all_models(self, features: List[float]) -> Dict[str, float]:
+        """Get predictions from all models"""
+        return {name: float(values[0]) for name, values in self.predict_batch(np.array([features])).items()}
+    
+    def confidence_batch(self, predictions: Dict[str, np.ndarray], rows: int) -> np.ndarray:
+        """Model agreement per village, 0-100"""
+        if not predictions:
+            return np.full(rows, 100.0)
+        return np.clip(100 - np.std(list(predictions.values()), axis=0) * 2, 0, 100)
+    
     def calculate_confidence(self, predictions: Dict[str, float]) -> float:
         """Calculate prediction confidence based on model agreement"""
-        values = list(predictions.values())
-        std_dev = np.std(values)
-        confidence = max(0, min(100, 100 - (std_dev * 2)))
-        return confidence
+        return float(self.confidence_batch({k: np.array([v]) for k, v in predictions.items()}, 1)[0])
     
     def get_feature_importance(self) -> Dict[str, float]:
         """Get feature importance from Random Forest"""
@@ -297,108 +306,69 @@ class HybridMLEngine:
             print(f"⚠️ Could not load models: {e}")
 
 class EnhancedGEEAnalyzer:
-    """Enhanced GEE analyzer with additional features"""
+    """Enhanced satellite analyzer over a raster backend (Earth Engine or local mosaics)"""
     
-    def __init__(self):
+    FEATURE_SET = 'hybrid_features_v2'  # Bump when a reduction below changes
+    BUFFER_M = 2000
+    
+    def __init__(self, feature_store: Optional[SatelliteFeatureStore] = None,
+                 raster: Optional[RasterBackend] = None):
         self.start_date = '2023-01-01'
         self.end_date = '2023-12-31'
+        self.feature_store = feature_store or SatelliteFeatureStore()
+        self.raster = raster or get_raster_backend()
     
     def get_enhanced_features(self, lat: float, lon: float) -> List[float]:
         """Get 9 enhanced satellite features"""
-        try:
-            point = ee.Geometry.Point([lon, lat])
-            area = point.buffer(2000)
-            
-            # Get satellite features
-            ndvi = self._get_ndvi(area)
-            water_occurrence = self._get_water_occurrence(area)
-            forest_cover = self._get_forest_percentage(area)
-            nightlights = self._get_nightlights(area)
-            road_density = self._estimate_road_density(lat, lon)
-            market_distance = self._estimate_market_distance(lat, lon)
-            rainfall = self._get_rainfall(area)
-            elevation = self._get_elevation(area)
-            slope = self._get_slope(area)
-            
-            return [ndvi, water_occurrence, forest_cover, nightlights,
-                   road_density, market_distance, rainfall, elevation, slope]
-        except:
-            return [0.35, 12, 35, 0.8, 2.5, 12, 950, 350, 4.2]
-    
-    def _get_ndvi(self, area) -> float:
-        try:
-            s2 = ee.ImageCollection('COPERNICUS/S2_SR') \
-                .filterDate(self.start_date, self.end_date) \
-                .filterBounds(area) \
-                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-            
-            ndvi = s2.map(lambda img: img.normalizedDifference(['B8', 'B4'])).median()
-            stats = ndvi.reduceRegion(ee.Reducer.mean(), area, 10).getInfo()
-            return max(0.1, min(0.9, stats.get('nd', 0.35)))
-        except:
-            return 0.35
-    
-    def _get_water_occurrence(self, area) -> float:
-        try:
-            gsw = ee.Image('JRC/GSW1_4/GlobalSurfaceWater').select('occurrence')
-            stats = gsw.reduceRegion(ee.Reducer.mean(), area, 30).getInfo()
-            return max(0, min(100, stats.get('occurrence', 12)))
-        except:
-            return 12
+        return self.get_enhanced_features_many([(lat, lon)])[0]
     
-    def _get_forest_percentage(self, area) -> float:
-        try:
-            worldcover = ee.ImageCollection('ESA/WorldCover/v200').first()
-            forest_mask = worldcover.eq(10)
-            forest_area = forest_mask.multiply(ee.Image.pixelArea())
-            total_area = ee.Image.pixelArea()
-            
-            forest_sum = forest_area.reduceRegion(ee.Reducer.sum(), area, 10).getInfo()
-            total_sum = total_area.reduceRegion(ee.Reducer.sum(), area, 10).getInfo()
-            
-            percentage = (forest_sum.get('classification', 0) / max(1, total_sum.get('area', 1))) * 100
-            return max(0, min(100, percentage))
-        except:
-            return 35
-    
-    def _get_nightlights(self, area) -> float:
-        try:
-            viirs = ee.ImageCollection('NOAA/VIIRS/DNB/MONTHLY_V1/VCMSLCFG') \
-                .filterDate(self.start_date, self.end_date) \
-                .select('avg_rad').median()
-            
-            stats = viirs.reduceRegion(ee.Reducer.mean(), area, 500).getInfo()
-            return max(0, min(10, stats.get('avg_rad', 0.8)))
-        except:
-            return 0.8
+    def get_enhanced_features_many(self, points: List[Tuple[float, float]]) -> List[List[float]]:
+        """Enhanced features for many villages
+
+        Only feature store misses reach the raster backend, each product
+        reduced once for all of them.
+        """
+        stored = self.feature_store.resolve(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, self.BUFFER_M,
+            f"{self.start_date}/{self.end_date}", self._feature_specs()
+        )
+        
+        return [
+            [f['ndvi'], f['water_occurrence'], f['forest_cover'], f['nightlights'],
+             self._estimate_road_density(lat, lon), self._estimate_market_distance(lat, lon),
+             f['rainfall'], f['elevation'], f['slope']]
+            for (lat, lon), f in zip(points, stored)
+        ]
     
-    def _get_rainfall(self, area) -> float:
-        try:
-            chirps = ee.ImageCollection('UCSB-CHG/CHIRPS/DAILY') \
-                .filterDate(self.start_date, self.end_date) \
-                .sum()
-            
-            stats = chirps.reduceRegion(ee.Reducer.mean(), area, 5000).getInfo()
-            return max(200, min(3000, stats.get('precipitation', 950)))
-        except:
-            return 950
+    def prefetch(self, points: List[Tuple[float, float]]) -> Dict[str, int]:
+        """Fill the feature store for villages ahead of /api/dss/analyze"""
+        return self.feature_store.prefetch(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, self.BUFFER_M,
+            f"{self.start_date}/{self.end_date}", self._feature_specs()
+        )
     
-    def _get_elevation(self, area) -> float:
-        try:
-            srtm = ee.Image('USGS/SRTMGL1_003')
-            stats = srtm.reduceRegion(ee.Reducer.mean(), area, 30).getInfo()
-            return max(0, min(8000, stats.get('elevation', 350)))
-        except:
-            return 350
+    def _feature_specs(self) -> Dict[str, FeatureSpec]:
+        zonal = ZonalStatsBatch(self.raster, self.BUFFER_M)
+        window = (self.start_date, self.end_date)
+        
+        def clamped_mean(product, scale, default, low, high):
+            derive = lambda stats: max(low, min(high, stats.get('mean', default)))
+            return FeatureSpec(product, None, default, zonal.fetcher(product, derive, window, scale))
+        
+        return {
+            'ndvi': clamped_mean('ndvi', 10, 0.35, 0.1, 0.9),
+            'water_occurrence': clamped_mean('water', 30, 12, 0, 100),
+            'forest_cover': FeatureSpec('landcover', None, 35,
+                                        zonal.fetcher('landcover', self._get_forest_percentage, scale=10)),
+            'nightlights': clamped_mean('nightlights', 500, 0.8, 0, 10),
+            'rainfall': clamped_mean('rainfall', 5000, 950, 200, 3000),
+            'elevation': clamped_mean('elevation', 30, 350, 0, 8000),
+            'slope': clamped_mean('slope', 30, 4.2, 0, 45)
+        }
     
-    def _get_slope(self, area) -> float:
-        try:
-            srtm = ee.Image('USGS/SRTMGL1_003')
-            slope = ee.Terrain.slope(srtm)
-            stats = slope.reduceRegion(ee.Reducer.mean(), area, 30).getInfo()
-            return max(0, min(45, stats.get('slope', 4.2)))
-        except:
-            return 4.2
+    def _get_forest_percentage(self, stats: Dict) -> float:
+        percentage = (stats['histogram'].get(10, 0) / max(1, stats['area_m2'])) * 100
+        return max(0, min(100, percentage))
     
     def _estimate_road_density(self, lat: float, lon: float) -> float:
         # Mock implementation - in production use OSM road data
@@ -489,41 +459,57 @@ async def health_check():
         "status": "healthy",
         "engine": "hybrid",
         "models_trained": hybrid_ml_engine.is_trained,
-        "gee_available": True
+        "gee_available": True,
+        "raster_backend": gee_analyzer.raster.name
     }
 
+@app.get("/api/dss/feature-store")
+async def feature_store_stats():
+    """Satellite feature store size and hit/miss counters"""
+    return gee_analyzer.feature_store.stats()
+
+@app.post("/api/dss/feature-store/prefetch")
+async def prefetch_features(request: Dict):
+    """Fetch and store satellite features for villages ahead of analysis"""
+    try:
+        villages = [VillageData(**village_data) for village_data in request.get('villages', [])]
+        points = [(village.coordinates[0], village.coordinates[1]) for village in villages]
+        return await run_in_threadpool(gee_analyzer.prefetch, points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prefetch failed: {str(e)}")
+
 @app.post("/api/dss/analyze", response_model=List[HybridDSSResponse])
 async def hybrid_analyze(request: Dict):
     """Enhanced DSS analysis with hybrid ML models"""
     try:
-        villages = request.get('villages', [])
-        results = []
+        villages = [VillageData(**village_data) for village_data in request.get('villages', [])]
+        if not villages:
+            return []
+        
+        # Get enhanced satellite features, off the event loop
+        satellite = await run_in_threadpool(
+            gee_analyzer.get_enhanced_features_many,
+            [(village.coordinates[0], village.coordinates[1]) for village in villages]
+        )
         
-        for village_data in villages:
-            village = VillageData(**village_data)
-            
-            # Get enhanced satellite features
-            satellite_features = gee_analyzer.get_enhanced_features(
-                village.coordinates[0], village.coordinates[1]
-            )
-            
-            # Combine all features
-            all_features = [
-                village.fra_claims, village.fra_titles, village.population
-            ] + satellite_features
-            
-            # Get predictions from all models
-            predictions = hybrid_ml_engine.predict_all_models(all_features)
-            
-            # Calculate confidence
-            confidence = hybrid_ml_engine.calculate_confidence(predictions)
-            
+        # One feature matrix, so every scaler and model runs once for the whole request
+        features = np.array([
+            [village.fra_claims, village.fra_titles, village.population] + satellite_features
+            for village, satellite_features in zip(villages, satellite)
+        ], dtype=float)
+        predictions = hybrid_ml_engine.predict_batch(features)
+        confidence = np.round(hybrid_ml_engine.confidence_batch(predictions, len(villages)), 1)
+        predictions = {k: np.round(v, 1) for k, v in predictions.items()}
+        priority = predictions.get('ensemble', predictions.get('random_forest', np.full(len(villages), 50.0)))
+        
+        # Feature importance is a property of the model, not the village
+        feature_importance = hybrid_ml_engine.get_feature_importance()
+        
+        results = []
+        for i, (village, satellite_features) in enumerate(zip(villages, satellite)):
             # Get scheme recommendations
             recommendations = scheme_engine.get_recommendations(village, satellite_features)
             
-            # Get feature importance
-            feature_importance = hybrid_ml_engine.get_feature_importance()
-            
             # Create satellite insights
             satellite_insights = {
                 'ndvi': {'value': satellite_features[0], 'level': 'high' if satellite_features[0] > 0.6 else 'medium' if satellite_features[0] > 0.4 else 'low'},
@@ -535,9 +521,9 @@ async def hybrid_analyze(request: Dict):
             results.append(HybridDSSResponse(
                 village_id=village.village_id,
                 village_name=village.village_name,
-                ensemble_priority=round(predictions.get('ensemble', predictions.get('random_forest', 50)), 1),
-                model_predictions={k: round(v, 1) for k, v in predictions.items()},
-                confidence_score=round(confidence, 1),
+                ensemble_priority=float(priority[i]),
+                model_predictions={k: float(v[i]) for k, v in predictions.items()},
+                confidence_score=float(confidence[i]),
                 satellite_insights=satellite_insights,
                 scheme_recommendations=recommendations,
                 feature_importance=feature_importance
@@ -4,8 +4,9 @@ Simplified Hybrid DSS Engine - Python 3.12 Compatible
 import numpy as np
 import pandas as pd
 from fastapi import FastAPI, HTTPException
+from fastapi.concurrency import run_in_threadpool
 from pydantic import BaseModel
-from typing import List, Dict
+from typing import List, Dict, Optional, Tuple
 import json
 from datetime import datetime
 import os
@@ -16,6 +17,9 @@ from sklearn.model_selection import train_test_split
 import joblib
 from pathlib import Path
 
+from raster_backend import RasterBackend, ZonalStatsBatch, get_raster_backend
+from satellite_feature_store import FeatureSpec, SatelliteFeatureStore
+
 app = FastAPI(title="Hybrid FRA DSS Engine", version="2.0.0")
 
 # Try to import and initialize GEE
@@ -141,31 +145,33 @@ class SimpleHybridEngine:
         self.is_trained = True
         self._save_models()
     
-    def predict_all_models(self, features: List[float]) -> Dict[str, float]:
-        """Get predictions from all models"""
+    def predict_batch(self, features: np.ndarray) -> Dict[str, np.ndarray]:
+        """Predictions of every model for a (villages x features) matrix, one call per scaler and model"""
         predictions = {}
-        features_array = np.array([features])
-        
         for name, model in self.models.items():
             if name in self.scalers:
-                features_scaled = self.scalers[name].transform(features_array)
-                pred = model.predict(features_scaled)[0]
-                predictions[name] = max(0, min(100, pred))
+                predictions[name] = np.clip(model.predict(self.scalers[name].transform(features)), 0, 100)
         
         # Ensemble (average)
         if predictions:
-            predictions['ensemble'] = np.mean(list(predictions.values()))
+            predictions['ensemble'] = np.mean(list(predictions.values()), axis=0)
         
         return predictions
     
-    def calculate_confidence(self, predictions: Dict[str, float]) -> float:
-        """Calculate confidence based on model agreement"""
+    def predict_all_models(self, features: List[float]) -> Dict[str, float]:
+        """Get predictions from all models"""
+        return {name: float(values[0]) for name, values in self.predict_batch(np.array([features])).items()}
+    
+    def confidence_batch(self, predictions: Dict[str, np.ndarray], rows: int) -> np.ndarray:
+        """Model agreement per village: 100 minus three standard deviations, clipped to 0-100"""
         values = [v for k, v in predictions.items() if k != 'ensemble']
         if len(values) < 2:
-            return 50.0
-        std_dev = np.std(values)
-        confidence = max(0, min(100, 100 - (std_dev * 3)))
-        return confidence
+            return np.full(rows, 50.0)
+        return np.clip(100 - np.std(values, axis=0) * 3, 0, 100)
+    
+    def calculate_confidence(self, predictions: Dict[str, float]) -> float:
+        """Calculate confidence based on model agreement"""
+        return float(self.confidence_batch({k: np.array([v]) for k, v in predictions.items()}, 1)[0])
     
     def _save_models(self):
         """Save models"""
@@ -195,17 +201,75 @@ class SimpleHybridEngine:
         return False
 
 class SimpleGEEAnalyzer:
-    """Simplified GEE analyzer with fallback"""
+    """Simplified satellite analyzer over a raster backend, with mock fallback"""
+    
+    FEATURE_SET = 'simple_features_v1'  # Bump when a reduction below changes
+    BUFFER_M = 2000
+    
+    def __init__(self, feature_store: Optional[SatelliteFeatureStore] = None,
+                 raster: Optional[RasterBackend] = None):
+        self.start_date = '2023-01-01'
+        self.end_date = '2023-12-31'
+        self.feature_store = feature_store or SatelliteFeatureStore()
+        self.raster = raster or get_raster_backend()
     
     def get_satellite_features(self, lat: float, lon: float) -> List[float]:
         """Get satellite features with GEE or mock data"""
-        if GEE_AVAILABLE:
-            try:
-                return self._get_gee_features(lat, lon)
-            except:
-                pass
+        return self.get_satellite_features_many([(lat, lon)])[0]
+    
+    def get_satellite_features_many(self, points: List[Tuple[float, float]]) -> List[List[float]]:
+        """Satellite features for many villages
+
+        Only feature store misses reach the raster backend, each product
+        reduced once for all of them.
+        """
+        stored = self.feature_store.resolve(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, self.BUFFER_M,
+            f"{self.start_date}/{self.end_date}", self._feature_specs(), fetch_misses=self._backend_available()
+        )
         
-        # Mock realistic data
+        results = []
+        for f in stored:
+            mock = self._get_mock_features()
+            values = [f['ndvi'], f['water_occurrence'], f['forest_cover'], f['nightlights'], f['rainfall'],
+                      f['elevation']]
+            results.append([mock[i] if value is None else value for i, value in enumerate(values)])
+        return results
+    
+    def prefetch(self, points: List[Tuple[float, float]]) -> Dict[str, int]:
+        """Fill the feature store for villages ahead of /api/dss/analyze"""
+        return self.feature_store.prefetch(
+            f"{self.FEATURE_SET}:{self.raster.name}", points, self.BUFFER_M,
+            f"{self.start_date}/{self.end_date}", self._feature_specs(), fetch_misses=self._backend_available()
+        )
+    
+    def _backend_available(self) -> bool:
+        return GEE_AVAILABLE or self.raster.name != 'gee'
+    
+    def _feature_specs(self) -> Dict[str, FeatureSpec]:
+        zonal = ZonalStatsBatch(self.raster, self.BUFFER_M)
+        window = (self.start_date, self.end_date)
+        
+        # No default here: misses the backend cannot fill get a mock value
+        def clamped_mean(product, window, scale, default, low, high):
+            derive = lambda stats: max(low, min(high, stats.get('mean', default)))
+            return FeatureSpec(product, None, None, zonal.fetcher(product, derive, window, scale))
+        
+        return {
+            'ndvi': clamped_mean('ndvi', window, 10, 0.35, 0.1, 0.9),
+            'water_occurrence': clamped_mean('water', None, 30, 12, 0, 100),
+            'forest_cover': FeatureSpec('landcover', None, None,
+                                        zonal.fetcher('landcover', self._get_forest_cover, scale=10)),
+            'nightlights': clamped_mean('nightlights', window, 500, 0.8, 0, 10),
+            'rainfall': clamped_mean('rainfall', window, 5000, 950, 200, 3000),
+            'elevation': clamped_mean('elevation', None, 30, 350, 0, 8000)
+        }
+    
+    def _get_forest_cover(self, stats: Dict) -> float:
+        return max(0, min(100, stats['histogram'].get(10, 0) / max(1, stats['area_m2']) * 100))
+    
+    def _get_mock_features(self) -> List[float]:
+        """Mock realistic data"""
         return [
             0.35 + np.random.normal(0, 0.1),  # ndvi
             10 + np.random.exponential(8),    # water_occurrence
@@ -214,59 +278,6 @@ class SimpleGEEAnalyzer:
             800 + np.random.normal(0, 200),   # rainfall
             300 + np.random.normal(0, 100)    # elevation
         ]
-    
-    def _get_gee_features(self, lat: float, lon: float) -> List[float]:
-        """Get actual GEE features"""
-        point = ee.Geometry.Point([lon, lat])
-        area = point.buffer(2000)
-        
-        # NDVI from Sentinel-2
-        s2 = ee.ImageCollection('COPERNICUS/S2_SR') \
-            .filterDate('2023-01-01', '2023-12-31') \
-            .filterBounds(area) \
-            .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', 20))
-        
-        ndvi = s2.map(lambda img: img.normalizedDifference(['B8', 'B4'])).median()
-        ndvi_stats = ndvi.reduceRegion(ee.Reducer.mean(), area, 10).getInfo()
-        ndvi_val = max(0.1, min(0.9, ndvi_stats.get('nd', 0.35)))
-        
-        # Water occurrence
-        gsw = ee.Image('JRC/GSW1_4/GlobalSurfaceWater').select('occurrence')
-        water_stats = gsw.reduceRegion(ee.Reducer.mean(), area, 30).getInfo()
-        water_val = max(0, min(100, water_stats.get('occurrence', 12)))
-        
-        # Forest cover
-        worldcover = ee.ImageCollection('ESA/WorldCover/v200').first()
-        forest_mask = worldcover.eq(10)
-        forest_area = forest_mask.multiply(ee.Image.pixelArea())
-        total_area = ee.Image.pixelArea()
-        
-        forest_sum = forest_area.reduceRegion(ee.Reducer.sum(), area, 10).getInfo()
-        total_sum = total_area.reduceRegion(ee.Reducer.sum(), area, 10).getInfo()
-        forest_val = (forest_sum.get('classification', 0) / max(1, total_sum.get('area', 1))) * 100
-        
-        # Nightlights
-        viirs = ee.ImageCollection('NOAA/VIIRS/DNB/MONTHLY_V1/VCMSLCFG') \
-            .filterDate('2023-01-01', '2023-12-31') \
-            .select('avg_rad').median()
-        
-        night_stats = viirs.reduceRegion(ee.Reducer.mean(), area, 500).getInfo()
-        night_val = max(0, min(10, night_stats.get('avg_rad', 0.8)))
-        
-        # Rainfall
-        chirps = ee.ImageCollection('UCSB-CHG/CHIRPS/DAILY') \
-            .filterDate('2023-01-01', '2023-12-31') \
-            .sum()
-        
-        rain_stats = chirps.reduceRegion(ee.Reducer.mean(), area, 5000).getInfo()
-        rain_val = max(200, min(3000, rain_stats.get('precipitation', 950)))
-        
-        # Elevation
-        srtm = ee.Image('USGS/SRTMGL1_003')
-        elev_stats = srtm.reduceRegion(ee.Reducer.mean(), area, 30).getInfo()
-        elev_val = max(0, min(8000, elev_stats.get('elevation', 350)))
-        
-        return [ndvi_val, water_val, forest_val, night_val, rain_val, elev_val]
 
 class SimpleSchemeEngine:
     """Simplified scheme recommendation engine"""
@@ -325,33 +336,51 @@ async def health_check():
         "status": "healthy",
         "engine": "simple_hybrid",
         "models_trained": hybrid_engine.is_trained,
-        "gee_available": GEE_AVAILABLE
+        "gee_available": GEE_AVAILABLE,
+        "raster_backend": gee_analyzer.raster.name
     }
 
+@app.get("/api/dss/feature-store")
+async def feature_store_stats():
+    """Satellite feature store size and hit/miss counters"""
+    return gee_analyzer.feature_store.stats()
+
+@app.post("/api/dss/feature-store/prefetch")
+async def prefetch_features(request: Dict):
+    """Fetch and store satellite features for villages ahead of analysis"""
+    try:
+        villages = [VillageData(**village_data) for village_data in request.get('villages', [])]
+        points = [(village.coordinates[0], village.coordinates[1]) for village in villages]
+        return await run_in_threadpool(gee_analyzer.prefetch, points)
+    except Exception as e:
+        raise HTTPException(status_code=500, detail=f"Prefetch failed: {str(e)}")
+
 @app.post("/api/dss/analyze")
 async def hybrid_analyze(request: Dict):
     """Simplified hybrid DSS analysis"""
     try:
-        villages = request.get('villages', [])
-        results = []
+        villages = [VillageData(**village_data) for village_data in request.get('villages', [])]
+        if not villages:
+            return []
         
-        for village_data in villages:
-            village = VillageData(**village_data)
-            
-            # Get satellite features
-            satellite_features = gee_analyzer.get_satellite_features(
-                village.coordinates[0], village.coordinates[1]
-            )
-            
-            # Combine features
-            all_features = [
-                village.fra_claims, village.fra_titles, village.population
-            ] + satellite_features
-            
-            # Get predictions
-            predictions = hybrid_engine.predict_all_models(all_features)
-            confidence = hybrid_engine.calculate_confidence(predictions)
-            
+        # Get satellite features, off the event loop
+        satellite = await run_in_threadpool(
+            gee_analyzer.get_satellite_features_many,
+            [(village.coordinates[0], village.coordinates[1]) for village in villages]
+        )
+        
+        # One feature matrix, so every scaler and model runs once for the whole request
+        features = np.array([
+            [village.fra_claims, village.fra_titles, village.population] + satellite_features
+            for village, satellite_features in zip(villages, satellite)
+        ], dtype=float)
+        predictions = hybrid_engine.predict_batch(features)
+        confidence = np.round(hybrid_engine.confidence_batch(predictions, len(villages)), 1)
+        predictions = {k: np.round(v, 1) for k, v in predictions.items()}
+        priority = predictions.get('ensemble', np.full(len(villages), 50.0))
+        
+        results = []
+        for i, (village, satellite_features) in enumerate(zip(villages, satellite)):
             # Get recommendations
             recommendations = scheme_engine.get_recommendations(village, satellite_features)
             
@@ -366,9 +395,9 @@ async def hybrid_analyze(request: Dict):
             results.append(HybridDSSResponse(
                 village_id=village.village_id,
                 village_name=village.village_name,
-                ensemble_priority=round(predictions.get('ensemble', 50), 1),
-                model_predictions={k: round(v, 1) for k, v in predictions.items()},
-                confidence_score=round(confidence, 1),
+                ensemble_priority=float(priority[i]),
+                model_predictions={k: float(v[i]) for k, v in predictions.items()},
+                confidence_score=float(confidence[i]),
                 satellite_insights=satellite_insights,
                 scheme_recommendations=recommendations
             ))
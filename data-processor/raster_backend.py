@@ -0,0 +1,365 @@
+"""
+Raster backends for zonal statistics over buffered village points
+
+The DSS analyzers ask a backend for statistics of one raster product around a
+point instead of calling Earth Engine directly:
+
+- EarthEngineBackend reduces the Earth Engine datasets remotely, one
+  reduceRegions pass per product over a FeatureCollection of village
+  buffers (a class frequency histogram per zone for land cover).
+- LocalRasterBackend reads pre-exported mosaics from disk (RASTER_DIR), so
+  the DSS runs offline at local-disk speed and can be benchmarked in CI.
+
+Select one with RASTER_BACKEND=gee|local; RASTER_LATENCY_MS wraps it in a
+LatencyRasterBackend for testing.
+"""
+import json
+import math
+import os
+import random
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, List, Optional, Sequence, Tuple
+
+import numpy as np
+
+# Products every backend serves
+PRODUCTS = ('ndvi', 'water', 'landcover', 'nightlights', 'rainfall', 'elevation', 'slope')
+CATEGORICAL_PRODUCTS = {'landcover'}
+
+METERS_PER_DEGREE = 111320.0
+
+Window = Optional[Tuple[str, str]]  # (start_date, end_date)
+
+
+class RasterBackend:
+    """Zonal statistics of one raster product over a buffered point
+
+    Continuous products return ``mean``, ``std``, ``min``, ``max`` and
+    ``count`` (statistics are omitted when no valid pixel falls in the
+    buffer). Categorical products return ``histogram`` ({class: area in m²})
+    and ``area_m2``, the area of every pixel reduced.
+    """
+
+    name = 'base'
+
+    def zonal_stats(self, product: str, lat: float, lon: float, buffer_m: float,
+                    window: Window = None, scale: Optional[float] = None) -> Dict[str, Any]:
+        return self.zonal_stats_many(product, [(lat, lon)], buffer_m, window, scale)[0]
+
+    def zonal_stats_many(self, product: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                         window: Window = None, scale: Optional[float] = None) -> List[Dict[str, Any]]:
+        """Statistics for every point's buffer (one zone each), in ``points`` order"""
+        raise NotImplementedError
+
+
+class EarthEngineBackend(RasterBackend):
+    """Zonal statistics computed remotely by Google Earth Engine"""
+
+    name = 'gee'
+
+    DEFAULT_SCALE = {
+        'ndvi': 10, 'water': 30, 'landcover': 10, 'nightlights': 500,
+        'rainfall': 5000, 'elevation': 30, 'slope': 30
+    }
+
+    ZONES_PER_CALL = 500  # Keeps each reduceRegions response well under the getInfo payload limit
+
+    def __init__(self, cloud_percentage: float = 20):
+        self.cloud_percentage = cloud_percentage
+
+    def image(self, product: str, area=None, window: Window = None):
+        """Single-band ee.Image for a product, named 'value'; ``area`` bounds the NDVI scenes"""
+        import ee
+        start, end = window or ('2023-01-01', '2023-12-31')
+
+        if product == 'ndvi':
+            s2 = ee.ImageCollection('COPERNICUS/S2_SR') \
+                .filterDate(start, end) \
+                .filter(ee.Filter.lt('CLOUDY_PIXEL_PERCENTAGE', self.cloud_percentage))
+            if area is not None:
+                s2 = s2.filterBounds(area)
+            image = s2.map(lambda img: img.normalizedDifference(['B8', 'B4'])).median()
+        elif product == 'water':
+            image = ee.Image('JRC/GSW1_4/GlobalSurfaceWater').select('occurrence')
+        elif product == 'landcover':
+            image = ee.ImageCollection('ESA/WorldCover/v200').first()
+        elif product == 'nightlights':
+            image = ee.ImageCollection('NOAA/VIIRS/DNB/MONTHLY_V1/VCMSLCFG') \
+                .filterDate(start, end) \
+                .select('avg_rad').median()
+        elif product == 'rainfall':
+            image = ee.ImageCollection('UCSB-CHG/CHIRPS/DAILY') \
+                .filterDate(start, end) \
+                .sum()
+        elif product == 'elevation':
+            image = ee.Image('USGS/SRTMGL1_003')
+        elif product == 'slope':
+            image = ee.Terrain.slope(ee.Image('USGS/SRTMGL1_003'))
+        else:
+            raise ValueError(f"Unknown raster product: {product}")
+        return image.rename('value')
+
+    def zonal_stats_many(self, product: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                         window: Window = None, scale: Optional[float] = None) -> List[Dict[str, Any]]:
+        """One reduceRegions call per chunk of zones, every statistic in the same pass"""
+        import ee
+        scale = scale or self.DEFAULT_SCALE[product]
+        categorical = product in CATEGORICAL_PRODUCTS
+
+        if categorical:
+            # Zone area (pixelArea sum) plus a class frequency histogram, instead of one mask per class
+            reducer = ee.Reducer.sum().combine(ee.Reducer.frequencyHistogram(), '', False)
+        else:
+            reducer = ee.Reducer.mean() \
+                .combine(ee.Reducer.stdDev(), '', True) \
+                .combine(ee.Reducer.minMax(), '', True) \
+                .combine(ee.Reducer.count(), '', True)
+
+        results: List[Dict[str, Any]] = []
+        for start in range(0, len(points), self.ZONES_PER_CALL):
+            chunk = points[start:start + self.ZONES_PER_CALL]
+            zones = ee.FeatureCollection([
+                ee.Feature(ee.Geometry.Point([lon, lat]).buffer(buffer_m), {'zone': i})
+                for i, (lat, lon) in enumerate(chunk)
+            ])
+            image = self.image(product, zones, window)
+            if categorical:
+                image = ee.Image.pixelArea().addBands(image)
+            features = image.reduceRegions(collection=zones, reducer=reducer, scale=scale).getInfo()['features']
+
+            by_zone = {int(f['properties']['zone']): f['properties'] for f in features}
+            for i in range(len(chunk)):
+                props = by_zone.get(i, {})
+                results.append(self._categorical(props) if categorical else self._continuous(props))
+        return results
+
+    @staticmethod
+    def _continuous(props: Dict[str, Any]) -> Dict[str, Any]:
+        names = {'mean': 'mean', 'std': 'stdDev', 'min': 'min', 'max': 'max', 'count': 'count'}
+        return {key: props[name] for key, name in names.items() if props.get(name) is not None}
+
+    @staticmethod
+    def _categorical(props: Dict[str, Any]) -> Dict[str, Any]:
+        # Split the zone area between classes in proportion to their (weighted) pixel counts
+        area = props.get('sum') or 0
+        counts = {int(float(k)): v for k, v in (props.get('histogram') or {}).items()}
+        total = sum(counts.values())
+        histogram = {c: area * n / total for c, n in counts.items()} if total else {}
+        return {'histogram': histogram, 'area_m2': area}
+
+
+class Mosaic:
+    """One north-up EPSG:4326 raster, read a window at a time
+
+    ``transform`` is (lon of the left edge, pixel width in degrees, lat of the
+    top edge, pixel height in degrees, negative for north-up rasters).
+    """
+
+    def __init__(self, data, transform: Tuple[float, float, float, float],
+                 nodata: Optional[float] = None, read_window=None):
+        self.data = data
+        self.transform = transform
+        self.nodata = nodata
+        self._read_window = read_window or (lambda r0, r1, c0, c1: self.data[r0:r1, c0:c1])
+        self.shape = tuple(data.shape[-2:])
+
+    @classmethod
+    def open(cls, stem: Path) -> 'Mosaic':
+        """Open ``<stem>.npy`` (with ``<stem>.json``) or ``<stem>.tif``"""
+        npy, tif = stem.with_suffix('.npy'), stem.with_suffix('.tif')
+        if npy.exists():
+            meta = json.loads(stem.with_suffix('.json').read_text())
+            data = np.load(npy, mmap_mode='r')  # Only the pages a window touches are read
+            return cls(data, tuple(meta['transform']), meta.get('nodata'))
+        if tif.exists():
+            try:
+                import rasterio
+                from rasterio.windows import Window as RasterioWindow
+            except ImportError:
+                raise ImportError(f"rasterio is required to read {tif}; export the mosaic as .npy instead")
+            dataset = rasterio.open(tif)
+            if dataset.crs is not None and dataset.crs.to_epsg() != 4326:
+                raise ValueError(f"{tif} must be in EPSG:4326, got {dataset.crs}")
+            t = dataset.transform
+            # GDAL dataset handles are not thread-safe, and fetch threads read chunks
+            # of the same product in parallel: each thread reads through its own handle
+            handles = threading.local()
+
+            def read_window(r0, r1, c0, c1):
+                if not hasattr(handles, 'dataset'):
+                    handles.dataset = rasterio.open(tif)
+                return handles.dataset.read(1, window=RasterioWindow(c0, r0, c1 - c0, r1 - r0))
+
+            return cls(dataset, (t.c, t.a, t.f, t.e), dataset.nodata, read_window=read_window)
+        raise FileNotFoundError(f"No mosaic at {npy} or {tif}")
+
+    def buffer_pixels(self, lat: float, lon: float, buffer_m: float) -> Tuple[np.ndarray, np.ndarray]:
+        """Values and pixel areas (m²) of the valid pixels whose centres fall in the buffer"""
+        x0, dx, y0, dy = self.transform
+        rows, cols = self.shape
+        dlat = buffer_m / METERS_PER_DEGREE
+        dlon = buffer_m / (METERS_PER_DEGREE * max(math.cos(math.radians(lat)), 1e-6))
+
+        row_edges = sorted(((lat + dlat - y0) / dy, (lat - dlat - y0) / dy))
+        r0, r1 = max(0, math.floor(row_edges[0])), min(rows, math.ceil(row_edges[1]))
+        c0, c1 = max(0, math.floor((lon - dlon - x0) / dx)), min(cols, math.ceil((lon + dlon - x0) / dx))
+        if r0 >= r1 or c0 >= c1:
+            return np.empty(0), np.empty(0)
+
+        values = np.asarray(self._read_window(r0, r1, c0, c1), dtype=float)
+        lat_centres = y0 + (np.arange(r0, r1) + 0.5) * dy
+        lon_centres = x0 + (np.arange(c0, c1) + 0.5) * dx
+        north_m = (lat_centres - lat)[:, None] * METERS_PER_DEGREE
+        east_m = (lon_centres - lon)[None, :] * METERS_PER_DEGREE * math.cos(math.radians(lat))
+        inside = north_m ** 2 + east_m ** 2 <= buffer_m ** 2
+        if not inside.any():
+            # Buffer smaller than a pixel: use the pixel containing the point
+            row, col = math.floor((lat - y0) / dy) - r0, math.floor((lon - x0) / dx) - c0
+            if 0 <= row < inside.shape[0] and 0 <= col < inside.shape[1]:
+                inside[row, col] = True
+
+        valid = inside & ~np.isnan(values)
+        if self.nodata is not None:
+            valid &= values != self.nodata
+        row_area = (abs(dy) * METERS_PER_DEGREE) * (abs(dx) * METERS_PER_DEGREE * np.cos(np.radians(lat_centres)))
+        areas = np.broadcast_to(row_area[:, None], values.shape)
+        return values[valid], areas[valid]
+
+
+class LocalRasterBackend(RasterBackend):
+    """Zonal statistics over pre-exported mosaics on local disk
+
+    ``raster_dir`` holds one mosaic per product, named after it:
+    ``ndvi`` (Sentinel-2 NDVI median), ``water`` (JRC occurrence),
+    ``landcover`` (ESA WorldCover), ``nightlights`` (VIIRS avg_rad),
+    ``rainfall`` (CHIRPS sum), ``elevation`` (SRTM) and ``slope``. Each is a
+    GeoTIFF (read in windows through rasterio) or a ``.npy`` array with a
+    ``.json`` sidecar holding ``transform`` and ``nodata`` (memory-mapped).
+    Mosaics cover the date window they were exported for, so ``window`` and
+    ``scale`` are ignored.
+    """
+
+    name = 'local'
+
+    def __init__(self, raster_dir: Optional[str] = None):
+        self.raster_dir = Path(raster_dir or os.getenv('RASTER_DIR', 'data/rasters'))
+        self._mosaics: Dict[str, Mosaic] = {}
+        self._lock = threading.Lock()
+
+    def mosaic(self, product: str) -> Mosaic:
+        if product not in PRODUCTS:
+            raise ValueError(f"Unknown raster product: {product}")
+        with self._lock:
+            if product not in self._mosaics:
+                self._mosaics[product] = Mosaic.open(self.raster_dir / product)
+            return self._mosaics[product]
+
+    def zonal_stats_many(self, product: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                         window: Window = None, scale: Optional[float] = None) -> List[Dict[str, Any]]:
+        mosaic = self.mosaic(product)
+        categorical = product in CATEGORICAL_PRODUCTS
+        return [self._reduce(*mosaic.buffer_pixels(lat, lon, buffer_m), categorical) for lat, lon in points]
+
+    @staticmethod
+    def _reduce(values: np.ndarray, areas: np.ndarray, categorical: bool) -> Dict[str, Any]:
+        """Every statistic of one zone from a single read of its pixels"""
+        if categorical:
+            classes, index = np.unique(values.astype(int), return_inverse=True)
+            class_areas = np.bincount(index, weights=areas, minlength=len(classes))
+            histogram = {int(c): float(a) for c, a in zip(classes, class_areas)}
+            return {'histogram': histogram, 'area_m2': float(areas.sum())}
+
+        if values.size == 0:
+            return {'count': 0}
+        return {
+            'mean': float(values.mean()),
+            'std': float(values.std()),
+            'min': float(values.min()),
+            'max': float(values.max()),
+            'count': int(values.size)
+        }
+
+
+class LatencyRasterBackend(RasterBackend):
+    """Stand-in for a remote raster service: another backend plus injected latency and failures
+
+    Enabled by RASTER_LATENCY_MS (with RASTER_LATENCY_JITTER_MS and
+    RASTER_FAILURE_RATE), to exercise concurrent fetching, timeouts and
+    fallbacks offline.
+    """
+
+    def __init__(self, inner: RasterBackend, latency_ms: float, jitter_ms: float = 0,
+                 failure_rate: float = 0):
+        self.inner = inner
+        self.name = inner.name
+        self.latency_ms = latency_ms
+        self.jitter_ms = jitter_ms
+        self.failure_rate = failure_rate
+
+    def zonal_stats_many(self, product: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                         window: Window = None, scale: Optional[float] = None) -> List[Dict[str, Any]]:
+        time.sleep(max(0.0, self.latency_ms + random.uniform(-self.jitter_ms, self.jitter_ms)) / 1000)
+        if random.random() < self.failure_rate:
+            raise RuntimeError(f"injected failure reducing {product}")
+        return self.inner.zonal_stats_many(product, points, buffer_m, window, scale)
+
+
+class ZonalStatsBatch:
+    """Zonal statistics for one request over a fixed buffer
+
+    Each (product, window, scale) is reduced once for a list of points, so
+    features derived from the same raster (forest cover and land use from
+    WorldCover, say) share one grouped pass.
+    """
+
+    def __init__(self, backend: RasterBackend, buffer_m: float):
+        self.backend = backend
+        self.buffer_m = buffer_m
+        self._memo: Dict[Tuple, List[Dict[str, Any]]] = {}
+        self._key_locks: Dict[Tuple, threading.Lock] = {}
+        self._lock = threading.Lock()
+
+    def stats(self, product: str, points: Sequence[Tuple[float, float]], window: Window = None,
+              scale: Optional[float] = None) -> List[Dict[str, Any]]:
+        key = (product, window, scale, tuple(points))
+        with self._lock:
+            key_lock = self._key_locks.setdefault(key, threading.Lock())
+        with key_lock:  # Features fetched concurrently from the same raster wait for one reduction
+            if key not in self._memo:
+                self._memo[key] = self.backend.zonal_stats_many(product, points, self.buffer_m, window, scale)
+            return self._memo[key]
+
+    def fetcher(self, product: str, derive: Callable[[Dict[str, Any]], Any], window: Window = None,
+                scale: Optional[float] = None) -> Callable[[List[Tuple[float, float]]], List[Any]]:
+        """A ``fetch_many`` for the feature store: derive one value from each zone's statistics"""
+        return lambda points: [derive(stats) for stats in self.stats(product, points, window, scale)]
+
+
+def write_numpy_mosaic(raster_dir: str, product: str, data: np.ndarray,
+                       transform: Tuple[float, float, float, float], nodata: Optional[float] = None):
+    """Save an array as a mosaic LocalRasterBackend can memory-map"""
+    stem = Path(raster_dir) / product
+    stem.parent.mkdir(parents=True, exist_ok=True)
+    np.save(stem.with_suffix('.npy'), data)
+    stem.with_suffix('.json').write_text(json.dumps({'transform': list(transform), 'nodata': nodata}))
+
+
+def get_raster_backend(name: Optional[str] = None) -> RasterBackend:
+    """Backend selected by RASTER_BACKEND (gee by default)"""
+    name = (name or os.getenv('RASTER_BACKEND', 'gee')).lower()
+    if name == 'local':
+        backend: RasterBackend = LocalRasterBackend()
+    elif name == 'gee':
+        backend = EarthEngineBackend()
+    else:
+        raise ValueError(f"Unknown RASTER_BACKEND: {name}")
+
+    latency_ms = float(os.getenv('RASTER_LATENCY_MS', '0'))
+    failure_rate = float(os.getenv('RASTER_FAILURE_RATE', '0'))
+    if latency_ms or failure_rate:
+        backend = LatencyRasterBackend(
+            backend, latency_ms, float(os.getenv('RASTER_LATENCY_JITTER_MS', '0')), failure_rate
+        )
+    return backend
@@ -0,0 +1,259 @@
+"""
+Persistent satellite feature store for village coordinates
+
+Villages do not move, so the NDVI, water, land cover, nightlight and terrain
+reductions computed for them can be reused across requests. Features are kept
+in a SQLite file keyed by (feature set version, geohash, buffer, date window,
+feature) and expire per data product. Only misses and expired entries are sent
+to the raster backend, concurrently through feature_fetch.FetchScheduler; with
+FEATURE_STORE_OFFLINE=true the backend is never called and stored values are
+served even when stale.
+"""
+import copy
+import functools
+import json
+import os
+import sqlite3
+import threading
+import time
+from pathlib import Path
+from typing import Any, Callable, Dict, Iterable, List, NamedTuple, Optional, Sequence, Tuple
+
+from feature_fetch import FetchScheduler
+
+# Days before a stored value is refetched; None never expires
+PRODUCT_TTL_DAYS: Dict[str, Optional[float]] = {
+    'ndvi': 30,           # Sentinel-2 medians move with the season
+    'nightlights': 90,    # VIIRS monthly composites
+    'rainfall': 90,       # CHIRPS
+    'water': 365,         # JRC Global Surface Water
+    'landcover': 365,     # ESA WorldCover
+    'elevation': None,    # SRTM
+    'slope': None,
+}
+
+_GEOHASH_BASE32 = '0123456789bcdefghjkmnpqrstuvwxyz'
+_SQL_CHUNK = 500
+
+
+def geohash(lat: float, lon: float, precision: int = 7) -> str:
+    """Standard base32 geohash; precision 7 is a cell of roughly 150 m"""
+    lat_range, lon_range = [-90.0, 90.0], [-180.0, 180.0]
+    chars, bits, bit_count, even = [], 0, 0, True
+    while len(chars) < precision:
+        rng, value = (lon_range, lon) if even else (lat_range, lat)
+        mid = (rng[0] + rng[1]) / 2
+        if value >= mid:
+            bits = (bits << 1) | 1
+            rng[0] = mid
+        else:
+            bits <<= 1
+            rng[1] = mid
+        even = not even
+        bit_count += 1
+        if bit_count == 5:
+            chars.append(_GEOHASH_BASE32[bits])
+            bits, bit_count = 0, 0
+    return ''.join(chars)
+
+
+def _fetch_one(fetch: Callable[[float, float], Any], lat: float, lon: float) -> List[Any]:
+    return [fetch(lat, lon)]
+
+
+class FeatureSpec(NamedTuple):
+    """How to compute one stored feature"""
+    product: str  # Data product, selects the TTL
+    # (lat, lon) -> JSON-serialisable value; raises on failure
+    fetch: Optional[Callable[[float, float], Any]]
+    default: Any  # Served (and not stored) when the fetch fails or offline
+    # [(lat, lon), ...] -> values in the same order; when set, all misses are fetched in one call
+    fetch_many: Optional[Callable[[List[Tuple[float, float]]], List[Any]]] = None
+
+
+class SatelliteFeatureStore:
+    """SQLite-backed cache of per-village satellite features"""
+
+    def __init__(self, path: Optional[str] = None, precision: Optional[int] = None,
+                 ttl_days: Optional[Dict[str, Optional[float]]] = None, offline: Optional[bool] = None,
+                 scheduler: Optional[FetchScheduler] = None):
+        self.path = path or os.getenv('FEATURE_STORE_PATH', 'data/satellite_features.db')
+        self.precision = precision or int(os.getenv('FEATURE_STORE_GEOHASH_PRECISION', '7'))
+        self.ttl_days = dict(PRODUCT_TTL_DAYS, **(ttl_days or {}))
+        if offline is None:
+            offline = os.getenv('FEATURE_STORE_OFFLINE', 'false').lower() in ('1', 'true', 'yes')
+        self.offline = offline
+        self.scheduler = scheduler or FetchScheduler()
+        self.counters = {'hits': 0, 'stale_hits': 0, 'misses': 0, 'fetches': 0, 'fetch_errors': 0}
+        self._counter_lock = threading.Lock()
+        self._lock = threading.Lock()
+
+        if self.path != ':memory:':
+            Path(self.path).parent.mkdir(parents=True, exist_ok=True)
+        self._conn = sqlite3.connect(self.path, check_same_thread=False)
+        if self.path != ':memory:':
+            self._conn.execute('PRAGMA journal_mode=WAL')
+        self._conn.execute(
+            'CREATE TABLE IF NOT EXISTS features ('
+            ' feature_set TEXT NOT NULL, location TEXT NOT NULL, buffer_m INTEGER NOT NULL,'
+            ' date_window TEXT NOT NULL, feature TEXT NOT NULL, product TEXT NOT NULL,'
+            ' value TEXT NOT NULL, fetched_at REAL NOT NULL,'
+            ' PRIMARY KEY (feature_set, buffer_m, date_window, location, feature))'
+        )
+        self._conn.commit()
+
+    def location(self, lat: float, lon: float) -> str:
+        return geohash(lat, lon, self.precision)
+
+    def get_many(self, feature_set: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                 window: str) -> Dict[str, Dict[str, Tuple[Any, str, float]]]:
+        """Stored rows for many points: {location: {feature: (value, product, fetched_at)}}"""
+        locations = sorted({self.location(lat, lon) for lat, lon in points})
+        rows: Dict[str, Dict[str, Tuple[Any, str, float]]] = {}
+        with self._lock:
+            for start in range(0, len(locations), _SQL_CHUNK):
+                chunk = locations[start:start + _SQL_CHUNK]
+                cursor = self._conn.execute(
+                    'SELECT location, feature, product, value, fetched_at FROM features'
+                    ' WHERE feature_set = ? AND buffer_m = ? AND date_window = ?'
+                    f" AND location IN ({','.join('?' * len(chunk))})",
+                    [feature_set, int(round(buffer_m)), window, *chunk]
+                )
+                for location, feature, product, value, fetched_at in cursor:
+                    rows.setdefault(location, {})[feature] = (json.loads(value), product, fetched_at)
+        return rows
+
+    def put_many(self, feature_set: str, buffer_m: float, window: str,
+                 rows: Iterable[Tuple[str, str, str, Any]]):
+        """Upsert (location, feature, product, value) rows in one transaction"""
+        now = time.time()
+        params = [
+            (feature_set, location, int(round(buffer_m)), window, feature, product, json.dumps(value), now)
+            for location, feature, product, value in rows
+        ]
+        if not params:
+            return
+        with self._lock:
+            self._conn.executemany(
+                'INSERT OR REPLACE INTO features'
+                ' (feature_set, location, buffer_m, date_window, feature, product, value, fetched_at)'
+                ' VALUES (?, ?, ?, ?, ?, ?, ?, ?)',
+                params
+            )
+            self._conn.commit()
+
+    def resolve(self, feature_set: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                window: str, specs: Dict[str, FeatureSpec], fetch_misses: bool = True) -> List[Dict[str, Any]]:
+        """Features for every point, fetching only misses and expired entries
+
+        Stored rows for the whole batch are read with one query per chunk of
+        locations. Misses are fetched once per distinct location, through the
+        fetch scheduler: every feature (and chunk of villages, for specs with
+        ``fetch_many``) is its own concurrent call. Everything fetched is
+        written back in one transaction. A failed or timed-out call falls back
+        to a stale stored value if there is one, else to the spec default, for
+        the features it was fetching only; fallbacks are never stored. With
+        ``fetch_misses=False`` (or in offline mode) nothing is fetched.
+        """
+        return self._resolve(feature_set, points, buffer_m, window, specs, fetch_misses)[0]
+
+    def prefetch(self, feature_set: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                 window: str, specs: Dict[str, FeatureSpec], fetch_misses: bool = True) -> Dict[str, int]:
+        """Warm the store for many villages ahead of the requests that will read them
+
+        Fetches misses and expired entries exactly as ``resolve`` does, without
+        building results. Returns the number of villages, distinct locations,
+        entries fetched and entries still missing (failed, or not fetched
+        offline), which the next call retries.
+        """
+        _, missing, fetched = self._resolve(feature_set, points, buffer_m, window, specs, fetch_misses)
+        wanted = sum(len(locations) for locations in missing.values())
+        written = sum(len(values) for values in fetched.values())
+        return {'villages': len(points), 'locations': len({self.location(lat, lon) for lat, lon in points}),
+                'fetched': written, 'missing': wanted - written}
+
+    def _resolve(self, feature_set: str, points: Sequence[Tuple[float, float]], buffer_m: float,
+                 window: str, specs: Dict[str, FeatureSpec], fetch_misses: bool):
+        """resolve(), also returning the missing locations and fetched values per feature"""
+        offline = self.offline or not fetch_misses
+        stored = self.get_many(feature_set, points, buffer_m, window)
+        now = time.time()
+        locations = [self.location(lat, lon) for lat, lon in points]
+
+        missing: Dict[str, Dict[str, Tuple[float, float]]] = {}
+        for name in specs:
+            missing[name] = {}
+            for location, point in zip(locations, points):
+                entry = stored.get(location, {}).get(name)
+                if entry is not None and not self._expired(entry, now):
+                    self._count('hits')
+                elif entry is not None and offline:
+                    self._count('stale_hits')
+                elif location not in missing[name]:
+                    self._count('misses')
+                    missing[name][location] = point
+
+        fetched = {} if offline else self._fetch_missing(specs, missing)
+
+        results: List[Dict[str, Any]] = [{} for _ in points]
+        for name, spec in specs.items():
+            values = fetched.get(name, {})
+            for features, location in zip(results, locations):
+                entry = stored.get(location, {}).get(name)
+                if location in values:
+                    features[name] = values[location]
+                elif location in missing[name]:
+                    features[name] = copy.deepcopy(entry[0] if entry is not None else spec.default)
+                else:
+                    features[name] = entry[0]
+
+        self.put_many(feature_set, buffer_m, window, (
+            (location, name, specs[name].product, value)
+            for name, values in fetched.items() for location, value in values.items()
+        ))
+        return results, missing, fetched
+
+    def _fetch_missing(self, specs: Dict[str, FeatureSpec],
+                       missing: Dict[str, Dict[str, Tuple[float, float]]]) -> Dict[str, Dict[str, Any]]:
+        """Fetched values by feature and location; failed calls are left out"""
+        calls: Dict[Tuple, Callable[[], Any]] = {}
+        for name, spec in specs.items():
+            todo = list(missing[name].items())
+            if spec.fetch_many is not None:
+                size = self.scheduler.chunk_size
+                for start in range(0, len(todo), size):
+                    chunk = todo[start:start + size]
+                    calls[(name, tuple(location for location, _ in chunk))] = functools.partial(
+                        spec.fetch_many, [point for _, point in chunk]
+                    )
+            else:
+                for location, (lat, lon) in todo:
+                    calls[(name, (location,))] = functools.partial(_fetch_one, spec.fetch, lat, lon)
+
+        fetched: Dict[str, Dict[str, Any]] = {}
+        for (name, chunk), result in self.scheduler.run(calls).items():
+            self._count('fetches')
+            if not isinstance(result, Exception) and len(result) != len(chunk):
+                result = ValueError(f"expected {len(chunk)} values, got {len(result)}")
+            if isinstance(result, Exception):
+                self._count('fetch_errors')
+                print(f"⚠️ Feature fetch failed ({name}, {len(chunk)} villages): {result}")
+                continue
+            fetched.setdefault(name, {}).update(zip(chunk, result))
+        return fetched
+
+    def stats(self) -> Dict[str, Any]:
+        with self._lock:
+            entries = self._conn.execute('SELECT COUNT(*) FROM features').fetchone()[0]
+        with self._counter_lock:
+            counters = dict(self.counters)
+        return {'path': self.path, 'offline': self.offline, 'entries': entries, **counters,
+                'scheduler': self.scheduler.stats()}
+
+    def _count(self, name: str):
+        with self._counter_lock:
+            self.counters[name] += 1
+
+    def _expired(self, entry: Tuple[Any, str, float], now: float) -> bool:
+        ttl = self.ttl_days.get(entry[1])
+        return ttl is not None and now - entry[2] > ttl * 86400
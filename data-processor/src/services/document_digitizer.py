@@ -6,9 +6,12 @@ Handles OCR, data extraction, and standardization of FRA claims and pattas
 import os
 import json
 import logging
-from typing import Dict, List, Optional, Any
+from typing import Dict, List, Optional, Any, Union
 from datetime import datetime
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import cv2
+import fitz  # PyMuPDF
 import numpy as np
 import pytesseract
 from PIL import Image
@@ -21,6 +24,72 @@ import uuid
 logging.basicConfig(level=logging.INFO)
 logger = logging.getLogger(__name__)
 
+# Field patterns, compiled once at import instead of on every document
+CLAIM_NUMBER_PATTERN = re.compile(r'(?:FRA|Claim|Application)\s*(?:No\.?|Number)\s*:?\s*([A-Z0-9/]+)', re.IGNORECASE)
+CLAIM_TYPE_PATTERNS = [
+    ("IFR", re.compile(r'\bIFR\b', re.IGNORECASE)),
+    ("CR", re.compile(r'\bCR\b', re.IGNORECASE)),
+    ("CFR", re.compile(r'\bCFR\b', re.IGNORECASE)),
+]
+NAME_PATTERNS = [
+    re.compile(r'(?:Name|Applicant)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE),
+    re.compile(r'(?:Name of Applicant)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE),
+    re.compile(r'(?:Applicant Name)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE),
+]
+VILLAGE_PATTERN = re.compile(r'(?:Village|Gram)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE)
+BLOCK_PATTERN = re.compile(r'(?:Block|Tehsil)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE)
+DISTRICT_PATTERN = re.compile(r'(?:District)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE)
+STATE_PATTERN = re.compile(r'(?:State)\s*:?\s*([A-Za-z\s]+)', re.IGNORECASE)
+AREA_PATTERNS = [
+    re.compile(r'(?:Area|Land)\s*:?\s*(\d+\.?\d*)\s*(?:hectares?|ha|acres?)', re.IGNORECASE),
+    re.compile(r'(\d+\.?\d*)\s*(?:hectares?|ha)', re.IGNORECASE),
+    re.compile(r'(\d+\.?\d*)\s*(?:acres?)', re.IGNORECASE),
+]
+COORDINATE_PATTERN = re.compile(r'(?:Lat|Long|Coordinate)\s*:?\s*(\d+\.?\d*)\s*[,\s]*(\d+\.?\d*)', re.IGNORECASE)
+DATE_PATTERNS = [
+    re.compile(r'(?:Date|Submitted)\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'),
+    re.compile(r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'),
+]
+
+# Script reported by Tesseract OSD -> smallest language pack that reads it.
+# Latin pages are left on eng+hin: most are bilingual claim forms.
+SCRIPT_LANGUAGES = {
+    "Devanagari": "hin+eng",
+    "Telugu": "tel+eng",
+    "Bengali": "ben+eng",
+    "Oriya": "ori+eng",
+}
+
+# (grayscale, reduction factor) -> cv2.imdecode flag; reduced modes are for previews
+DECODE_FLAGS = {
+    (False, 1): cv2.IMREAD_COLOR,
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (False, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (True, 1): cv2.IMREAD_GRAYSCALE,
+    (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+def load_image(source: Union[str, bytes, bytearray, memoryview, np.ndarray], grayscale: bool = False,
+               reduction: int = 1) -> np.ndarray:
+    """Decode an image file path (memory-mapped, not read into bytes), encoded bytes or mmap once.
+
+    ``reduction`` of 2, 4 or 8 decodes a preview at that fraction of full size.
+    Already decoded arrays are returned as they are.
+    """
+    if isinstance(source, np.ndarray):
+        return source
+    if isinstance(source, str):
+        buffer = np.memmap(source, dtype=np.uint8, mode='r') if os.path.getsize(source) else np.empty(0, np.uint8)
+    else:
+        buffer = np.frombuffer(source, dtype=np.uint8)
+    image = cv2.imdecode(buffer, DECODE_FLAGS[(grayscale, reduction)]) if buffer.size else None
+    if image is None:
+        raise ValueError(f"Could not load image from {source if isinstance(source, str) else 'buffer'}")
+    return image
+
 @dataclass
 class FRAClaimData:
     """Standardized FRA claim data structure"""
@@ -64,6 +133,13 @@ class DocumentDigitizer:
     def __init__(self):
         self.supported_formats = ['.pdf', '.jpg', '.jpeg', '.png', '.tiff', '.bmp']
         self.ocr_config = '--oem 3 --psm 6 -l eng+hin'
+        self.ocr_languages = set(os.getenv('OCR_LANGUAGES', 'eng+hin+tel+ben+ori').split('+'))
+        self.script_detect_max_side = 1200
+        self._installed_languages = None
+        self._script_configs: Dict[str, str] = {}
+        self.pdf_dpi = int(os.getenv('PDF_DPI', '300'))
+        self.min_text_chars = 20
+        self.ocr_workers = int(os.getenv('OCR_WORKERS', '0')) or os.cpu_count() or 1
         
     def process_document(self, file_path: str, document_type: str = "fra_claim") -> FRAClaimData:
         """
@@ -97,21 +173,17 @@ class DocumentDigitizer:
     def _extract_text_from_document(self, file_path: str) -> str:
         """Extract text from document using OCR"""
         try:
-            # Load image
             if file_path.lower().endswith('.pdf'):
-                # Convert PDF to image first
-                image = self._pdf_to_image(file_path)
-            else:
-                image = cv2.imread(file_path)
+                return self._extract_text_from_pdf(file_path)
             
-            if image is None:
-                raise ValueError(f"Could not load image from {file_path}")
+            # Decode once, straight to grayscale; every later stage reuses this array
+            image = load_image(file_path, grayscale=True)
             
             # Preprocess image for better OCR
             processed_image = self._preprocess_image(image)
             
             # Extract text using Tesseract
-            text = pytesseract.image_to_string(processed_image, config=self.ocr_config)
+            text = pytesseract.image_to_string(processed_image, config=self._ocr_config_for(processed_image))
             
             return text.strip()
             
@@ -122,8 +194,8 @@ class DocumentDigitizer:
     def _preprocess_image(self, image: np.ndarray) -> np.ndarray:
         """Preprocess image for better OCR results"""
         try:
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+            # Convert to grayscale (images from load_image already are)
+            gray = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
             
             # Apply Gaussian blur to reduce noise
             blurred = cv2.GaussianBlur(gray, (5, 5), 0)
@@ -169,56 +241,43 @@ class DocumentDigitizer:
             )
             
             # Extract claim number
-            claim_number_pattern = r'(?:FRA|Claim|Application)\s*(?:No\.?|Number)\s*:?\s*([A-Z0-9/]+)'
-            claim_match = re.search(claim_number_pattern, text, re.IGNORECASE)
+            claim_match = CLAIM_NUMBER_PATTERN.search(text)
             if claim_match:
                 data.claim_number = claim_match.group(1).strip()
             
             # Extract claim type
-            if re.search(r'\bIFR\b', text, re.IGNORECASE):
-                data.claim_type = "IFR"
-            elif re.search(r'\bCR\b', text, re.IGNORECASE):
-                data.claim_type = "CR"
-            elif re.search(r'\bCFR\b', text, re.IGNORECASE):
-                data.claim_type = "CFR"
+            for claim_type, pattern in CLAIM_TYPE_PATTERNS:
+                if pattern.search(text):
+                    data.claim_type = claim_type
+                    break
             
             # Extract applicant name
-            name_patterns = [
-                r'(?:Name|Applicant)\s*:?\s*([A-Za-z\s]+)',
-                r'(?:Name of Applicant)\s*:?\s*([A-Za-z\s]+)',
-                r'(?:Applicant Name)\s*:?\s*([A-Za-z\s]+)'
-            ]
-            for pattern in name_patterns:
-                name_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in NAME_PATTERNS:
+                name_match = pattern.search(text)
                 if name_match:
                     data.applicant_name = name_match.group(1).strip()
                     break
             
             # Extract location information
-            village_match = re.search(r'(?:Village|Gram)\s*:?\s*([A-Za-z\s]+)', text, re.IGNORECASE)
+            village_match = VILLAGE_PATTERN.search(text)
             if village_match:
                 data.village = village_match.group(1).strip()
             
-            block_match = re.search(r'(?:Block|Tehsil)\s*:?\s*([A-Za-z\s]+)', text, re.IGNORECASE)
+            block_match = BLOCK_PATTERN.search(text)
             if block_match:
                 data.block = block_match.group(1).strip()
             
-            district_match = re.search(r'(?:District)\s*:?\s*([A-Za-z\s]+)', text, re.IGNORECASE)
+            district_match = DISTRICT_PATTERN.search(text)
             if district_match:
                 data.district = district_match.group(1).strip()
             
-            state_match = re.search(r'(?:State)\s*:?\s*([A-Za-z\s]+)', text, re.IGNORECASE)
+            state_match = STATE_PATTERN.search(text)
             if state_match:
                 data.state = state_match.group(1).strip()
             
             # Extract area
-            area_patterns = [
-                r'(?:Area|Land)\s*:?\s*(\d+\.?\d*)\s*(?:hectares?|ha|acres?)',
-                r'(\d+\.?\d*)\s*(?:hectares?|ha)',
-                r'(\d+\.?\d*)\s*(?:acres?)'
-            ]
-            for pattern in area_patterns:
-                area_match = re.search(pattern, text, re.IGNORECASE)
+            for pattern in AREA_PATTERNS:
+                area_match = pattern.search(text)
                 if area_match:
                     area_value = float(area_match.group(1))
                     # Convert acres to hectares if needed
@@ -228,8 +287,7 @@ class DocumentDigitizer:
                     break
             
             # Extract coordinates if available
-            coord_pattern = r'(?:Lat|Long|Coordinate)\s*:?\s*(\d+\.?\d*)\s*[,\s]*(\d+\.?\d*)'
-            coord_match = re.search(coord_pattern, text, re.IGNORECASE)
+            coord_match = COORDINATE_PATTERN.search(text)
             if coord_match:
                 data.coordinates = {
                     "latitude": float(coord_match.group(1)),
@@ -237,12 +295,8 @@ class DocumentDigitizer:
                 }
             
             # Extract date
-            date_patterns = [
-                r'(?:Date|Submitted)\s*:?\s*(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})',
-                r'(\d{1,2}[/-]\d{1,2}[/-]\d{2,4})'
-            ]
-            for pattern in date_patterns:
-                date_match = re.search(pattern, text)
+            for pattern in DATE_PATTERNS:
+                date_match = pattern.search(text)
                 if date_match:
                     data.submitted_date = date_match.group(1)
                     break
@@ -330,12 +384,97 @@ class DocumentDigitizer:
             logger.error(f"Error calculating confidence score: {str(e)}")
             return 0.0
     
-    def _pdf_to_image(self, pdf_path: str) -> np.ndarray:
-        """Convert PDF to image for OCR processing"""
+    def _extract_text_from_pdf(self, pdf_path: str) -> str:
+        """
+        Extract text page by page, using the embedded text layer where present
+        and OCRing image-only pages in parallel. Pages are rendered lazily and at
+        most 2 * ocr_workers of them are held in memory at once.
+        """
+        page_texts = []
+        with ThreadPoolExecutor(max_workers=self.ocr_workers) as executor:
+            in_flight = deque()
+            for page_number, text, image in self._iter_pdf_pages(pdf_path):
+                if image is not None:
+                    in_flight.append(executor.submit(self._ocr_page_image, image))
+                else:
+                    in_flight.append(text)
+                while len(in_flight) >= 2 * self.ocr_workers:
+                    page_texts.append(self._resolve_page(in_flight.popleft()))
+            while in_flight:
+                page_texts.append(self._resolve_page(in_flight.popleft()))
+        
+        return "\n".join(page_texts).strip()
+    
+    def _iter_pdf_pages(self, pdf_path: str):
+        """Yield (page_number, text_layer, image) per page; image is None when the text layer is usable"""
+        with fitz.open(pdf_path) as doc:
+            for page in doc:
+                text = page.get_text()
+                if len(text.strip()) >= self.min_text_chars:
+                    yield page.number, text, None
+                else:
+                    yield page.number, "", self._render_page(page)
+    
+    def _render_page(self, page) -> np.ndarray:
+        """Rasterize a PDF page to a BGR image at the configured DPI"""
+        zoom = self.pdf_dpi / 72.0
+        pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csRGB, alpha=False)
+        rgb = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width * 3]
+        return cv2.cvtColor(rgb.reshape(pix.height, pix.width, 3), cv2.COLOR_RGB2BGR)
+    
+    def _ocr_page_image(self, image: np.ndarray) -> str:
+        processed_image = self._preprocess_image(image)
+        return pytesseract.image_to_string(processed_image, config=self._ocr_config_for(processed_image))
+    
+    def _ocr_config_for(self, image: np.ndarray) -> str:
+        """
+        Tesseract config with only the language pack for the page's script.
+        A script-detection (OSD) pass on a thumbnail is far cheaper than OCR with
+        every language loaded; Latin, unknown or undetectable scripts keep eng+hin.
+        """
+        h, w = image.shape[:2]
+        scale = self.script_detect_max_side / max(h, w)
+        thumbnail = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA) if scale < 1 else image
+        try:
+            osd = pytesseract.image_to_osd(thumbnail, config='--psm 0 -c min_characters_to_try=10',
+                                           output_type=pytesseract.Output.DICT)
+            script = osd.get('script') if float(osd.get('script_conf', 0)) >= 1.0 else None
+        except Exception as e:
+            logger.debug(f"Script detection failed, using default languages: {str(e)}")
+            script = None
+        
+        if script not in self._script_configs:
+            codes = [
+                code for code in SCRIPT_LANGUAGES.get(script, '').split('+')
+                if code in self.ocr_languages and code in self._tesseract_languages()
+            ]
+            self._script_configs[script] = f"--oem 3 --psm 6 -l {'+'.join(codes)}" if codes else self.ocr_config
+        return self._script_configs[script]
+    
+    def _tesseract_languages(self) -> set:
+        """Installed Tesseract languages, queried once"""
+        if self._installed_languages is None:
+            try:
+                self._installed_languages = set(pytesseract.get_languages(config=''))
+            except Exception as e:
+                logger.warning(f"Could not list Tesseract languages: {str(e)}")
+                self._installed_languages = {'eng', 'hin'}
+        return self._installed_languages
+    
+    def _resolve_page(self, item) -> str:
+        if isinstance(item, str):
+            return item
+        try:
+            return item.result()
+        except Exception as e:
+            logger.error(f"Error running OCR on PDF page: {str(e)}")
+            return ""
+    
+    def _pdf_to_image(self, pdf_path: str, page_number: int = 0) -> np.ndarray:
+        """Convert a single PDF page to an image for OCR processing"""
         try:
-            # This would use pdf2image or similar library
-            # For now, return a placeholder
-            return np.zeros((100, 100, 3), dtype=np.uint8)
+            with fitz.open(pdf_path) as doc:
+                return self._render_page(doc.load_page(page_number))
         except Exception as e:
             logger.error(f"Error converting PDF to image: {str(e)}")
             raise
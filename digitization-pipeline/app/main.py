@@ -1,13 +1,21 @@
-from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks
+from fastapi import FastAPI, File, UploadFile, HTTPException, BackgroundTasks, Query, Request
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import Response, StreamingResponse
 from typing import List, Optional
+import asyncio
+import gzip
+import json
 import uuid
 import os
 from datetime import datetime
 
 from .models.schemas import ProcessingResult, DocumentMetadata
 from .services.processor import DocumentProcessor
-from .services.database import DatabaseService
+from .services.job_queue import create_job_queue
+from .services.metrics import CONTENT_TYPE, metrics, register_service_metrics
+from .services.status_events import StatusBroker
+from .services.tiles import TileService
+from .utils.uploads import SpooledUpload, UploadTooLarge, spool_upload
 from .config import settings
 
 app = FastAPI(title="FRA Digitization Pipeline", version="1.0.0")
@@ -21,29 +29,57 @@ app.add_middleware(
 )
 
 processor = DocumentProcessor()
-db_service = DatabaseService()
+# One service per process so buffered status writes are visible to /status
+db_service = processor.db_service
+job_queue = create_job_queue()
+tile_service = TileService(db_service)
+status_broker = StatusBroker(db_service)
+register_service_metrics(processor, job_queue, tile_service)
+
+async def _spool(file: UploadFile, document_id: str) -> SpooledUpload:
+    try:
+        return await spool_upload(file, document_id)
+    except UploadTooLarge as e:
+        raise HTTPException(413, str(e))
 
 @app.post("/upload", response_model=ProcessingResult)
 async def upload_document(
     background_tasks: BackgroundTasks,
     file: UploadFile = File(...),
     state: Optional[str] = None,
-    district: Optional[str] = None
+    district: Optional[str] = None,
+    document_type: Optional[str] = None
 ):
     """Upload single document for processing"""
     if not file.filename.lower().endswith(('.pdf', '.jpg', '.jpeg', '.png', '.tiff')):
         raise HTTPException(400, "Unsupported file format")
+    if processor.worker_pool.saturated:
+        raise HTTPException(503, "Processing queue is full, retry later")
     
     document_id = str(uuid.uuid4())
     
-    # Save file temporarily
-    file_path = f"/tmp/{document_id}_{file.filename}"
-    with open(file_path, "wb") as f:
-        content = await file.read()
-        f.write(content)
+    # Stream to UPLOAD_DIR, hashing on the way
+    upload = await _spool(file, document_id)
+    file_path = upload.path
+    
+    # Re-uploads of an already processed scan skip OCR entirely
+    if processor.result_cache:
+        key = await processor.cache_key_for(file_path, processor.preprocessor.profile_for(document_type),
+                                            digest=upload.digest)
+        # The entry read here is handed to process_document, so an eviction in between cannot force inline OCR
+        cached = await asyncio.to_thread(processor.result_cache.get, key)
+        if cached:
+            await processor.process_document(document_id, file_path, state, district, content_key=key,
+                                             document_type=document_type, cached=cached)
+            return ProcessingResult(
+                document_id=document_id,
+                status="completed",
+                message="Document matched a previously processed scan"
+            )
     
     # Queue processing
-    background_tasks.add_task(processor.process_document, document_id, file_path, state, district)
+    background_tasks.add_task(processor.process_document, document_id, file_path, state, district,
+                              document_type=document_type)
     
     return ProcessingResult(
         document_id=document_id,
@@ -53,25 +89,49 @@ async def upload_document(
 
 @app.post("/ingest-batch")
 async def ingest_batch(
-    background_tasks: BackgroundTasks,
     files: List[UploadFile] = File(...),
     state: Optional[str] = None,
-    district: Optional[str] = None
+    district: Optional[str] = None,
+    document_type: Optional[str] = None
 ):
     """Batch upload multiple documents"""
     batch_id = str(uuid.uuid4())
     document_ids = []
+    payloads = []
     
     for file in files:
         document_id = str(uuid.uuid4())
+        try:
+            upload = await _spool(file, document_id)
+        except HTTPException:
+            # Nothing has been queued yet; drop what this batch already spooled
+            for payload in payloads:
+                os.remove(payload["file_path"])
+            raise
         document_ids.append(document_id)
         
-        file_path = f"/tmp/{document_id}_{file.filename}"
-        with open(file_path, "wb") as f:
-            content = await file.read()
-            f.write(content)
-        
-        background_tasks.add_task(processor.process_document, document_id, file_path, state, district)
+        payloads.append({
+            "document_id": document_id,
+            "file_path": upload.path,
+            "content_digest": upload.digest,
+            "state": state,
+            "district": district,
+            "document_type": document_type,
+            "batch_id": batch_id
+        })
+    
+    # Jobs survive API restarts and are picked up by `python -m app.worker`. Statuses are
+    # written first: a worker may lease a job at once, and a late "queued" would overwrite its progress
+    status_broker.register_batch(batch_id, document_ids)
+    for document_id in document_ids:
+        await db_service.update_status(document_id, "queued")
+    try:
+        await db_service.flush()  # Write-behind would otherwise commit "queued" after the worker's updates
+    except Exception:
+        for payload in payloads:
+            os.remove(payload["file_path"])
+        raise HTTPException(503, "Could not record the batch, retry later")
+    job_queue.enqueue_many(payloads)
     
     return {
         "batch_id": batch_id,
@@ -88,22 +148,130 @@ async def get_status(document_id: str):
         raise HTTPException(404, "Document not found")
     return result
 
+@app.get("/batches/{batch_id}/events")
+async def batch_events(batch_id: str):
+    """Server-Sent Events stream of a batch's status transitions
+    
+    Sends a ``snapshot`` event with every document's status, a ``status``
+    event per transition and a final ``done`` event once every document has
+    completed or failed. Replaces polling /status for each document.
+    """
+    if not status_broker.has_batch(batch_id):
+        raise HTTPException(404, "Unknown batch")
+    
+    async def events():
+        async for event in status_broker.subscribe(batch_id):
+            if event["type"] == "heartbeat":
+                yield ": keepalive\n\n"
+            else:
+                yield f"event: {event['type']}\ndata: {json.dumps(event, default=str)}\n\n"
+    
+    return StreamingResponse(events(), media_type="text/event-stream", headers={"Cache-Control": "no-cache"})
+
+@app.get("/queue")
+async def queue_status(dead_letter_limit: int = 20):
+    """Job queue depth and most recent dead-lettered jobs"""
+    return {
+        "backend": type(job_queue).__name__,
+        "counts": job_queue.stats(),
+        "dead_letters": job_queue.dead_letters(dead_letter_limit)
+    }
+
+@app.get("/cache")
+async def cache_stats():
+    """OCR result cache hit/miss counters"""
+    if not processor.result_cache:
+        return {"enabled": False}
+    return {"enabled": True, **processor.result_cache.stats()}
+
 @app.get("/export/{format}")
 async def export_data(
     format: str,
     state: Optional[str] = None,
     district: Optional[str] = None,
-    village: Optional[str] = None
+    village: Optional[str] = None,
+    stream: bool = False,
+    include: Optional[str] = None
 ):
-    """Export processed data in various formats"""
+    """Export processed data in various formats
+    
+    With ``stream=true`` JSON and GeoJSON are sent as a chunked response read
+    from a database cursor; ``include=raw_ocr_text,extracted_fields`` adds the
+    heavy columns, which streaming exports leave out by default.
+    """
     if format not in ['json', 'geojson', 'shapefile']:
         raise HTTPException(400, "Unsupported export format")
     
+    if stream and format != 'shapefile':
+        columns = [name.strip() for name in include.split(',')] if include else []
+        media_type = "application/geo+json" if format == 'geojson' else "application/json"
+        return StreamingResponse(
+            processor.stream_export(format, state, district, village, include=columns),
+            media_type=media_type
+        )
+    
     return await processor.export_data(format, state, district, village)
 
+@app.get("/parcels/bbox")
+async def parcels_in_bbox(
+    bbox: str = Query(..., description="min_lon,min_lat,max_lon,max_lat"),
+    limit: int = Query(1000, ge=1, le=10000)
+):
+    """Parcels intersecting the map viewport, as GeoJSON"""
+    try:
+        min_lon, min_lat, max_lon, max_lat = [float(value) for value in bbox.split(',')]
+    except ValueError:
+        raise HTTPException(400, "bbox must be min_lon,min_lat,max_lon,max_lat")
+    if min_lon > max_lon or min_lat > max_lat:
+        raise HTTPException(400, "bbox minimums must not exceed its maximums")
+    
+    rows = await db_service.parcels_in_bbox((min_lon, min_lat, max_lon, max_lat), limit)
+    return Response(processor.feature_collection(rows), media_type="application/geo+json")
+
+@app.get("/parcels/at")
+async def parcels_at_point(lon: float = Query(..., ge=-180, le=180), lat: float = Query(..., ge=-90, le=90)):
+    """Parcels containing a point, as GeoJSON"""
+    rows = await db_service.parcels_at_point(lon, lat)
+    return Response(processor.feature_collection(rows), media_type="application/geo+json")
+
+@app.get("/parcels/nearest")
+async def nearest_parcels(
+    lon: float = Query(..., ge=-180, le=180),
+    lat: float = Query(..., ge=-90, le=90),
+    n: int = Query(10, ge=1, le=100)
+):
+    """The n parcels closest to a point, nearest first, as GeoJSON"""
+    rows = await db_service.nearest_parcels(lon, lat, n)
+    return Response(processor.feature_collection(rows), media_type="application/geo+json")
+
+@app.get("/tiles/{z}/{x}/{y}.mvt")
+async def vector_tile(z: int, x: int, y: int, request: Request):
+    """Mapbox Vector Tile of FRA parcels (layer "parcels")"""
+    if not tile_service.valid(z, x, y):
+        raise HTTPException(404, "Tile out of range")
+    
+    tile = await tile_service.get_tile(z, x, y)
+    # The body depends on Accept-Encoding, so shared caches must key on it too
+    headers = {"Cache-Control": "public, max-age=60", "Vary": "Accept-Encoding"}
+    if "gzip" in request.headers.get("accept-encoding", ""):
+        headers["Content-Encoding"] = "gzip"
+    else:
+        tile = gzip.decompress(tile)
+    return Response(tile, media_type="application/vnd.mapbox-vector-tile", headers=headers)
+
+@app.get("/metrics")
+async def metrics_endpoint():
+    """Prometheus metrics: stage latencies, queue depth, worker utilisation, cache hit rates"""
+    return Response(metrics.render(), media_type=CONTENT_TYPE)
+
 @app.get("/health")
 async def health_check():
-    return {"status": "healthy", "timestamp": datetime.utcnow()}
+    return {"status": "healthy", "timestamp": datetime.utcnow(), "workers": processor.worker_pool.stats()}
+
+@app.on_event("shutdown")
+async def shutdown():
+    processor.worker_pool.shutdown(wait=False)
+    await db_service.close()
 
 if __name__ == "__main__":
     import uvicorn
@@ -0,0 +1,190 @@
+import asyncio
+import logging
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence
+
+from sqlalchemy import select
+from sqlalchemy.engine import make_url
+from sqlalchemy.ext.asyncio import AsyncEngine, async_sessionmaker, create_async_engine
+
+from ..config import settings
+from ..models.schemas import DocumentMetadata
+from ..utils.geometry_codec import to_geojson
+from .database import (
+    EXPORT_COLUMNS, Base, DatabaseService, FRARecord, ProcessingJob, create_missing_columns,
+    create_missing_indexes, engine_options
+)
+from .spatial_index import SpatialIndex
+from .write_behind import WriteBehindBuffer
+
+logger = logging.getLogger(__name__)
+
+
+def async_database_url(database_url: str) -> str:
+    """asyncpg URL for a PostgreSQL URL, aiosqlite for a SQLite one
+
+    A PostgreSQL URL without asyncpg installed is a startup error rather than
+    a silent switch to a local file that would take production writes.
+    """
+    url = make_url(database_url)
+    if url.get_backend_name() == 'postgresql':
+        try:
+            import asyncpg  # noqa: F401
+        except ImportError:
+            raise RuntimeError("DB_BACKEND=async needs asyncpg for PostgreSQL (pip install asyncpg)")
+        url = url.set(drivername='postgresql+asyncpg').update_query_dict(
+            {"prepared_statement_cache_size": str(settings.db_statement_cache_size)}
+        )
+        return url.render_as_string(hide_password=False)
+    if url.get_backend_name() == 'sqlite':
+        return url.set(drivername='sqlite+aiosqlite').render_as_string(hide_password=False)
+    return database_url
+
+
+class AsyncDatabaseService(DatabaseService):
+    """DatabaseService on an async engine, so queries never block the event loop
+
+    Connections come from a pre-pinged pool sized by ``db_pool_size`` and
+    ``db_max_overflow``; asyncpg additionally keeps prepared statements per
+    connection. Tables are created on first use, once an event loop is running.
+    """
+
+    def __init__(self, database_url: Optional[str] = None, write_behind: Optional[bool] = None):
+        database_url = async_database_url(database_url or settings.database_url)
+        write_behind = settings.db_write_behind if write_behind is None else write_behind
+
+        self.engine: AsyncEngine = create_async_engine(database_url, **engine_options(database_url))
+        self.SessionLocal = async_sessionmaker(self.engine, expire_on_commit=False)
+        self.write_behind = WriteBehindBuffer(self._bulk_write) if write_behind else None
+        self.status_listeners = []
+        self._index_lock: Optional[asyncio.Lock] = None
+        self.spatial_index = None if self.engine.dialect.name == 'postgresql' else SpatialIndex()
+        self._ready = False
+        self._ready_lock = asyncio.Lock()
+        logger.info(f"Async database engine created for {self.engine.url.get_backend_name()}")
+
+    async def _ensure_tables(self):
+        if self._ready:
+            return
+        async with self._ready_lock:
+            if not self._ready:
+                # Create tables if they don't exist
+                async with self.engine.begin() as conn:
+                    await conn.run_sync(Base.metadata.create_all)
+                    await conn.run_sync(create_missing_columns)
+                    await conn.run_sync(create_missing_indexes)
+                self._ready = True
+
+    async def save_document(self, metadata: DocumentMetadata):
+        """Save processed document to database"""
+        try:
+            if self.write_behind:
+                await self.write_behind.add_record(self._record_row(metadata))
+                return
+            await self._ensure_tables()
+            async with self.SessionLocal() as session:
+                session.add(FRARecord(**self._encode_rows([self._record_row(metadata)])[0]))
+                await session.commit()
+            logger.info(f"Document {metadata.document_id} saved to database")
+
+        except Exception as e:
+            logger.error(f"Failed to save document {metadata.document_id}: {str(e)}")
+
+    async def get_document_status(self, document_id: str) -> Optional[Dict]:
+        """Get processing status of document"""
+        try:
+            pending = self.write_behind.pending_status(document_id) if self.write_behind else None
+            if pending:
+                return {
+                    "document_id": document_id,
+                    "status": pending["status"],
+                    "error_message": pending.get("error_message"),
+                    "trace": pending.get("trace"),
+                    "updated_at": pending["updated_at"]
+                }
+
+            await self._ensure_tables()
+            async with self.SessionLocal() as session:
+                job = await session.scalar(select(ProcessingJob).where(ProcessingJob.document_id == document_id))
+            if job:
+                return {
+                    "document_id": job.document_id,
+                    "status": job.status,
+                    "error_message": job.error_message,
+                    "trace": job.trace,
+                    "created_at": job.created_at,
+                    "updated_at": job.updated_at
+                }
+            return None
+
+        except Exception as e:
+            logger.error(f"Failed to get status for {document_id}: {str(e)}")
+            return None
+
+    async def update_status(self, document_id: str, status: str, error_message: str = None,
+                            trace: Optional[Dict[str, Any]] = None):
+        """Update processing status, with the document's stage timings if traced"""
+        row = {
+            "document_id": document_id,
+            "status": status,
+            "error_message": error_message,
+            "trace": trace,
+            "updated_at": datetime.utcnow()
+        }
+        try:
+            if self.write_behind:
+                await self.write_behind.add_status(row)
+            else:
+                await self._bulk_write([], [row])
+            self._notify_status(row)
+
+        except Exception as e:
+            logger.error(f"Failed to update status for {document_id}: {str(e)}")
+
+    async def get_documents(self, filters: Dict[str, Any] = None) -> List[DocumentMetadata]:
+        """Get documents with optional filters"""
+        try:
+            await self._ensure_tables()
+            query = select(FRARecord)
+            if filters:
+                query = query.where(*self._filter_clauses(filters))
+            async with self.SessionLocal() as session:
+                records = (await session.scalars(query)).all()
+            coordinates = to_geojson([record.geom for record in records])
+            return [self._to_metadata(record, geojson) for record, geojson in zip(records, coordinates)]
+
+        except Exception as e:
+            logger.error(f"Failed to get documents: {str(e)}")
+            return []
+
+    async def stream_documents(self, filters: Dict[str, Any] = None, columns: Sequence[str] = EXPORT_COLUMNS,
+                               require_geometry: bool = False,
+                               chunk_size: Optional[int] = None) -> AsyncIterator[List[Dict[str, Any]]]:
+        """Async counterpart of DatabaseService.stream_documents"""
+        await self._ensure_tables()
+        query = self._export_query(filters, columns, require_geometry)
+        async with self.engine.connect() as conn:
+            result = await conn.stream(query.execution_options(yield_per=chunk_size or settings.export_chunk_size))
+            async for rows in result.partitions():
+                yield self._export_rows(rows)
+
+    async def _fetch(self, query) -> list:
+        await self._ensure_tables()
+        async with self.engine.connect() as conn:
+            return (await conn.execute(query)).all()
+
+    async def close(self):
+        await super().close()
+        await self.engine.dispose()
+
+    async def _bulk_write(self, records: List[Dict[str, Any]], statuses: List[Dict[str, Any]]):
+        """Upsert many records and statuses in one transaction (executemany per table)"""
+        await self._ensure_tables()
+        records = self._encode_rows(records)
+        async with self.engine.begin() as conn:
+            if records:
+                await conn.execute(self._upsert(FRARecord, ['id', 'document_id', 'created_at']), records)
+            if statuses:
+                rows = [{"error_message": None, "trace": None, **row} for row in statuses]
+                await conn.execute(self._upsert(ProcessingJob, ['id', 'document_id', 'created_at']), rows)
+        logger.info(f"Bulk wrote {len(records)} records and {len(statuses)} status updates")
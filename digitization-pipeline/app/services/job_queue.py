@@ -0,0 +1,287 @@
+import json
+import logging
+import os
+import sqlite3
+import threading
+import time
+import uuid
+from typing import Any, Dict, List, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+EXPIRED_LEASE_ERROR = "Lease expired: the worker crashed or timed out"
+
+
+class JobQueue:
+    """Durable work queue for document processing jobs
+
+    Jobs are leased to a worker for ``lease_timeout`` seconds. A job that is
+    not acknowledged in time becomes visible again, so a crashed worker never
+    loses work; an expired lease counts as a failed attempt. Failed jobs are
+    retried up to ``max_retries`` times with exponential backoff
+    (``max_retries + 1`` attempts in all), then moved to the dead-letter list.
+    """
+
+    def __init__(self, max_retries: Optional[int] = None, retry_backoff: Optional[float] = None,
+                 lease_timeout: Optional[float] = None):
+        self.max_retries = settings.job_max_retries if max_retries is None else max_retries
+        self.retry_backoff = settings.job_retry_backoff if retry_backoff is None else retry_backoff
+        self.lease_timeout = lease_timeout or settings.worker_timeout
+
+    def enqueue(self, payload: Dict[str, Any]) -> str:
+        return self.enqueue_many([payload])[0]
+
+    def enqueue_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        raise NotImplementedError
+
+    def dequeue_batch(self, size: int, worker_id: str) -> List[Dict[str, Any]]:
+        """Lease up to ``size`` ready jobs; each job dict has ``id``, ``attempts`` and ``payload``"""
+        raise NotImplementedError
+
+    def ack(self, job_id: str):
+        raise NotImplementedError
+
+    def fail(self, job_id: str, error: str) -> bool:
+        """Record a failed attempt; returns True if the job was dead-lettered"""
+        raise NotImplementedError
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        raise NotImplementedError
+
+    def stats(self) -> Dict[str, int]:
+        raise NotImplementedError
+
+    def _backoff(self, attempts: int) -> float:
+        return self.retry_backoff * (2 ** (attempts - 1))
+
+
+class SQLiteJobQueue(JobQueue):
+    """Job queue stored in a SQLite file; ``:memory:`` gives a throwaway queue for tests"""
+
+    def __init__(self, path: Optional[str] = None, **kwargs):
+        super().__init__(**kwargs)
+        self.path = path or settings.job_queue_path
+        if self.path != ":memory:":
+            os.makedirs(os.path.dirname(os.path.abspath(self.path)), exist_ok=True)
+        self._lock = threading.Lock()
+        self._conn = sqlite3.connect(self.path, timeout=30, check_same_thread=False, isolation_level=None)
+        self._conn.execute("PRAGMA journal_mode=WAL")
+        self._conn.execute("""
+            CREATE TABLE IF NOT EXISTS jobs (
+                id TEXT PRIMARY KEY,
+                payload TEXT NOT NULL,
+                status TEXT NOT NULL DEFAULT 'ready',
+                attempts INTEGER NOT NULL DEFAULT 0,
+                available_at REAL NOT NULL,
+                leased_until REAL,
+                worker_id TEXT,
+                last_error TEXT,
+                created_at REAL NOT NULL
+            )
+        """)
+        self._conn.execute("CREATE INDEX IF NOT EXISTS idx_jobs_ready ON jobs (status, available_at)")
+
+    def enqueue_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        now = time.time()
+        rows = [(str(uuid.uuid4()), json.dumps(p), now, now) for p in payloads]
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            self._conn.executemany(
+                "INSERT INTO jobs (id, payload, available_at, created_at) VALUES (?, ?, ?, ?)", rows
+            )
+            self._conn.execute("COMMIT")
+        return [row[0] for row in rows]
+
+    def dequeue_batch(self, size: int, worker_id: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        with self._lock:
+            self._conn.execute("BEGIN IMMEDIATE")
+            try:
+                # A lease that ran out is a failed attempt too (the worker crashed or hung)
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', leased_until = NULL, last_error = ? "
+                    "WHERE status = 'leased' AND leased_until < ? AND attempts > ?",
+                    (EXPIRED_LEASE_ERROR, now, self.max_retries),
+                )
+                rows = self._conn.execute(
+                    """
+                    SELECT id, payload, attempts FROM jobs
+                    WHERE (status = 'ready' AND available_at <= ?)
+                       OR (status = 'leased' AND leased_until < ?)
+                    ORDER BY available_at
+                    LIMIT ?
+                    """,
+                    (now, now, size),
+                ).fetchall()
+                self._conn.executemany(
+                    "UPDATE jobs SET status = 'leased', leased_until = ?, worker_id = ?, attempts = attempts + 1 WHERE id = ?",
+                    [(now + self.lease_timeout, worker_id, row[0]) for row in rows],
+                )
+                self._conn.execute("COMMIT")
+            except Exception:
+                self._conn.execute("ROLLBACK")
+                raise
+        return [{"id": row[0], "payload": json.loads(row[1]), "attempts": row[2] + 1} for row in rows]
+
+    def ack(self, job_id: str):
+        with self._lock:
+            self._conn.execute("DELETE FROM jobs WHERE id = ?", (job_id,))
+
+    def fail(self, job_id: str, error: str) -> bool:
+        with self._lock:
+            row = self._conn.execute("SELECT attempts FROM jobs WHERE id = ?", (job_id,)).fetchone()
+            if row is None:
+                return False
+            attempts = row[0]
+            if attempts > self.max_retries:
+                self._conn.execute(
+                    "UPDATE jobs SET status = 'dead', leased_until = NULL, last_error = ? WHERE id = ?",
+                    (error, job_id),
+                )
+                return True
+            self._conn.execute(
+                "UPDATE jobs SET status = 'ready', leased_until = NULL, available_at = ?, last_error = ? WHERE id = ?",
+                (time.time() + self._backoff(attempts), error, job_id),
+            )
+            return False
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        with self._lock:
+            rows = self._conn.execute(
+                "SELECT id, payload, attempts, last_error FROM jobs WHERE status = 'dead' ORDER BY created_at LIMIT ?",
+                (limit,),
+            ).fetchall()
+        return [{"id": r[0], "payload": json.loads(r[1]), "attempts": r[2], "error": r[3]} for r in rows]
+
+    def stats(self) -> Dict[str, int]:
+        with self._lock:
+            rows = self._conn.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status").fetchall()
+        counts = {"ready": 0, "leased": 0, "dead": 0}
+        counts.update(dict(rows))
+        return counts
+
+
+# Promote due retries and expired leases, then pop and lease up to ARGV[3] jobs.
+# One script so that no two workers can move or pop the same id, and a crash
+# can never leave a job popped from the ready list without a lease. Expired
+# leases of jobs that have used up their retries are dead-lettered instead.
+_LEASE_SCRIPT = """
+local ready, delayed, leases, dead = KEYS[1], KEYS[2], KEYS[3], KEYS[4]
+local now, lease_until, size, job_prefix = ARGV[1], ARGV[2], tonumber(ARGV[3]), ARGV[4]
+local max_retries, expired_error = tonumber(ARGV[5]), ARGV[6]
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', delayed, '-inf', now)) do
+    redis.call('ZREM', delayed, job_id)
+    redis.call('LPUSH', ready, job_id)
+end
+for _, job_id in ipairs(redis.call('ZRANGEBYSCORE', leases, '-inf', now)) do
+    redis.call('ZREM', leases, job_id)
+    local attempts = tonumber(redis.call('HGET', job_prefix .. job_id, 'attempts') or '0')
+    if attempts > max_retries then
+        redis.call('HSET', job_prefix .. job_id, 'last_error', expired_error)
+        redis.call('LPUSH', dead, job_id)
+    else
+        redis.call('LPUSH', ready, job_id)
+    end
+end
+local jobs = {}
+while #jobs < size do
+    local job_id = redis.call('RPOP', ready)
+    if not job_id then break end
+    local payload = redis.call('HGET', job_prefix .. job_id, 'payload')
+    if payload then
+        redis.call('ZADD', leases, lease_until, job_id)
+        local attempts = redis.call('HINCRBY', job_prefix .. job_id, 'attempts', 1)
+        table.insert(jobs, {job_id, attempts, payload})
+    end
+end
+return jobs
+"""
+
+
+class RedisJobQueue(JobQueue):
+    """Job queue on Redis lists, shared by every worker pointing at ``settings.redis_url``"""
+
+    def __init__(self, url: Optional[str] = None, prefix: str = "fra:jobs", **kwargs):
+        super().__init__(**kwargs)
+        import redis
+
+        self.redis = redis.Redis.from_url(url or settings.redis_url, decode_responses=True)
+        self.ready_key = f"{prefix}:ready"
+        self.delayed_key = f"{prefix}:delayed"
+        self.leases_key = f"{prefix}:leases"
+        self.dead_key = f"{prefix}:dead"
+        self.job_prefix = f"{prefix}:job:"
+        self._lease = self.redis.register_script(_LEASE_SCRIPT)
+
+    def enqueue_many(self, payloads: List[Dict[str, Any]]) -> List[str]:
+        job_ids = [str(uuid.uuid4()) for _ in payloads]
+        pipe = self.redis.pipeline()
+        for job_id, payload in zip(job_ids, payloads):
+            pipe.hset(self.job_prefix + job_id, mapping={"payload": json.dumps(payload), "attempts": 0})
+        if job_ids:
+            pipe.lpush(self.ready_key, *job_ids)
+        pipe.execute()
+        return job_ids
+
+    def dequeue_batch(self, size: int, worker_id: str) -> List[Dict[str, Any]]:
+        now = time.time()
+        leased = self._lease(
+            keys=[self.ready_key, self.delayed_key, self.leases_key, self.dead_key],
+            args=[now, now + self.lease_timeout, size, self.job_prefix, self.max_retries, EXPIRED_LEASE_ERROR],
+        )
+        return [
+            {"id": job_id, "payload": json.loads(payload), "attempts": int(attempts)}
+            for job_id, attempts, payload in leased
+        ]
+
+    def ack(self, job_id: str):
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.leases_key, job_id)
+        pipe.delete(self.job_prefix + job_id)
+        pipe.execute()
+
+    def fail(self, job_id: str, error: str) -> bool:
+        attempts = int(self.redis.hget(self.job_prefix + job_id, "attempts") or 0)
+        pipe = self.redis.pipeline()
+        pipe.zrem(self.leases_key, job_id)
+        pipe.hset(self.job_prefix + job_id, "last_error", error)
+        dead = attempts > self.max_retries
+        if dead:
+            pipe.lpush(self.dead_key, job_id)
+        else:
+            pipe.zadd(self.delayed_key, {job_id: time.time() + self._backoff(attempts)})
+        pipe.execute()
+        return dead
+
+    def dead_letters(self, limit: int = 100) -> List[Dict[str, Any]]:
+        letters = []
+        for job_id in self.redis.lrange(self.dead_key, 0, limit - 1):
+            job = self.redis.hgetall(self.job_prefix + job_id)
+            letters.append({
+                "id": job_id,
+                "payload": json.loads(job.get("payload", "{}")),
+                "attempts": int(job.get("attempts", 0)),
+                "error": job.get("last_error"),
+            })
+        return letters
+
+    def stats(self) -> Dict[str, int]:
+        return {
+            "ready": self.redis.llen(self.ready_key) + self.redis.zcard(self.delayed_key),
+            "leased": self.redis.zcard(self.leases_key),
+            "dead": self.redis.llen(self.dead_key),
+        }
+
+
+def create_job_queue() -> JobQueue:
+    """Build the queue selected by ``settings.job_queue_backend``, falling back to SQLite"""
+    if settings.job_queue_backend == "redis":
+        try:
+            queue = RedisJobQueue()
+            queue.redis.ping()
+            return queue
+        except Exception as e:
+            logger.warning(f"Redis job queue unavailable ({str(e)}), using SQLite at {settings.job_queue_path}")
+    return SQLiteJobQueue()
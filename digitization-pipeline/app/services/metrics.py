@@ -0,0 +1,256 @@
+import logging
+import math
+import threading
+import time
+from bisect import bisect_left
+from contextlib import contextmanager
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Any, Callable, Dict, Iterable, Iterator, List, Optional, Tuple
+
+logger = logging.getLogger(__name__)
+
+# Seconds; OCR of a dense 300 dpi page sits in the 1-10 s range
+LATENCY_BUCKETS = (0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1.0, 2.5, 5.0, 10.0, 30.0, 60.0, 120.0, 300.0)
+
+CONTENT_TYPE = "text/plain; version=0.0.4; charset=utf-8"
+
+Labels = Tuple[Tuple[str, str], ...]
+# (metric name, labels, value), produced by collectors at scrape time
+Sample = Tuple[str, Dict[str, Any], float]
+
+
+@contextmanager
+def timed(timings: Dict[str, float], stage: str) -> Iterator[None]:
+    """Add the wall time of the block to ``timings[stage]``"""
+    start = time.perf_counter()
+    try:
+        yield
+    finally:
+        timings[stage] = timings.get(stage, 0.0) + time.perf_counter() - start
+
+
+def _label_key(labels: Dict[str, Any]) -> Labels:
+    return tuple(sorted((key, str(value)) for key, value in labels.items()))
+
+
+def _sample_line(name: str, labels: Labels, value: float) -> str:
+    if math.isinf(value):
+        text = "+Inf" if value > 0 else "-Inf"
+    else:
+        text = repr(float(value)) if not float(value).is_integer() else str(int(value))
+    if not labels:
+        return f"{name} {text}"
+    escaped = ",".join(
+        '{}="{}"'.format(key, value.replace("\\", "\\\\").replace("\n", "\\n").replace('"', '\\"'))
+        for key, value in labels
+    )
+    return f"{name}{{{escaped}}} {text}"
+
+
+class Histogram:
+    def __init__(self, buckets: Tuple[float, ...]):
+        self.buckets = buckets
+        self.counts = [0] * (len(buckets) + 1)  # last slot is +Inf
+        self.sum = 0.0
+
+    def observe(self, value: float):
+        self.counts[bisect_left(self.buckets, value)] += 1
+        self.sum += value
+
+    def lines(self, name: str, labels: Labels) -> List[str]:
+        lines, cumulative = [], 0
+        for bound, count in zip((*self.buckets, math.inf), self.counts):
+            cumulative += count
+            le = "+Inf" if math.isinf(bound) else repr(bound)
+            lines.append(_sample_line(f"{name}_bucket", labels + (("le", le),), cumulative))
+        lines.append(_sample_line(f"{name}_sum", labels, self.sum))
+        lines.append(_sample_line(f"{name}_count", labels, cumulative))
+        return lines
+
+
+class MetricsRegistry:
+    """Process-wide counters and histograms, written out in Prometheus text format
+
+    Counters and histograms are updated as work happens. Gauges (queue depth,
+    worker utilisation, cache hit rates) are read from the owning services by
+    collectors registered with ``register_collector`` and called on each scrape.
+    """
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._meta: Dict[str, Tuple[str, str]] = {}  # name -> (type, help)
+        self._counters: Dict[str, Dict[Labels, float]] = {}
+        self._histograms: Dict[str, Dict[Labels, Histogram]] = {}
+        self._buckets: Dict[str, Tuple[float, ...]] = {}
+        self._collectors: List[Callable[[], Iterable[Sample]]] = []
+
+    def counter(self, name: str, help: str):
+        self._meta[name] = ("counter", help)
+        self._counters.setdefault(name, {})
+
+    def gauge(self, name: str, help: str):
+        self._meta[name] = ("gauge", help)
+
+    def histogram(self, name: str, help: str, buckets: Tuple[float, ...] = LATENCY_BUCKETS):
+        self._meta[name] = ("histogram", help)
+        self._histograms.setdefault(name, {})
+        self._buckets[name] = buckets
+
+    def inc(self, name: str, value: float = 1.0, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._counters[name]
+            series[key] = series.get(key, 0.0) + value
+
+    def observe(self, name: str, value: float, **labels):
+        key = _label_key(labels)
+        with self._lock:
+            series = self._histograms[name]
+            if key not in series:
+                series[key] = Histogram(self._buckets[name])
+            series[key].observe(value)
+
+    def register_collector(self, collector: Callable[[], Iterable[Sample]]):
+        """``collector()`` returns (name, labels, value) samples of metrics declared here"""
+        self._collectors.append(collector)
+
+    def render(self) -> str:
+        collected: Dict[str, List[str]] = {}
+        for collector in self._collectors:
+            try:
+                for name, labels, value in collector():
+                    collected.setdefault(name, []).append(_sample_line(name, _label_key(labels), value))
+            except Exception as e:
+                logger.warning(f"Metrics collector failed: {str(e)}")
+
+        lines = []
+        with self._lock:
+            for name, (kind, help) in self._meta.items():
+                if kind == "counter":
+                    samples = [_sample_line(name, key, value) for key, value in self._counters[name].items()]
+                elif kind == "histogram":
+                    samples = [line for key, histogram in self._histograms[name].items()
+                               for line in histogram.lines(name, key)]
+                else:
+                    samples = []
+                samples += collected.get(name, [])
+                if samples:
+                    lines += [f"# HELP {name} {help}", f"# TYPE {name} {kind}", *samples]
+        return "\n".join(lines) + "\n"
+
+    def serve(self, port: int, host: str = "0.0.0.0") -> Optional[ThreadingHTTPServer]:
+        """Expose ``/metrics`` from a background thread, for processes without an API (app.worker)"""
+        registry = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                if self.path.split("?")[0] != "/metrics":
+                    self.send_error(404)
+                    return
+                body = registry.render().encode("utf-8")
+                self.send_response(200)
+                self.send_header("Content-Type", CONTENT_TYPE)
+                self.send_header("Content-Length", str(len(body)))
+                self.end_headers()
+                self.wfile.write(body)
+
+            def log_message(self, format, *args):
+                pass
+
+        try:
+            server = ThreadingHTTPServer((host, port), Handler)
+        except OSError as e:
+            logger.warning(f"Metrics endpoint not started on port {port}: {str(e)}")
+            return None
+        threading.Thread(target=server.serve_forever, name="metrics", daemon=True).start()
+        logger.info(f"Serving metrics on :{port}/metrics")
+        return server
+
+
+class DocumentTrace:
+    """Stage timings of one document, recorded into ``registry`` as they complete
+
+    ``as_dict`` is what gets stored on the document's processing_jobs row when
+    ``DOCUMENT_TRACE`` is enabled.
+    """
+
+    def __init__(self, registry: Optional[MetricsRegistry] = None):
+        self.registry = registry or metrics
+        self.stages: Dict[str, float] = {}
+        self.cache: Optional[str] = None
+        self._started = time.perf_counter()
+
+    @contextmanager
+    def stage(self, name: str) -> Iterator[None]:
+        timings: Dict[str, float] = {}
+        try:
+            with timed(timings, name):
+                yield
+        finally:
+            self.add(timings)
+
+    def add(self, timings: Dict[str, float]):
+        """Record timings measured elsewhere, e.g. returned by an OCR worker process"""
+        for name, seconds in timings.items():
+            self.stages[name] = self.stages.get(name, 0.0) + seconds
+            self.registry.observe("fra_stage_duration_seconds", seconds, stage=name)
+
+    @property
+    def elapsed(self) -> float:
+        return time.perf_counter() - self._started
+
+    def as_dict(self) -> Dict[str, Any]:
+        return {
+            "stages": {name: round(seconds, 4) for name, seconds in self.stages.items()},
+            "total": round(self.elapsed, 4),
+            "cache": self.cache,
+        }
+
+
+def register_service_metrics(processor, job_queue=None, tile_service=None, registry: Optional[MetricsRegistry] = None):
+    """Report the gauges and cache counters of this process's services on every scrape"""
+    registry = registry or metrics
+
+    def collect() -> Iterator[Sample]:
+        pool = processor.worker_pool
+        if pool is not None:
+            yield "fra_worker_pool_workers", {}, pool.max_workers
+            yield "fra_worker_pool_active", {}, pool.active
+            yield "fra_worker_pool_utilization", {}, min(pool.active, pool.max_workers) / pool.max_workers
+        cache = processor.result_cache
+        if cache is not None:
+            for result, counter in (("memory_hit", "memory_hits"), ("disk_hit", "disk_hits"), ("miss", "misses")):
+                yield "fra_result_cache_lookups_total", {"result": result}, cache.counters[counter]
+            yield "fra_result_cache_hit_ratio", {}, cache.stats()["hit_rate"]
+        write_behind = getattr(processor.db_service, "write_behind", None)
+        if write_behind is not None:
+            yield "fra_write_behind_pending_rows", {}, write_behind.pending
+            yield "fra_write_behind_flush_errors_total", {}, write_behind.counters["flush_errors"]
+            yield "fra_write_behind_dropped_rows_total", {}, write_behind.counters["rows_dropped"]
+        if job_queue is not None:
+            for state, count in job_queue.stats().items():
+                yield "fra_job_queue_jobs", {"state": state}, count
+        if tile_service is not None:
+            hits, misses = tile_service.counters["hits"], tile_service.counters["misses"]
+            yield "fra_tile_cache_requests_total", {"result": "hit"}, hits
+            yield "fra_tile_cache_requests_total", {"result": "miss"}, misses
+            yield "fra_tile_cache_hit_ratio", {}, hits / (hits + misses) if hits + misses else 0.0
+
+    registry.register_collector(collect)
+
+
+metrics = MetricsRegistry()
+metrics.histogram("fra_stage_duration_seconds", "Time spent in each pipeline stage per document")
+metrics.histogram("fra_document_duration_seconds", "End-to-end processing time per document")
+metrics.counter("fra_documents_processed_total", "Documents that finished processing, by outcome")
+metrics.gauge("fra_job_queue_jobs", "Jobs in the durable queue, by state")
+metrics.gauge("fra_worker_pool_workers", "OCR worker processes")
+metrics.gauge("fra_worker_pool_active", "Tasks running or waiting in the OCR worker pool")
+metrics.gauge("fra_worker_pool_utilization", "Fraction of OCR worker processes busy")
+metrics.counter("fra_result_cache_lookups_total", "OCR result cache lookups, by outcome")
+metrics.gauge("fra_result_cache_hit_ratio", "OCR result cache hits over lookups")
+metrics.counter("fra_tile_cache_requests_total", "Vector tile cache lookups, by outcome")
+metrics.gauge("fra_tile_cache_hit_ratio", "Vector tile cache hits over lookups")
+metrics.gauge("fra_write_behind_pending_rows", "Rows buffered for the next bulk database write")
+metrics.counter("fra_write_behind_flush_errors_total", "Failed bulk database writes")
+metrics.counter("fra_write_behind_dropped_rows_total", "Buffered rows dropped after repeated failed writes")
@@ -1,56 +1,110 @@
+import asyncio
+import os
 import cv2
 import numpy as np
 import pytesseract
 from PIL import Image
-import spacy
 from langdetect import detect
 import geopandas as gpd
 from shapely.geometry import Point, Polygon
 import json
-import re
-from typing import Dict, List, Optional, Tuple
+from datetime import datetime
+from typing import AsyncIterator, Dict, List, Optional, Sequence, Tuple
 import logging
+from concurrent.futures import ThreadPoolExecutor
+from fastapi.concurrency import iterate_in_threadpool
 
 from ..models.schemas import DocumentMetadata, OCRResult, NERResult, ClaimType, ClaimStatus
-from ..utils.preprocessing import ImagePreprocessor
+from ..utils.image_io import decode_image
+from ..utils.preprocessing import BoundingBox, ImagePreprocessor, PreprocessResult
+from ..utils.field_extractor import FRA_FIELD_EXTRACTOR
 from ..utils.geo_parser import GeoParser
-from .database import DatabaseService
+from ..utils.nlp_models import registry as nlp_registry
+from ..utils.pdf_pages import load_page, page_count
+from ..utils.script_router import ScriptRouter, iso_languages, merge_language_packs, tesseract_config
+from ..config import settings
+from .database import EXPORT_COLUMNS, HEAVY_COLUMNS, create_database_service
+from .metrics import DocumentTrace, metrics, timed
+from .result_cache import CachedAnalysis, ResultCache, cache_key, file_digest
+from .worker_pool import WorkerPool
 
 logger = logging.getLogger(__name__)
 
+# Feature properties written by the GeoJSON export
+GEOJSON_PROPERTIES = [
+    'document_id', 'state', 'district', 'village', 'patta_holder',
+    'claim_type', 'claim_status', 'area_hectares', 'plot_number'
+]
+
+FEATURE_COLLECTION = ('{"type": "FeatureCollection", "features": [', ']}')
+
+def _json_default(value):
+    if isinstance(value, datetime):
+        return value.isoformat()
+    return str(value)
+
+Timings = Dict[str, float]
+
+# Per-process analyzer used by the OCR worker pool
+_worker_processor = None
+
+def _init_worker():
+    global _worker_processor
+    # Cores are already shared out between worker processes (and ROI threads);
+    # Tesseract's own OpenMP threads would only oversubscribe them
+    os.environ.setdefault("OMP_THREAD_LIMIT", "1")
+    _worker_processor = DocumentProcessor(in_worker=True)
+
+# Worker results carry their stage timings back, since metrics live in the parent process
+def _analyze_in_worker(file_path: str, profile: Optional[str] = None) -> Tuple[OCRResult, str, NERResult, Timings]:
+    timings = {}
+    return (*_worker_processor.analyze_file(file_path, profile, timings), timings)
+
+def _ocr_pdf_page_in_worker(file_path: str, page_number: int, profile: Optional[str] = None,
+                            lang: Optional[str] = None) -> Tuple[OCRResult, Timings]:
+    timings = {}
+    return _worker_processor.ocr_pdf_page(file_path, page_number, profile, timings, lang), timings
+
+def _analyze_text_in_worker(text: str) -> Tuple[str, NERResult, Timings]:
+    timings = {}
+    return (*_worker_processor.analyze_text(text, timings), timings)
+
 class DocumentProcessor:
-    def __init__(self):
+    def __init__(self, worker_pool: Optional[WorkerPool] = None, in_worker: bool = False):
         self.preprocessor = ImagePreprocessor()
         self.geo_parser = GeoParser()
-        self.db_service = DatabaseService()
-        
-        # Load spaCy model (install: python -m spacy download en_core_web_sm)
-        try:
-            self.nlp = spacy.load("en_core_web_sm")
-        except OSError:
-            logger.warning("spaCy model not found. Install with: python -m spacy download en_core_web_sm")
-            self.nlp = None
+        # Worker processes only run the CPU-bound stages and never touch the database
+        self.db_service = None if in_worker else create_database_service()
+        self.worker_pool = None if in_worker else (worker_pool or WorkerPool(initializer=_init_worker))
+        self.result_cache = ResultCache() if settings.cache_enabled and not in_worker else None
+        self.ocr_lang = settings.ocr_lang
+        self.roi_ocr = settings.ocr_mode == "roi"
+        self.script_router = ScriptRouter(
+            settings.ocr_lang, settings.ocr_languages, settings.script_detect_max_side
+        ) if settings.ocr_language_routing else None
+
+    @property
+    def nlp(self):
+        """spaCy pipeline, loaded once per process on first use"""
+        return nlp_registry.get(settings.spacy_model)
 
-    async def process_document(self, document_id: str, file_path: str, state: str = None, district: str = None):
+    async def process_document(self, document_id: str, file_path: str, state: str = None, district: str = None,
+                               raise_errors: bool = False, content_key: Optional[str] = None,
+                               document_type: Optional[str] = None, cached: Optional[CachedAnalysis] = None):
         """Main processing pipeline"""
+        trace = DocumentTrace()
         try:
+            profile = self.preprocessor.profile_for(document_type)
+            
             # Update status
             await self.db_service.update_status(document_id, "processing")
             
-            # 1. Preprocessing
-            processed_image = self.preprocessor.enhance_image(file_path)
-            
-            # 2. OCR
-            ocr_result = self.perform_ocr(processed_image)
-            
-            # 3. Language detection
-            language = self.detect_language(ocr_result.text)
-            
-            # 4. NER and field extraction
-            ner_result = self.extract_entities(ocr_result.text)
+            # 1-4. Preprocessing, OCR, language detection and NER
+            ocr_result, language, ner_result = await self.analyze_cached(file_path, content_key, profile, trace, cached)
             
             # 5. Geo-parsing
-            coordinates = self.geo_parser.parse_coordinates(ocr_result.text, ner_result.extracted_fields)
+            with trace.stage("geoparse"):
+                coordinates = self.geo_parser.parse_coordinates(ocr_result.text, ner_result.extracted_fields)
             
             # 6. Create metadata
             metadata = DocumentMetadata(
@@ -67,52 +121,264 @@ class DocumentProcessor:
                 coordinates=coordinates,
                 ocr_confidence=ocr_result.confidence,
                 ner_confidence=ner_result.confidence,
-                languages=[language],
+                languages=list(dict.fromkeys([language] + iso_languages(ocr_result.language))),
                 raw_ocr_text=ocr_result.text,
                 extracted_fields=ner_result.extracted_fields
             )
             
             # 7. Save to database
-            await self.db_service.save_document(metadata)
-            await self.db_service.update_status(document_id, "completed")
+            with trace.stage("db_save"):
+                await self.db_service.save_document(metadata)
+            self._finish_trace(trace, "completed")
+            await self.db_service.update_status(document_id, "completed", trace=self._stored_trace(trace))
             
             logger.info(f"Successfully processed document {document_id}")
             
         except Exception as e:
             logger.error(f"Error processing document {document_id}: {str(e)}")
-            await self.db_service.update_status(document_id, "failed", str(e))
+            self._finish_trace(trace, "failed")
+            if raise_errors:
+                # The queue worker decides between retrying and failing the job
+                raise
+            await self.db_service.update_status(document_id, "failed", str(e), trace=self._stored_trace(trace))
+
+    def _finish_trace(self, trace: DocumentTrace, outcome: str):
+        metrics.observe("fra_document_duration_seconds", trace.elapsed)
+        metrics.inc("fra_documents_processed_total", status=outcome)
+        logger.debug(f"Stage timings ({outcome}): {trace.as_dict()}")
+
+    def _stored_trace(self, trace: DocumentTrace) -> Optional[Dict]:
+        return trace.as_dict() if settings.document_trace else None
+
+    def analysis_config(self, profile: Optional[str] = None) -> Dict:
+        """Every setting that changes OCR/NER output; part of the result cache key"""
+        return {
+            "lang": self.ocr_lang,
+            "language_routing": settings.ocr_language_routing,
+            "languages": settings.ocr_languages,
+            "psm": settings.tesseract_psm,
+            "oem": settings.tesseract_oem,
+            "preprocessing": self.preprocessor.fingerprint(profile, self.roi_ocr),
+            "ocr_mode": settings.ocr_mode,
+            "pdf_dpi": settings.pdf_dpi,
+            "spacy_model": settings.spacy_model,
+        }
+
+    async def cache_key_for(self, file_path: str, profile: Optional[str] = None,
+                            digest: Optional[str] = None) -> str:
+        """``digest`` is the content hash when it is already known (e.g. from the upload spooler)"""
+        digest = digest or await asyncio.to_thread(file_digest, file_path)
+        return cache_key(digest, self.analysis_config(profile))
+
+    async def analyze_cached(self, file_path: str, key: Optional[str] = None, profile: Optional[str] = None,
+                             trace: Optional[DocumentTrace] = None,
+                             cached: Optional[CachedAnalysis] = None) -> Tuple[OCRResult, str, NERResult]:
+        """Return the cached analysis for identical content, else run it in the worker pool
 
-    def perform_ocr(self, image: np.ndarray) -> OCRResult:
+        ``cached`` is an entry the caller already read from the cache, so it
+        cannot be evicted between that lookup and this one.
+        """
+        trace = trace or DocumentTrace()
+        if self.result_cache:
+            key = key or await self.cache_key_for(file_path, profile)
+            # Disk reads (and put's eviction scan) stay off the event loop
+            cached = cached or await asyncio.to_thread(self.result_cache.get, key)
+            trace.cache = "hit" if cached else "miss"
+            if cached:
+                logger.info(f"OCR cache hit for {file_path}")
+                return cached
+        
+        if file_path.lower().endswith('.pdf'):
+            ocr_result = await self.ocr_pdf(file_path, profile, trace)
+            language, ner_result, timings = await self.worker_pool.run(_analyze_text_in_worker, ocr_result.text)
+        else:
+            ocr_result, language, ner_result, timings = await self.worker_pool.run(_analyze_in_worker, file_path, profile)
+        trace.add(timings)
+        
+        if key:
+            await asyncio.to_thread(self.result_cache.put, key, ocr_result, language, ner_result)
+        return ocr_result, language, ner_result
+
+    def analyze_file(self, file_path: str, profile: Optional[str] = None,
+                     timings: Optional[Timings] = None) -> Tuple[OCRResult, str, NERResult]:
+        """Run the CPU-bound stages for one file (called inside a worker process)"""
+        timings = {} if timings is None else timings
+        with timed(timings, "load"):
+            image = decode_image(file_path)
+        with timed(timings, "preprocess"):
+            processed = self.preprocessor.run(image, profile, detect_regions=self.roi_ocr)
+        self._log_stage_timings(file_path, processed)
+        with timed(timings, "ocr"):
+            ocr_result = self.ocr_processed(processed)
+        language, ner_result = self.analyze_text(ocr_result.text, timings)
+        return ocr_result, language, ner_result
+
+    def analyze_text(self, text: str, timings: Optional[Timings] = None) -> Tuple[str, NERResult]:
+        """Language detection and NER over already extracted text"""
+        timings = {} if timings is None else timings
+        with timed(timings, "langdetect"):
+            language = self.detect_language(text)
+        with timed(timings, "ner"):
+            ner_result = self.extract_entities(text)
+        return language, ner_result
+
+    async def ocr_pdf(self, file_path: str, profile: Optional[str] = None,
+                      trace: Optional[DocumentTrace] = None) -> OCRResult:
+        """OCR a PDF page by page across the worker pool and stitch pages back in order
+
+        Each worker opens the file and renders only its own page, so memory is
+        bounded by the number of workers rather than the page count. At most
+        ``max_workers`` pages of one document are in the pool at a time, so a
+        long PDF cannot take every queue slot from other uploads.
+        
+        When script routing can narrow the language pack, the first page is
+        read on its own and the pack it was read with is used for the rest of
+        the document, so the script-detection pass runs once per document
+        rather than once per page. Pages are routed individually only when the
+        first page has no text.
+        """
+        count = await asyncio.to_thread(page_count, file_path)
+        in_flight = asyncio.Semaphore(self.worker_pool.max_workers)
+        
+        lang, first = None, []
+        if count > 1 and self.script_router and self.script_router.narrows:
+            first = [await self.worker_pool.run(_ocr_pdf_page_in_worker, file_path, 0, profile)]
+            if first[0][0].text.strip():
+                lang = first[0][0].language
+        
+        async def ocr_page(number: int):
+            async with in_flight:
+                return await self.worker_pool.run(_ocr_pdf_page_in_worker, file_path, number, profile, lang)
+        
+        results = first + list(await asyncio.gather(*(ocr_page(number) for number in range(len(first), count))))
+        pages = [page for page, _ in results]
+        if trace:
+            # Per-page times are summed: the document's CPU time per stage, not wall time
+            for _, timings in results:
+                trace.add(timings)
+        
+        confidences = [page.confidence for page in pages if page.text.strip()]
+        return OCRResult(
+            text="\n\n".join(page.text for page in pages),
+            confidence=float(np.mean(confidences)) if confidences else 0.0,
+            language=merge_language_packs([page.language for page in pages if page.text.strip()]) or self.ocr_lang
+        )
+
+    def ocr_pdf_page(self, file_path: str, page_number: int, profile: Optional[str] = None,
+                     timings: Optional[Timings] = None, lang: Optional[str] = None) -> OCRResult:
+        """Use the embedded text layer if the page has one, otherwise render and OCR it (in ``lang`` if given)"""
+        timings = {} if timings is None else timings
+        with timed(timings, "load"):
+            page = load_page(file_path, page_number, settings.pdf_dpi, settings.pdf_min_text_chars)
+        if not page.needs_ocr:
+            language = self.script_router.route_text(page.text) if self.script_router else self.ocr_lang
+            return OCRResult(text=page.text, confidence=1.0, language=language)
+        
+        with timed(timings, "preprocess"):
+            processed = self.preprocessor.run(page.image, profile, detect_regions=self.roi_ocr)
+        self._log_stage_timings(f"{file_path} page {page_number + 1}", processed)
+        with timed(timings, "ocr"):
+            return self.ocr_processed(processed, lang)
+
+    def _log_stage_timings(self, source: str, processed: PreprocessResult):
+        stages = ", ".join(f"{t.name} {t.seconds * 1000:.0f}ms/{t.bytes_allocated // 1024}KiB" for t in processed.timings)
+        logger.debug(f"Preprocessed {source} with profile {processed.profile} in {processed.seconds * 1000:.0f}ms: {stages}")
+
+    def ocr_processed(self, processed: PreprocessResult, lang: Optional[str] = None) -> OCRResult:
+        """OCR a preprocessed page, restricted to its text regions in ROI mode"""
+        # Script pre-pass: load only the language pack the page is written in
+        if lang is None:
+            lang = self.script_router.route(processed.image) if self.script_router else self.ocr_lang
+        if self.roi_ocr:
+            return self.perform_ocr_roi(processed.image, processed.text_regions, lang)
+        return self.perform_ocr(processed.image, lang)
+
+    def perform_ocr(self, image: np.ndarray, lang: Optional[str] = None) -> OCRResult:
         """Perform OCR with Tesseract"""
+        lang = lang or self.ocr_lang
         try:
-            # Convert numpy array to PIL Image
-            pil_image = Image.fromarray(image)
+            # Extract text and calculate confidence
+            words = self._ocr_words(image, settings.tesseract_psm, lang)
+            text = ' '.join(word['text'] for word in words)
+            confidences = [word['confidence'] for word in words]
+            avg_confidence = np.mean(confidences) if confidences else 0
             
-            # OCR with confidence data
-            data = pytesseract.image_to_data(pil_image, output_type=pytesseract.Output.DICT, lang='eng+hin')
+            return OCRResult(
+                text=text,
+                confidence=avg_confidence / 100.0,  # Normalize to 0-1
+                language=lang
+            )
             
-            # Extract text and calculate confidence
-            text_parts = []
-            confidences = []
+        except Exception as e:
+            logger.error(f"OCR failed: {str(e)}")
+            return OCRResult(text="", confidence=0.0, language="unknown")
+
+    def perform_ocr_roi(self, image: np.ndarray, regions: List[BoundingBox], lang: Optional[str] = None) -> OCRResult:
+        """OCR only the text blocks merged from MSER regions, stitched back in reading order
+        
+        Blocks are OCRed concurrently as single uniform blocks of text (``--psm 6``).
+        Pages with no detected text, or so much that the blocks cover most of the
+        page, fall back to whole-page OCR.
+        """
+        blocks = self.preprocessor.merge_text_regions(regions, image.shape)
+        coverage = sum(w * h for _, _, w, h in blocks) / float(image.shape[0] * image.shape[1])
+        if not blocks or coverage > settings.roi_max_coverage:
+            return self.perform_ocr(image, lang)
+        lang = lang or self.ocr_lang
+        
+        try:
+            with ThreadPoolExecutor(max_workers=settings.roi_ocr_threads) as executor:
+                block_words = list(executor.map(lambda block: self._ocr_words(image, 6, lang, block), blocks))
             
-            for i, conf in enumerate(data['conf']):
-                if int(conf) > 0:  # Filter out low confidence
-                    text_parts.append(data['text'][i])
-                    confidences.append(int(conf))
+            lines = []
+            bounding_boxes = []
+            for index, words in enumerate(block_words):
+                if words:
+                    lines.append(' '.join(word['text'] for word in words))
+                bounding_boxes.extend({**word, 'block': index} for word in words)
             
-            text = ' '.join(text_parts)
+            confidences = [word['confidence'] for word in bounding_boxes]
             avg_confidence = np.mean(confidences) if confidences else 0
             
             return OCRResult(
-                text=text,
+                text='\n'.join(lines),
                 confidence=avg_confidence / 100.0,  # Normalize to 0-1
-                language="multi"
+                language=lang,
+                bounding_boxes=bounding_boxes
             )
             
         except Exception as e:
-            logger.error(f"OCR failed: {str(e)}")
+            logger.error(f"ROI OCR failed: {str(e)}")
             return OCRResult(text="", confidence=0.0, language="unknown")
 
+    def _ocr_words(self, image: np.ndarray, psm: int, lang: str, block: Optional[BoundingBox] = None) -> List[Dict]:
+        """Recognised words with confidence and page coordinates, optionally from one block only"""
+        x0, y0 = 0, 0
+        if block is not None:
+            x0, y0, w, h = block
+            image = image[y0:y0 + h, x0:x0 + w]
+        
+        # OCR with confidence data
+        data = pytesseract.image_to_data(
+            Image.fromarray(image),
+            output_type=pytesseract.Output.DICT,
+            lang=lang,
+            config=tesseract_config(settings.tesseract_oem, psm)
+        )
+        
+        words = []
+        for i, conf in enumerate(data['conf']):
+            if int(conf) > 0:  # Filter out low confidence
+                words.append({
+                    'text': data['text'][i],
+                    'confidence': int(conf),
+                    'left': x0 + data['left'][i],
+                    'top': y0 + data['top'][i],
+                    'width': data['width'][i],
+                    'height': data['height'][i]
+                })
+        return words
+
     def detect_language(self, text: str) -> str:
         """Detect primary language of text"""
         try:
@@ -120,45 +386,42 @@ class DocumentProcessor:
         except:
             return "en"  # Default to English
 
-    def extract_entities(self, text: str) -> NERResult:
+    def extract_entities_batch(self, texts: List[str]) -> List[NERResult]:
+        """Extract entities for many texts with a single batched spaCy pass"""
+        docs = nlp_registry.pipe(texts, settings.spacy_model)
+        return [self.extract_entities(text, doc) for text, doc in zip(texts, docs)]
+
+    def extract_entities(self, text: str, doc=None) -> NERResult:
         """Extract FRA-specific entities using rules and NLP"""
         entities = []
         extracted_fields = {}
         
-        # Rule-based extraction patterns
-        patterns = {
-            'village': r'(?:Village|ग्राम|गाँव)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)',
-            'district': r'(?:District|जिला)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)',
-            'state': r'(?:State|राज्य)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)',
-            'patta_holder': r'(?:Name|नाम|Holder)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)',
-            'area_hectares': r'(\d+\.?\d*)\s*(?:hectare|हेक्टेयर|acre|एकड़)',
-            'plot_number': r'(?:Plot|Survey|खसरा)\s*(?:No\.?|Number)?\s*:?\s*([A-Za-z0-9\/\-]+)',
-            'claim_type': r'(IFR|CFR|CR|Individual|Community|Forest Rights)',
-            'claim_status': r'(Pending|Verified|Granted|Rejected|स्वीकृत|लंबित)'
-        }
-        
-        for field, pattern in patterns.items():
-            matches = re.findall(pattern, text, re.IGNORECASE)
-            if matches:
-                if field == 'patta_holder':
-                    extracted_fields[field] = [match.strip() for match in matches]
-                elif field == 'area_hectares':
+        # Rule-based extraction: precompiled patterns, each searched until its first match
+        for field, match in FRA_FIELD_EXTRACTOR.extract(text).items():
+            if field == 'patta_holder':
+                extracted_fields[field] = [m.value.strip() for m in match]
+                spans = [[m.start, m.end] for m in match]
+            else:
+                if field == 'area_hectares':
                     try:
-                        extracted_fields[field] = float(matches[0])
-                    except:
+                        extracted_fields[field] = float(match.value)
+                    except ValueError:
                         extracted_fields[field] = None
                 else:
-                    extracted_fields[field] = matches[0].strip()
-                
-                entities.append({
-                    'label': field,
-                    'value': extracted_fields[field],
-                    'confidence': 0.8  # Rule-based confidence
-                })
+                    extracted_fields[field] = match.value.strip()
+                spans = [[match.start, match.end]]
+            
+            entities.append({
+                'label': field,
+                'value': extracted_fields[field],
+                'confidence': 0.8,  # Rule-based confidence
+                'spans': spans
+            })
         
         # Use spaCy for additional entity extraction if available
-        if self.nlp:
+        if doc is None and self.nlp:
             doc = self.nlp(text)
+        if doc is not None:
             for ent in doc.ents:
                 if ent.label_ in ['PERSON', 'GPE', 'ORG']:
                     entities.append({
@@ -207,13 +470,7 @@ class DocumentProcessor:
 
     async def export_data(self, format: str, state: str = None, district: str = None, village: str = None):
         """Export processed data in various formats"""
-        filters = {}
-        if state:
-            filters['state'] = state
-        if district:
-            filters['district'] = district
-        if village:
-            filters['village'] = village
+        filters = self._export_filters(state, district, village)
         
         data = await self.db_service.get_documents(filters)
         
@@ -224,6 +481,65 @@ class DocumentProcessor:
         elif format == 'shapefile':
             return await self._create_shapefile(data)
 
+    async def stream_export(self, format: str, state: str = None, district: str = None, village: str = None,
+                            include: Sequence[str] = ()) -> AsyncIterator[str]:
+        """Export as JSON or GeoJSON text, one chunk per database batch
+        
+        Only one batch of rows is in memory at a time, so state-wide exports run
+        in constant memory. Heavy columns (raw OCR text, extracted fields) are
+        left out unless named in ``include``.
+        """
+        heavy = [name for name in HEAVY_COLUMNS if name in include]
+        if format == 'geojson':
+            columns = GEOJSON_PROPERTIES + heavy
+            opening, closing = FEATURE_COLLECTION
+            encode = self._feature_json
+        else:
+            columns = EXPORT_COLUMNS + heavy
+            opening, closing = '{"documents": [', ']}'
+            encode = self._document_json
+        
+        batches = self.db_service.stream_documents(
+            self._export_filters(state, district, village), columns, require_geometry=format == 'geojson'
+        )
+        if not hasattr(batches, '__aiter__'):
+            # Blocking cursor: fetch each batch in the threadpool
+            batches = iterate_in_threadpool(batches)
+        
+        yield opening
+        separator = ''
+        async for rows in batches:
+            if rows:
+                yield separator + ','.join(encode(row) for row in rows)
+                separator = ','
+        yield closing
+
+    def feature_collection(self, rows: List[Dict]) -> str:
+        """GeoJSON FeatureCollection text for rows from the database service"""
+        opening, closing = FEATURE_COLLECTION
+        return opening + ','.join(self._feature_json(row) for row in rows) + closing
+
+    def _feature_json(self, row: Dict) -> str:
+        # The geometry is GeoJSON text already; splice it in rather than re-encoding
+        geometry = row.pop('geometry') or 'null'
+        properties = json.dumps(row, default=_json_default, ensure_ascii=False)
+        return f'{{"type": "Feature", "properties": {properties}, "geometry": {geometry}}}'
+
+    def _document_json(self, row: Dict) -> str:
+        geometry = row.pop('geometry') or 'null'
+        properties = json.dumps(row, default=_json_default, ensure_ascii=False)
+        return f'{properties[:-1]}, "coordinates": {geometry}}}'
+
+    def _export_filters(self, state: str = None, district: str = None, village: str = None) -> Dict[str, str]:
+        filters = {}
+        if state:
+            filters['state'] = state
+        if district:
+            filters['district'] = district
+        if village:
+            filters['village'] = village
+        return filters
+
     def _create_geojson(self, documents: List[DocumentMetadata]) -> Dict:
         """Create GeoJSON from documents"""
         features = []
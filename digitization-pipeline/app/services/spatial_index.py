@@ -0,0 +1,83 @@
+import logging
+import threading
+from typing import Any, List, Optional, Sequence, Tuple
+
+import numpy as np
+import shapely
+
+from ..utils.geometry_codec import decode_geometries
+
+logger = logging.getLogger(__name__)
+
+BBox = Tuple[float, float, float, float]
+
+
+class SpatialIndex:
+    """In-process STRtree over fra_records geometries, for databases without PostGIS
+
+    The owning service reloads ``(document_id, geom)`` pairs with ``rebuild``
+    whenever the records version read from the database (which moves on every
+    write, from any process) differs from the one the index was built at.
+    Queries return document ids, nearest first where that applies; coordinates
+    are lon/lat degrees like PostGIS on EPSG:4326.
+    """
+
+    def __init__(self):
+        # (ids, geometries, tree), swapped as one so queries never mix two builds
+        self._state = (np.empty(0, dtype=object), np.empty(0, dtype=object), shapely.STRtree([]))
+        self._version: Optional[str] = None
+        self._lock = threading.Lock()
+
+    def stale(self, version: str) -> bool:
+        return self._version != version
+
+    def rebuild(self, document_ids: Sequence[str], values: Sequence[Any], version: str):
+        """Index the given rows; ``version`` is the records version read before loading them"""
+        geoms = decode_geometries(values)
+        valid = shapely.get_type_id(geoms) >= 0
+        ids, geoms = np.asarray(document_ids, dtype=object)[valid], geoms[valid]
+        tree = shapely.STRtree(geoms)
+        with self._lock:
+            self._state = (ids, geoms, tree)
+            self._version = version
+        logger.info(f"Spatial index rebuilt over {len(ids)} parcels")
+
+    def features_in_bbox(self, bbox: BBox) -> Tuple[List[str], np.ndarray]:
+        """Ids and geometries of every parcel intersecting the box"""
+        ids, geoms, tree = self._state
+        hits = np.sort(tree.query(shapely.box(*bbox), predicate="intersects"))
+        return ids[hits].tolist(), geoms[hits]
+
+    def bbox(self, bbox: BBox, limit: int) -> List[str]:
+        ids, _, tree = self._state
+        hits = tree.query(shapely.box(*bbox), predicate="intersects")
+        return ids[np.sort(hits)[:limit]].tolist()
+
+    def containing(self, lon: float, lat: float) -> List[str]:
+        ids, _, tree = self._state
+        # predicate is evaluated as point.within(parcel)
+        hits = tree.query(shapely.Point(lon, lat), predicate="within")
+        return ids[np.sort(hits)].tolist()
+
+    def nearest(self, lon: float, lat: float, n: int) -> List[str]:
+        ids, geoms, tree = self._state
+        if not len(geoms) or n <= 0:
+            return []
+        point = shapely.Point(lon, lat)
+        nearest, distance = tree.query_nearest(point, return_distance=True)
+        if n == 1:
+            return ids[nearest[:1]].tolist()
+        
+        # STRtree.query_nearest only returns the single closest (plus ties), so grow
+        # a box around the point until n parcels lie within its half-width. Every
+        # parcel closer than that intersects the box, so the top n are candidates.
+        n = min(n, len(geoms))
+        radius = float(distance[0]) or 1e-4
+        while True:
+            candidates = tree.query(shapely.box(lon - radius, lat - radius, lon + radius, lat + radius))
+            distances = shapely.distance(geoms[candidates], point)
+            if np.count_nonzero(distances <= radius) >= n or len(candidates) == len(geoms):
+                break
+            radius *= 2
+        order = np.argsort(distances, kind="stable")[:n]
+        return ids[candidates[order]].tolist()
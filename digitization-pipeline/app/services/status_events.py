@@ -0,0 +1,128 @@
+import asyncio
+import logging
+from collections import Counter, OrderedDict
+from datetime import datetime
+from typing import Any, AsyncIterator, Dict, List, Optional, Sequence, Set
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+TERMINAL_STATUSES = {"completed", "failed"}
+
+
+class BatchState:
+    def __init__(self, document_ids: Sequence[str]):
+        self.statuses: Dict[str, Optional[str]] = dict.fromkeys(document_ids)
+        self.subscribers: Set[asyncio.Queue] = set()
+
+    @property
+    def done(self) -> bool:
+        return all(status in TERMINAL_STATUSES for status in self.statuses.values())
+
+    def counts(self) -> Dict[str, int]:
+        return dict(Counter(status or "unknown" for status in self.statuses.values()))
+
+
+class StatusBroker:
+    """In-process pub/sub of ProcessingJob transitions, keyed by batch_id
+
+    Status writes made in this process reach subscribers immediately through
+    the database service's ``status_listeners``. Writes from other processes
+    (``python -m app.worker``) are picked up by a single watcher that, while
+    anyone is subscribed, reads the pending documents of watched batches once
+    per ``status_poll_interval`` -- one query for all clients instead of one
+    poll per document per client.
+
+    Batches are known from ``register_batch`` (called by /ingest-batch); the
+    registry is in memory and keeps the ``status_max_batches`` most recent.
+    """
+
+    def __init__(self, db_service, poll_interval: Optional[float] = None, max_batches: Optional[int] = None):
+        self.db_service = db_service
+        self.poll_interval = poll_interval or settings.status_poll_interval
+        self.max_batches = max_batches or settings.status_max_batches
+        self._batches: "OrderedDict[str, BatchState]" = OrderedDict()
+        self._batch_of: Dict[str, str] = {}
+        self._watcher: Optional[asyncio.Task] = None
+        db_service.status_listeners.append(self.publish)
+
+    def register_batch(self, batch_id: str, document_ids: Sequence[str]):
+        self._batches[batch_id] = BatchState(document_ids)
+        for document_id in document_ids:
+            self._batch_of[document_id] = batch_id
+        # Forget the oldest batches nobody is listening to
+        for old_id in list(self._batches):
+            if len(self._batches) <= self.max_batches:
+                break
+            if not self._batches[old_id].subscribers:
+                for document_id in self._batches.pop(old_id).statuses:
+                    self._batch_of.pop(document_id, None)
+
+    def has_batch(self, batch_id: str) -> bool:
+        return batch_id in self._batches
+
+    def publish(self, row: Dict[str, Any]):
+        """Record one status row and push it to the batch's subscribers if it changed"""
+        batch_id = self._batch_of.get(row["document_id"])
+        state = self._batches.get(batch_id) if batch_id else None
+        if state is None or state.statuses.get(row["document_id"]) == row["status"]:
+            return
+        state.statuses[row["document_id"]] = row["status"]
+        event = {
+            "type": "status",
+            "batch_id": batch_id,
+            "document_id": row["document_id"],
+            "status": row["status"],
+            "error_message": row.get("error_message"),
+            "updated_at": row.get("updated_at") or datetime.utcnow(),
+            "counts": state.counts(),
+        }
+        for queue in state.subscribers:
+            queue.put_nowait(event)
+
+    async def subscribe(self, batch_id: str, heartbeat: float = 15.0) -> AsyncIterator[Dict[str, Any]]:
+        """Snapshot of the batch, then each transition, then a final ``done`` event
+
+        A ``heartbeat`` event is yielded after ``heartbeat`` idle seconds so
+        proxies keep the connection open.
+        """
+        state = self._batches[batch_id]
+        queue: asyncio.Queue = asyncio.Queue()
+        state.subscribers.add(queue)
+        if self._watcher is None or self._watcher.done():
+            self._watcher = asyncio.create_task(self._watch())
+        try:
+            await self._refresh([state])
+            # Everything queued so far is already in the snapshot
+            while not queue.empty():
+                queue.get_nowait()
+            yield {"type": "snapshot", "batch_id": batch_id, "statuses": dict(state.statuses), "counts": state.counts()}
+
+            while not state.done:
+                try:
+                    yield await asyncio.wait_for(queue.get(), heartbeat)
+                except asyncio.TimeoutError:
+                    yield {"type": "heartbeat"}
+            while not queue.empty():
+                yield queue.get_nowait()
+            yield {"type": "done", "batch_id": batch_id, "counts": state.counts()}
+        finally:
+            state.subscribers.discard(queue)
+
+    async def _watch(self):
+        while any(state.subscribers for state in self._batches.values()):
+            await asyncio.sleep(self.poll_interval)
+            try:
+                await self._refresh([state for state in self._batches.values() if state.subscribers])
+            except Exception as e:
+                logger.warning(f"Status watcher refresh failed: {str(e)}")
+
+    async def _refresh(self, states: List[BatchState]):
+        pending = [
+            document_id for state in states
+            for document_id, status in state.statuses.items() if status not in TERMINAL_STATUSES
+        ]
+        if pending:
+            for row in (await self.db_service.get_statuses(pending)).values():
+                self.publish(row)
@@ -0,0 +1,188 @@
+import asyncio
+import gzip
+import hashlib
+import logging
+import math
+import os
+import shutil
+import threading
+import time
+from typing import Any, List, Optional, Tuple
+
+import numpy as np
+import shapely
+
+from ..config import settings
+from ..utils.mvt import encode_layer
+
+logger = logging.getLogger(__name__)
+
+LAYER = "parcels"
+
+# Web Mercator (EPSG:3857) half-width in metres, and its latitude limit
+ORIGIN = 20037508.342789244
+EARTH_RADIUS = 6378137.0
+MAX_LATITUDE = 85.0511287798
+
+# Attribute thinning: (highest zoom, properties written at that zoom and below)
+TILE_ATTRIBUTES: List[Tuple[int, List[str]]] = [
+    (8, ['state']),
+    (11, ['state', 'district', 'village', 'claim_type', 'claim_status']),
+    (99, ['document_id', 'state', 'district', 'village', 'claim_type', 'claim_status',
+          'patta_holder', 'area_hectares', 'plot_number']),
+]
+
+
+def tile_columns(z: int) -> List[str]:
+    return next(columns for max_zoom, columns in TILE_ATTRIBUTES if z <= max_zoom)
+
+
+def tile_lonlat_bounds(z: int, x: int, y: int) -> Tuple[float, float, float, float]:
+    n = 2 ** z
+
+    def lat(row: float) -> float:
+        return math.degrees(math.atan(math.sinh(math.pi * (1 - 2 * row / n))))
+
+    return x / n * 360.0 - 180.0, lat(y + 1), (x + 1) / n * 360.0 - 180.0, lat(y)
+
+
+class TileService:
+    """Mapbox Vector Tiles of fra_records, cached on disk per records version
+
+    PostGIS builds tiles itself (ST_AsMVT); on other databases parcels come
+    from the in-process STRtree and are projected, clipped and encoded here.
+    Either way geometry is simplified to ``tile_simplify_tolerance`` tile units
+    for the zoom, parcels under ``tile_min_area`` become points (one per pixel),
+    and only the zoom's TILE_ATTRIBUTES are written.
+
+    Tiles are stored gzipped under a directory named after the database's
+    records version; when records change (written by any process) the next
+    request moves to a fresh directory and older ones are deleted.
+    """
+
+    def __init__(self, db_service, cache_dir: Optional[str] = None):
+        self.db_service = db_service
+        self.cache_dir = cache_dir or settings.tile_cache_dir
+        self.extent = settings.tile_extent
+        self.buffer = settings.tile_buffer
+        self._version_key: Optional[str] = None
+        self._checked_at = 0.0
+        self.counters = {"hits": 0, "misses": 0}
+        os.makedirs(self.cache_dir, exist_ok=True)
+
+    def valid(self, z: int, x: int, y: int) -> bool:
+        return 0 <= z <= settings.tile_max_zoom and 0 <= x < 2 ** z and 0 <= y < 2 ** z
+
+    async def get_tile(self, z: int, x: int, y: int) -> bytes:
+        """Gzipped MVT bytes for one tile"""
+        version_key = await self._current_version()
+        path = os.path.join(self.cache_dir, version_key, str(z), str(x), f"{y}.mvt.gz")
+        # File I/O and compression run in a thread so a burst of tile requests does not stall the loop
+        tile = await asyncio.to_thread(self._read_cached, path)
+        if tile is not None:
+            self.counters["hits"] += 1
+            return tile
+
+        self.counters["misses"] += 1
+        return await asyncio.to_thread(self._store, path, await self.render(z, x, y))
+
+    async def render(self, z: int, x: int, y: int) -> bytes:
+        columns = tile_columns(z)
+        # One tile unit in degrees of longitude at this zoom
+        unit = 360.0 / (2 ** z * self.extent)
+        if self.db_service.engine is None:
+            return encode_layer(LAYER, [], self.extent)
+        if self.db_service.spatial_index is None:
+            # PostGIS
+            return await self.db_service.parcels_mvt(
+                z, x, y, columns, LAYER, self.extent, self.buffer,
+                settings.tile_simplify_tolerance * unit, settings.tile_min_area * unit * unit
+            )
+
+        west, south, east, north = tile_lonlat_bounds(z, x, y)
+        pad = self.buffer * unit
+        rows, geoms = await self.db_service.parcel_geometries(
+            (west - pad, south - pad, east + pad, north + pad), columns
+        )
+        return encode_layer(LAYER, self._tile_features(z, x, y, rows, geoms), self.extent)
+
+    def stats(self):
+        return {**self.counters, "version": self._version_key}
+
+    def _tile_features(self, z: int, x: int, y: int, rows: List[dict], geoms: np.ndarray) -> List[Tuple[Any, dict]]:
+        if not len(geoms):
+            return []
+        size = 2 * ORIGIN / 2 ** z
+        min_x, max_y = -ORIGIN + x * size, ORIGIN - y * size
+        scale = self.extent / size
+
+        def to_tile(coords: np.ndarray) -> np.ndarray:
+            lon = np.radians(coords[:, 0])
+            lat = np.radians(np.clip(coords[:, 1], -MAX_LATITUDE, MAX_LATITUDE))
+            mx = EARTH_RADIUS * lon
+            my = EARTH_RADIUS * np.log(np.tan(np.pi / 4 + lat / 2))
+            return np.column_stack(((mx - min_x) * scale, (max_y - my) * scale))
+
+        limit = self.extent + self.buffer
+        geoms = shapely.clip_by_rect(shapely.transform(geoms, to_tile), -self.buffer, -self.buffer, limit, limit)
+        small = shapely.area(geoms) < settings.tile_min_area
+        geoms[~small] = shapely.simplify(geoms[~small], settings.tile_simplify_tolerance, preserve_topology=True)
+        geoms[small] = shapely.point_on_surface(geoms[small])
+        geoms = shapely.set_precision(geoms, 1.0)
+        # Exterior rings must have positive area in (y-down) tile coordinates
+        types = shapely.get_type_id(geoms)
+        polygons = np.isin(types, [shapely.GeometryType.POLYGON, shapely.GeometryType.MULTIPOLYGON])
+        geoms[polygons] = shapely.orient_polygons(geoms[polygons], exterior_cw=False)
+        # Clipping can leave slivers as lines or collections; only points and polygons are drawn
+        drawable = (polygons | (types == shapely.GeometryType.POINT)) & ~shapely.is_empty(geoms)
+
+        features = []
+        cell = max(1, self.extent // 256)
+        drawn_points = set()
+        for geometry, row, is_point, keep in zip(geoms, rows, small, drawable):
+            if not keep:
+                continue
+            if is_point:
+                # Below a pixel, one point per pixel says as much as all of them
+                key = (int(geometry.x) // cell, int(geometry.y) // cell)
+                if key in drawn_points:
+                    continue
+                drawn_points.add(key)
+            features.append((geometry, row))
+        return features
+
+    async def _current_version(self) -> str:
+        now = time.monotonic()
+        if self._version_key is None or now - self._checked_at > settings.tile_version_ttl:
+            version = await self.db_service.records_version()
+            version_key = hashlib.sha1(version.encode()).hexdigest()[:16]
+            self._checked_at = now
+            if version_key != self._version_key:
+                self._version_key = version_key
+                await asyncio.to_thread(self._purge, version_key)
+        return self._version_key
+
+    @staticmethod
+    def _read_cached(path: str) -> Optional[bytes]:
+        try:
+            with open(path, "rb") as f:
+                return f.read()
+        except FileNotFoundError:
+            return None
+
+    @staticmethod
+    def _store(path: str, mvt: bytes) -> bytes:
+        """Gzip a rendered tile and write it to the cache atomically"""
+        tile = gzip.compress(mvt, compresslevel=6)
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        tmp_path = f"{path}.{os.getpid()}.{threading.get_ident()}.tmp"
+        with open(tmp_path, "wb") as f:
+            f.write(tile)
+        os.replace(tmp_path, path)
+        return tile
+
+    def _purge(self, keep: str):
+        """Delete tiles rendered for earlier records versions"""
+        for name in os.listdir(self.cache_dir):
+            if name != keep:
+                shutil.rmtree(os.path.join(self.cache_dir, name), ignore_errors=True)
@@ -0,0 +1,111 @@
+import asyncio
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor
+from typing import Any, Callable, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+
+class WorkerPoolSaturated(Exception):
+    """Raised when the pool has no free slot and the caller asked not to wait"""
+
+
+class WorkerPool:
+    """Bounded process pool for CPU-bound pipeline stages
+
+    Work is submitted from the event loop and awaited without blocking it.
+    At most ``max_workers + queue_size`` tasks are admitted at once; further
+    callers wait for a slot (or are rejected when ``wait=False``), which
+    gives the upload endpoints natural back-pressure. A task that times out
+    keeps its slot until its worker process actually finishes it.
+    """
+
+    def __init__(
+        self,
+        max_workers: Optional[int] = None,
+        queue_size: Optional[int] = None,
+        timeout: Optional[float] = None,
+        initializer: Optional[Callable] = None,
+        initargs: tuple = (),
+    ):
+        self.max_workers = max_workers or settings.ocr_workers or os.cpu_count() or 1
+        self.queue_size = settings.ocr_queue_size if queue_size is None else queue_size
+        self.timeout = timeout if timeout is not None else settings.worker_timeout
+        self._initializer = initializer
+        self._initargs = initargs
+        self._executor: Optional[ProcessPoolExecutor] = None
+        self._slots: Optional[asyncio.Semaphore] = None
+        self.active = 0
+
+    @property
+    def capacity(self) -> int:
+        return self.max_workers + self.queue_size
+
+    @property
+    def saturated(self) -> bool:
+        return self.active >= self.capacity
+
+    def _ensure_started(self):
+        if self._executor is None:
+            self._executor = ProcessPoolExecutor(
+                max_workers=self.max_workers,
+                initializer=self._initializer,
+                initargs=self._initargs,
+            )
+            self._slots = asyncio.Semaphore(self.capacity)
+            logger.info(f"Started worker pool with {self.max_workers} processes")
+
+    async def run(self, fn: Callable, *args, wait: bool = True, timeout: Optional[float] = None) -> Any:
+        """Run ``fn(*args)`` in a worker process and return its result"""
+        self._ensure_started()
+
+        if not wait and self.saturated:
+            raise WorkerPoolSaturated(f"Worker pool is full ({self.capacity} tasks)")
+
+        slots = self._slots
+        await slots.acquire()
+        self.active += 1
+        loop = asyncio.get_running_loop()
+
+        def release():
+            self.active -= 1
+            slots.release()
+
+        try:
+            task = self._executor.submit(fn, *args)
+        except Exception:
+            release()
+            raise
+        # The slot is held until the worker process is really done with the task, so
+        # timed-out tasks that keep running still count against max_workers + queue_size
+        task.add_done_callback(lambda _: self._release_from_worker(loop, release))
+        try:
+            return await asyncio.wait_for(asyncio.shield(asyncio.wrap_future(task)), timeout or self.timeout)
+        except asyncio.TimeoutError:
+            # A task still waiting for a process is dropped; a running one cannot be interrupted
+            task.cancel()
+            raise TimeoutError(f"Task {getattr(fn, '__name__', fn)} exceeded {timeout or self.timeout}s")
+
+    @staticmethod
+    def _release_from_worker(loop: asyncio.AbstractEventLoop, release: Callable):
+        try:
+            loop.call_soon_threadsafe(release)
+        except RuntimeError:
+            pass  # The event loop has already closed
+
+    def stats(self) -> dict:
+        return {
+            "workers": self.max_workers,
+            "capacity": self.capacity,
+            "active": self.active,
+            "saturated": self.saturated,
+        }
+
+    def shutdown(self, wait: bool = True):
+        if self._executor is not None:
+            self._executor.shutdown(wait=wait, cancel_futures=True)
+            self._executor = None
+            self._slots = None
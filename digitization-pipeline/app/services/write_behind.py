@@ -0,0 +1,155 @@
+import asyncio
+import logging
+from collections import OrderedDict
+from typing import Any, Callable, Dict, List, Optional
+
+from ..config import settings
+
+logger = logging.getLogger(__name__)
+
+Row = Dict[str, Any]
+FlushFn = Callable[[List[Row], List[Row]], Any]
+
+
+class WriteBehindBuffer:
+    """Buffers document rows and status transitions and writes them in bulk
+
+    Rows are keyed by ``document_id`` and coalesced, so a document that moves
+    queued -> processing -> completed between flushes costs one upserted status
+    row instead of three round-trips. The buffer is flushed by ``flush_fn`` once
+    ``max_items`` rows are pending or ``interval_ms`` after the first pending
+    write, whichever is first. A coroutine ``flush_fn`` is awaited; a plain
+    function does blocking database I/O and is run in a thread.
+
+    A failed flush keeps its rows for the next one. After ``max_attempts``
+    failures in a row the rows are written one at a time, and the ones that
+    still fail (a constraint violation, say) are logged and dropped, so one bad
+    row cannot keep the buffer growing forever.
+    """
+
+    def __init__(self, flush_fn: FlushFn, max_items: Optional[int] = None, interval_ms: Optional[int] = None,
+                 max_attempts: Optional[int] = None):
+        self.flush_fn = flush_fn
+        self.max_items = max_items or settings.db_batch_size
+        self.interval = (interval_ms or settings.db_flush_interval_ms) / 1000.0
+        self.max_attempts = max_attempts or settings.db_flush_max_attempts
+        self.failures = 0  # Consecutive failed flushes
+        self._records: "OrderedDict[str, Row]" = OrderedDict()
+        self._statuses: "OrderedDict[str, Row]" = OrderedDict()
+        self._inflight: Dict[str, Row] = {}  # Statuses taken out of the buffer by the flush in progress
+        self._lock: Optional[asyncio.Lock] = None
+        self._timer: Optional[asyncio.Task] = None
+        self.counters = {"flushes": 0, "rows_written": 0, "rows_coalesced": 0, "flush_errors": 0, "rows_dropped": 0}
+
+    @property
+    def pending(self) -> int:
+        return len(self._records) + len(self._statuses)
+
+    async def add_record(self, row: Row):
+        self._put(self._records, row)
+        await self._after_write()
+
+    async def add_status(self, row: Row):
+        self._put(self._statuses, row)
+        await self._after_write()
+
+    def pending_status(self, document_id: str) -> Optional[Row]:
+        """Latest status not yet written (or still being written), so readers see their own writes"""
+        return self._statuses.get(document_id) or self._inflight.get(document_id)
+
+    async def flush(self):
+        """Write everything pending in one transaction
+
+        Raises if the write failed or rows had to be dropped, so callers that
+        acknowledge work only after a flush (``app.worker``) leave it to be retried.
+        """
+        if self._lock is None:
+            self._lock = asyncio.Lock()
+        async with self._lock:
+            if not self.pending:
+                return
+            records, self._records = list(self._records.values()), OrderedDict()
+            statuses, self._statuses = list(self._statuses.values()), OrderedDict()
+            self._inflight = {row["document_id"]: row for row in statuses}
+            try:
+                await self._flush_rows(records, statuses)
+            finally:
+                self._inflight = {}
+
+    async def _flush_rows(self, records: List[Row], statuses: List[Row]):
+        try:
+            await self._write(records, statuses)
+        except Exception as e:
+            self.counters["flush_errors"] += 1
+            self.failures += 1
+            logger.error(f"Bulk write of {len(records)} records and {len(statuses)} statuses failed "
+                         f"({self.failures}/{self.max_attempts}): {str(e)}")
+            if self.failures < self.max_attempts:
+                # Put the rows back unless a newer write for the same document arrived meanwhile
+                for pending, rows in ((self._records, records), (self._statuses, statuses)):
+                    for row in rows:
+                        pending.setdefault(row["document_id"], row)
+                raise
+            self.failures = 0
+            dropped = await self._write_one_by_one(records, statuses)
+            if dropped:
+                raise RuntimeError(f"Dropped {dropped} rows that could not be written")
+            return
+        self.failures = 0
+        self.counters["flushes"] += 1
+        self.counters["rows_written"] += len(records) + len(statuses)
+
+    async def close(self):
+        if self._timer:
+            self._timer.cancel()
+            self._timer = None
+        await self.flush()
+
+    def stats(self) -> Dict[str, Any]:
+        return {**self.counters, "pending": self.pending, "consecutive_failures": self.failures}
+
+    async def _write(self, records: List[Row], statuses: List[Row]):
+        if asyncio.iscoroutinefunction(self.flush_fn):
+            await self.flush_fn(records, statuses)
+        else:
+            await asyncio.to_thread(self.flush_fn, records, statuses)
+
+    async def _write_one_by_one(self, records: List[Row], statuses: List[Row]) -> int:
+        """Write each row on its own, dropping the ones that fail; returns how many were dropped"""
+        dropped = 0
+        singles = [("record", row, ([row], [])) for row in records] + [("status", row, ([], [row])) for row in statuses]
+        for kind, row, args in singles:
+            try:
+                await self._write(*args)
+            except Exception as e:
+                dropped += 1
+                logger.error(f"Dropping {kind} for document {row['document_id']} "
+                             f"after {self.max_attempts} failed bulk writes: {str(e)}")
+                continue
+            self.counters["rows_written"] += 1
+        self.counters["flushes"] += 1
+        self.counters["rows_dropped"] += dropped
+        return dropped
+
+    def _put(self, pending: "OrderedDict[str, Row]", row: Row):
+        document_id = row["document_id"]
+        if document_id in pending:
+            self.counters["rows_coalesced"] += 1
+            pending[document_id] = {**pending[document_id], **row}
+        else:
+            pending[document_id] = row
+
+    async def _after_write(self):
+        if self.pending >= self.max_items:
+            await self.flush()
+        elif self._timer is None or self._timer.done():
+            self._timer = asyncio.create_task(self._flush_later())
+
+    async def _flush_later(self):
+        await asyncio.sleep(self.interval)
+        try:
+            await self.flush()
+        except Exception:
+            pass  # Already logged; rows stay buffered until max_attempts, then bad ones are dropped
+        if self.pending:
+            self._timer = asyncio.create_task(self._flush_later())
@@ -0,0 +1,88 @@
+import re
+from dataclasses import dataclass
+from typing import Dict, List, Sequence, Union
+
+
+@dataclass(frozen=True)
+class FieldPattern:
+    """One way of finding a field; several patterns may share a name, earlier ones win"""
+    name: str
+    pattern: str
+    group: int = 1
+    multiple: bool = False
+    ignore_case: bool = True
+
+
+@dataclass
+class FieldMatch:
+    name: str
+    value: str
+    start: int
+    end: int
+
+    def to_dict(self) -> Dict:
+        return {"value": self.value, "start": self.start, "end": self.end}
+
+
+class FieldExtractor:
+    """Precompiled extraction of many regex fields with span offsets
+
+    Every pattern is compiled once when the extractor is built. Single-valued
+    fields stop at their first match instead of collecting every occurrence
+    with ``re.findall``; only ``multiple`` fields walk the whole text. Results
+    are the same as running ``re.findall``/``re.search`` per pattern.
+
+    A single combined alternation (or a lookahead scan) was measured slower
+    than this in CPython's regex engine, which loses its first-character skip
+    on alternations; see ``benchmarks/bench_field_extraction.py``.
+    """
+
+    def __init__(self, fields: Sequence[FieldPattern]):
+        self.fields = list(fields)
+        self.names = list(dict.fromkeys(field.name for field in self.fields))
+        self._compiled = [
+            re.compile(field.pattern, re.IGNORECASE if field.ignore_case else 0) for field in self.fields
+        ]
+        self._by_name: Dict[str, List[int]] = {name: [] for name in self.names}
+        for i, field in enumerate(self.fields):
+            self._by_name[field.name].append(i)
+
+    def _match(self, i: int, m: re.Match) -> FieldMatch:
+        group = self.fields[i].group
+        return FieldMatch(self.fields[i].name, m.group(group), m.start(group), m.end(group))
+
+    def extract(self, text: str) -> Dict[str, Union[FieldMatch, List[FieldMatch]]]:
+        """Best match per field name: all occurrences for ``multiple`` fields, else the first
+
+        For a name with several patterns, the first pattern (in declaration order)
+        that matches anywhere in the text is used, mirroring a loop of ``re.search``.
+        """
+        results: Dict[str, Union[FieldMatch, List[FieldMatch]]] = {}
+        for name, indexes in self._by_name.items():
+            for i in indexes:
+                if self.fields[i].multiple:
+                    matches = [self._match(i, m) for m in self._compiled[i].finditer(text)]
+                    if matches:
+                        results[name] = matches
+                        break
+                else:
+                    m = self._compiled[i].search(text)
+                    if m:
+                        results[name] = self._match(i, m)
+                        break
+        return results
+
+
+# Rule-based FRA fields used by DocumentProcessor.extract_entities (English and Devanagari)
+FRA_FIELDS = [
+    FieldPattern('village', r'(?:Village|ग्राम|गाँव)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)'),
+    FieldPattern('district', r'(?:District|जिला)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)'),
+    FieldPattern('state', r'(?:State|राज्य)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)'),
+    FieldPattern('patta_holder', r'(?:Name|नाम|Holder)\s*:?\s*([A-Za-z\u0900-\u097F\s]+)', multiple=True),
+    FieldPattern('area_hectares', r'(\d+\.?\d*)\s*(?:hectare|हेक्टेयर|acre|एकड़)'),
+    FieldPattern('plot_number', r'(?:Plot|Survey|खसरा)\s*(?:No\.?|Number)?\s*:?\s*([A-Za-z0-9\/\-]+)'),
+    FieldPattern('claim_type', r'(IFR|CFR|CR|Individual|Community|Forest Rights)'),
+    FieldPattern('claim_status', r'(Pending|Verified|Granted|Rejected|स्वीकृत|लंबित)'),
+]
+
+FRA_FIELD_EXTRACTOR = FieldExtractor(FRA_FIELDS)
@@ -0,0 +1,130 @@
+import gc
+import itertools
+import json
+from contextlib import contextmanager
+from typing import Any, Dict, List, Optional, Sequence
+
+import numpy as np
+import shapely
+
+# Every geometry is stored in WGS 84
+SRID = 4326
+
+
+@contextmanager
+def _gc_paused():
+    """Suspend the cyclic GC while building many small, acyclic lists
+
+    Allocating a million coordinate lists otherwise triggers a collection
+    every few hundred allocations, which costs more than building them.
+    """
+    enabled = gc.isenabled()
+    gc.disable()
+    try:
+        yield
+    finally:
+        if enabled:
+            gc.enable()
+
+
+def _stored_value(value: Any):
+    """WKB bytes, or WKT text, for one stored geometry value"""
+    if value is None:
+        return None
+    # geoalchemy2 WKBElement / WKTElement
+    value = getattr(value, "data", value)
+    if isinstance(value, memoryview):
+        return value.tobytes()
+    # WKB starts with a byte-order byte, so its hex form starts with '0'; WKT never does.
+    # bytes.fromhex + binary WKB parsing is far faster than GEOS's hex reader.
+    if isinstance(value, str) and value[:1] == "0":
+        return bytes.fromhex(value)
+    return value or None
+
+
+def decode_geometries(values: Sequence[Any]) -> np.ndarray:
+    """Shapely geometries for a column of stored values, None where missing
+
+    Accepts what the database hands back: raw or hex EWKB from PostGIS (also
+    wrapped in a geoalchemy2 element), EWKB from the SQLite stand-in and WKT
+    written by older versions. Each kind is parsed with one vectorised call.
+    """
+    raw = [_stored_value(value) for value in values]
+    geometries = np.full(len(raw), None, dtype=object)
+    wkb = [i for i, value in enumerate(raw) if isinstance(value, bytes)]
+    wkt = [i for i, value in enumerate(raw) if isinstance(value, str)]
+    if wkb:
+        geometries[wkb] = shapely.from_wkb(np.array([raw[i] for i in wkb], dtype=object), on_invalid="warn")
+    if wkt:
+        # Strip an EWKT "SRID=4326;" prefix
+        text = [raw[i].split(";", 1)[-1] for i in wkt]
+        geometries[wkt] = shapely.from_wkt(np.array(text, dtype=object), on_invalid="warn")
+    return geometries
+
+
+def geojson_strings(values: Sequence[Any]) -> List[Optional[str]]:
+    """GeoJSON text for a column of stored values"""
+    return shapely.to_geojson(decode_geometries(values)).tolist()
+
+
+def to_geojson(values: Sequence[Any]) -> List[Optional[Dict]]:
+    """GeoJSON mappings for a column of stored values
+
+    Parcels are polygons, so the usual all-polygon column is unpacked from one
+    ragged coordinate array; anything else goes through GeoJSON text.
+    """
+    geometries = decode_geometries(values)
+    present = np.flatnonzero(shapely.get_type_id(geometries) >= 0)
+    result: List[Optional[Dict]] = [None] * len(geometries)
+    if not len(present):
+        return result
+
+    polygons = geometries[present]
+    if not (shapely.get_type_id(polygons) == shapely.GeometryType.POLYGON).all():
+        texts = shapely.to_geojson(geometries).tolist()
+        return [json.loads(text) if text else None for text in texts]
+
+    _, coords, (ring_offsets, polygon_offsets) = shapely.to_ragged_array(polygons)
+    ring_offsets = ring_offsets.tolist()
+    polygon_offsets = polygon_offsets.tolist()
+    with _gc_paused():
+        points = coords.tolist()
+        rings = [points[start:end] for start, end in zip(ring_offsets, ring_offsets[1:])]
+        for i, start, end in zip(present.tolist(), polygon_offsets, polygon_offsets[1:]):
+            result[i] = {"type": "Polygon", "coordinates": rings[start:end]}
+    return result
+
+
+def encode_geometries(geojsons: Sequence[Optional[Dict]]) -> List[Optional[bytes]]:
+    """EWKB (SRID 4326) for a column of GeoJSON mappings
+
+    An all-polygon column is packed into one ragged coordinate array and built
+    in a single call; other geometry types are parsed from GeoJSON text.
+    """
+    present = [i for i, geojson in enumerate(geojsons) if geojson]
+    result: List[Optional[bytes]] = [None] * len(geojsons)
+    if not present:
+        return result
+
+    items = [geojsons[i] for i in present]
+    if all(item.get("type") == "Polygon" for item in items):
+        polygons = [item["coordinates"] for item in items]
+        ring_offsets = np.cumsum([0] + [len(ring) for rings in polygons for ring in rings])
+        polygon_offsets = np.cumsum([0] + [len(rings) for rings in polygons])
+        points = list(itertools.chain.from_iterable(itertools.chain.from_iterable(polygons)))
+        coords = np.fromiter(itertools.chain.from_iterable(points), dtype=float)
+        if coords.size != 2 * len(points):
+            # Some points carry a Z (or worse); keep x, y
+            coords = np.array([point[:2] for point in points], dtype=float)
+        coords = coords.reshape(-1, 2)
+        geometries = shapely.from_ragged_array(
+            shapely.GeometryType.POLYGON, coords, (ring_offsets, polygon_offsets)
+        )
+    else:
+        text = np.array([json.dumps(item) for item in items], dtype=object)
+        geometries = shapely.from_geojson(text, on_invalid="ignore")
+
+    geometries = shapely.set_srid(geometries, SRID)
+    for i, wkb in zip(present, shapely.to_wkb(geometries, include_srid=True).tolist()):
+        result[i] = wkb
+    return result
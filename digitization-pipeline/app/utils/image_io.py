@@ -0,0 +1,94 @@
+import io
+import mmap
+import os
+from contextlib import contextmanager
+from typing import Iterator, Optional, Tuple, Union
+
+import cv2
+import numpy as np
+from PIL import Image
+
+# A path, encoded image bytes (bytes, memoryview or an mmap of the file) or an
+# already decoded array, which is passed through untouched
+ImageSource = Union[str, bytes, bytearray, memoryview, mmap.mmap, np.ndarray]
+
+# (grayscale, reduction factor) -> imdecode flag. The reduced modes let the
+# JPEG decoder skip DCT work (other formats are decoded and then shrunk).
+DECODE_FLAGS = {
+    (False, 1): cv2.IMREAD_COLOR,
+    (False, 2): cv2.IMREAD_REDUCED_COLOR_2,
+    (False, 4): cv2.IMREAD_REDUCED_COLOR_4,
+    (False, 8): cv2.IMREAD_REDUCED_COLOR_8,
+    (True, 1): cv2.IMREAD_GRAYSCALE,
+    (True, 2): cv2.IMREAD_REDUCED_GRAYSCALE_2,
+    (True, 4): cv2.IMREAD_REDUCED_GRAYSCALE_4,
+    (True, 8): cv2.IMREAD_REDUCED_GRAYSCALE_8,
+}
+
+# Enough of the file for PIL to find the dimensions of PNG, TIFF and most JPEGs
+HEADER_BYTES = 64 * 1024
+
+
+@contextmanager
+def mapped_file(path: str) -> Iterator[Union[mmap.mmap, bytes]]:
+    """Read-only memory map of a file, for decoders that take a buffer
+
+    Pages are read from the page cache on demand instead of being copied into
+    a bytes object first. Buffers taken from the map (e.g. ``np.frombuffer``)
+    must be released before the block exits.
+    """
+    with open(path, "rb") as f:
+        if os.fstat(f.fileno()).st_size == 0:
+            # mmap refuses empty files
+            yield b""
+            return
+        with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as mapped:
+            yield mapped
+
+
+def image_size(data) -> Optional[Tuple[int, int]]:
+    """(width, height) read from the image header, or None if it is not in the first bytes"""
+    try:
+        with Image.open(io.BytesIO(bytes(data[:HEADER_BYTES]))) as image:
+            return image.size
+    except Exception:
+        return None
+
+
+def reduction_for(size: Optional[Tuple[int, int]], max_side: Optional[int]) -> int:
+    """Largest decoder reduction that keeps the long side at or above ``max_side``"""
+    if not size or not max_side:
+        return 1
+    return next((factor for factor in (8, 4, 2) if max(size) / factor >= max_side), 1)
+
+
+def decode_image(source: ImageSource, grayscale: bool = False, max_side: Optional[int] = None) -> np.ndarray:
+    """Decode an image once, with ``cv2.imdecode``
+
+    Paths are memory-mapped rather than read into a bytes object. With
+    ``max_side`` (a preview is enough) the image is decoded at 1/2, 1/4 or 1/8
+    scale as long as its long side stays at least ``max_side`` pixels.
+    """
+    if isinstance(source, np.ndarray):
+        if grayscale and source.ndim == 3:
+            return cv2.cvtColor(source, cv2.COLOR_BGR2GRAY)
+        return source
+    if isinstance(source, str):
+        with mapped_file(source) as data:
+            image = _decode(data, grayscale, max_side)
+        if image is None:
+            raise ValueError(f"Could not load image: {source}")
+        return image
+
+    image = _decode(source, grayscale, max_side)
+    if image is None:
+        raise ValueError("Could not decode image data")
+    return image
+
+
+def _decode(data, grayscale: bool, max_side: Optional[int]) -> Optional[np.ndarray]:
+    if not len(data):
+        return None
+    factor = reduction_for(image_size(data), max_side) if max_side else 1
+    # The array view must not outlive the call when ``data`` is an mmap
+    return cv2.imdecode(np.frombuffer(data, dtype=np.uint8), DECODE_FLAGS[(grayscale, factor)])
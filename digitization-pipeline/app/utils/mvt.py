@@ -0,0 +1,122 @@
+import json
+import struct
+from typing import Any, Dict, Iterable, List, Tuple
+
+import shapely
+
+# Mapbox Vector Tile 2.1 encoder (https://github.com/mapbox/vector-tile-spec).
+# Only what a parcels layer needs: points and polygons with scalar attributes,
+# written straight to protobuf without a protobuf runtime.
+
+POINT, POLYGON = 1, 3
+MOVE_TO, LINE_TO, CLOSE_PATH = 1, 2, 7
+
+Feature = Tuple[Any, Dict[str, Any]]  # (shapely geometry in tile coordinates, properties)
+
+
+def _varint(value: int) -> bytes:
+    out = bytearray()
+    while value > 0x7F:
+        out.append((value & 0x7F) | 0x80)
+        value >>= 7
+    out.append(value)
+    return bytes(out)
+
+
+def _zigzag(value: int) -> int:
+    return (value << 1) ^ (value >> 63)
+
+
+def _field(number: int, payload: bytes) -> bytes:
+    """Length-delimited field (wire type 2)"""
+    return _varint((number << 3) | 2) + _varint(len(payload)) + payload
+
+
+def _packed(number: int, values: Iterable[int]) -> bytes:
+    return _field(number, b"".join(_varint(v) for v in values))
+
+
+def _uint(number: int, value: int) -> bytes:
+    return _varint(number << 3) + _varint(value)
+
+
+def _value(value: Any) -> bytes:
+    """tile.Value message"""
+    if isinstance(value, bool):
+        return _uint(7, int(value))
+    if isinstance(value, int):
+        return _uint(6, _zigzag(value))
+    if isinstance(value, float):
+        return _varint((3 << 3) | 1) + struct.pack("<d", value)
+    if not isinstance(value, str):
+        value = json.dumps(value, ensure_ascii=False)
+    return _field(1, value.encode("utf-8"))
+
+
+def _command(command: int, count: int) -> int:
+    return (command & 0x7) | (count << 3)
+
+
+def _geometry(geometry) -> Tuple[int, List[int]]:
+    """Feature type and command stream for a point or (multi)polygon"""
+    x = y = 0
+    commands: List[int] = []
+    if shapely.get_type_id(geometry) == 0:
+        px, py = int(geometry.x), int(geometry.y)
+        return POINT, [_command(MOVE_TO, 1), _zigzag(px), _zigzag(py)]
+
+    polygons = getattr(geometry, "geoms", [geometry])
+    for polygon in polygons:
+        for ring in [polygon.exterior, *polygon.interiors]:
+            # The closing vertex is implied by ClosePath
+            points = shapely.get_coordinates(ring).astype(int)[:-1].tolist()
+            if len(points) < 3:
+                continue
+            for i, (px, py) in enumerate(points):
+                if i == 0:
+                    commands.append(_command(MOVE_TO, 1))
+                elif i == 1:
+                    commands.append(_command(LINE_TO, len(points) - 1))
+                commands += [_zigzag(px - x), _zigzag(py - y)]
+                x, y = px, py
+            commands.append(_command(CLOSE_PATH, 1))
+    return POLYGON, commands
+
+
+def encode_layer(name: str, features: List[Feature], extent: int = 4096) -> bytes:
+    """One-layer tile from features already in integer tile coordinates
+
+    Polygon rings must follow the spec's winding (exterior rings with positive
+    area in tile coordinates, i.e. counter-clockwise as shapely sees them).
+    None-valued properties are left out; lists and dicts are written as JSON.
+    """
+    keys: Dict[str, int] = {}
+    values: Dict[Tuple[type, Any], int] = {}
+    encoded_values: List[bytes] = []
+    body = bytearray()
+    for feature_id, (geometry, properties) in enumerate(features, 1):
+        geom_type, commands = _geometry(geometry)
+        if not commands:
+            continue
+        tags: List[int] = []
+        for key, value in properties.items():
+            if value is None:
+                continue
+            if isinstance(value, (list, dict)):
+                value = json.dumps(value, ensure_ascii=False)
+            if key not in keys:
+                keys[key] = len(keys)
+            # bool is an int subclass; keep True and 1 apart
+            value_key = (type(value), value)
+            if value_key not in values:
+                values[value_key] = len(values)
+                encoded_values.append(_value(value))
+            tags += [keys[key], values[value_key]]
+        feature = _uint(1, feature_id) + _packed(2, tags) + _uint(3, geom_type) + _packed(4, commands)
+        body += _field(2, feature)
+
+    layer = _uint(15, 2) + _field(1, name.encode("utf-8")) + bytes(body)
+    layer += b"".join(_field(3, key.encode("utf-8")) for key in keys)
+    layer += b"".join(_field(4, value) for value in encoded_values)
+    layer += _uint(5, extent)
+    return _field(3, layer)
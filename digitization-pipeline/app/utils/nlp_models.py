@@ -0,0 +1,55 @@
+import logging
+import threading
+from typing import Dict, Iterable, Iterator, Optional, Sequence
+
+import spacy
+
+logger = logging.getLogger(__name__)
+
+# Components the FRA entity extraction never reads; excluding them skips loading
+# their weights and running them on every document.
+NER_EXCLUDE = ("parser", "tagger", "attribute_ruler", "lemmatizer", "senter")
+
+
+class NLPModelRegistry:
+    """Process-wide cache of spaCy pipelines
+
+    Each model is loaded lazily on first use and then shared by every caller in
+    the process. A model that fails to load is remembered as unavailable so the
+    load is not retried on every request.
+    """
+
+    def __init__(self):
+        self._models: Dict[tuple, Optional[spacy.language.Language]] = {}
+        self._lock = threading.Lock()
+
+    def get(self, name: str, exclude: Sequence[str] = NER_EXCLUDE) -> Optional[spacy.language.Language]:
+        key = (name, tuple(exclude))
+        if key in self._models:
+            return self._models[key]
+
+        with self._lock:
+            if key not in self._models:
+                try:
+                    self._models[key] = spacy.load(name, exclude=list(exclude))
+                    logger.info(f"Loaded spaCy model {name} (excluded: {', '.join(exclude) or 'none'})")
+                except OSError:
+                    logger.warning(f"spaCy model not found. Install with: python -m spacy download {name}")
+                    self._models[key] = None
+        return self._models[key]
+
+    def pipe(self, texts: Iterable[str], name: str, exclude: Sequence[str] = NER_EXCLUDE,
+             batch_size: int = 32) -> Iterator[Optional[spacy.tokens.Doc]]:
+        """Run the model over many texts in one batched pass; yields None per text if unavailable"""
+        nlp = self.get(name, exclude)
+        if nlp is None:
+            for _ in texts:
+                yield None
+            return
+        yield from nlp.pipe(texts, batch_size=batch_size)
+
+    def loaded(self) -> Dict[str, bool]:
+        return {name: model is not None for (name, _), model in self._models.items()}
+
+
+registry = NLPModelRegistry()
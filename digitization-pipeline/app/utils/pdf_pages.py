@@ -0,0 +1,96 @@
+import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from dataclasses import dataclass
+from typing import Callable, Iterator, Optional, Tuple, Union
+
+import fitz  # PyMuPDF
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+PdfSource = Union[str, bytes]
+
+
+@dataclass
+class PdfPage:
+    """One PDF page: its embedded text layer, or a grayscale render when it has none"""
+    number: int
+    text: str
+    image: Optional[np.ndarray] = None
+
+    @property
+    def needs_ocr(self) -> bool:
+        return self.image is not None
+
+
+def open_pdf(source: PdfSource) -> fitz.Document:
+    if isinstance(source, (bytes, bytearray, memoryview)):
+        return fitz.open(stream=bytes(source), filetype="pdf")
+    return fitz.open(source)
+
+
+def page_count(source: PdfSource) -> int:
+    with open_pdf(source) as doc:
+        return doc.page_count
+
+
+def render_page(page: fitz.Page, dpi: int) -> np.ndarray:
+    """Rasterize a page to a grayscale array at the given DPI"""
+    zoom = dpi / 72.0
+    pix = page.get_pixmap(matrix=fitz.Matrix(zoom, zoom), colorspace=fitz.csGRAY, alpha=False)
+    # Rows may be padded, so slice by stride before dropping the padding
+    image = np.frombuffer(pix.samples, dtype=np.uint8).reshape(pix.height, pix.stride)[:, :pix.width]
+    return image.copy()
+
+
+def _load_page(doc: fitz.Document, number: int, dpi: int, min_text_chars: int) -> PdfPage:
+    page = doc.load_page(number)
+    text = page.get_text()
+    if len(text.strip()) >= min_text_chars:
+        return PdfPage(number=number, text=text)
+    return PdfPage(number=number, text="", image=render_page(page, dpi))
+
+
+def load_page(source: PdfSource, number: int, dpi: int = 300, min_text_chars: int = 20) -> PdfPage:
+    """Load a single page, rendering it only if the text layer is missing"""
+    with open_pdf(source) as doc:
+        return _load_page(doc, number, dpi, min_text_chars)
+
+
+def iter_pdf_pages(source: PdfSource, dpi: int = 300, min_text_chars: int = 20) -> Iterator[PdfPage]:
+    """Yield pages one at a time so only the page being handled is held in memory"""
+    with open_pdf(source) as doc:
+        for number in range(doc.page_count):
+            yield _load_page(doc, number, dpi, min_text_chars)
+
+
+def ocr_pdf_pages(source: PdfSource, ocr: Callable[[np.ndarray], str], dpi: int = 300,
+                  min_text_chars: int = 20, max_workers: int = 4) -> Iterator[Tuple[int, str]]:
+    """Yield ``(page_number, text)`` in page order, OCRing image-only pages in parallel
+
+    At most ``2 * max_workers`` rendered pages are in flight at once, so memory
+    stays bounded regardless of the page count.
+    """
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        in_flight = deque()
+        for page in iter_pdf_pages(source, dpi, min_text_chars):
+            if page.needs_ocr:
+                in_flight.append((page.number, executor.submit(ocr, page.image)))
+            else:
+                in_flight.append((page.number, page.text))
+            while len(in_flight) >= 2 * max_workers:
+                yield _resolve(in_flight.popleft())
+        while in_flight:
+            yield _resolve(in_flight.popleft())
+
+
+def _resolve(item) -> Tuple[int, str]:
+    number, result = item
+    if isinstance(result, str):
+        return number, result
+    try:
+        return number, result.result()
+    except Exception as e:
+        logger.error(f"OCR failed for page {number + 1}: {str(e)}")
+        return number, ""
@@ -2,38 +2,212 @@ import cv2
 import numpy as np
 from PIL import Image
 import logging
+import time
+from dataclasses import dataclass, field
+from typing import Callable, Dict, List, Optional, Sequence, Tuple
+
+from ..config import settings
+from .image_io import ImageSource, decode_image
 
 logger = logging.getLogger(__name__)
 
+BoundingBox = Tuple[int, int, int, int]
+
+# Named stage chains. Stages run in order; colour stages must come before "grayscale".
+PREPROCESS_PROFILES: Dict[str, Tuple[str, ...]] = {
+    # The original fixed pipeline: deskew, median denoise, CLAHE, Otsu AND adaptive threshold
+    "standard": ("grayscale", "deskew", "denoise", "enhance_contrast", "binarize"),
+    # Government forms with red/blue stamps and seals printed over the text
+    "stamped": ("remove_stamps_seals", "grayscale", "deskew", "denoise", "enhance_contrast", "binarize"),
+    # Clean typed or printed pages: a single Otsu pass is enough
+    "clean": ("grayscale", "deskew", "binarize_otsu"),
+    # Unevenly lit photos: local thresholding only, Otsu is thrown off by shadows
+    "photo": ("grayscale", "deskew", "denoise", "enhance_contrast", "binarize_adaptive"),
+    # Standard pipeline plus MSER text regions for region-of-interest OCR. MSER needs
+    # grey levels to find stable regions, so it runs before binarization.
+    "regions": ("grayscale", "deskew", "denoise", "enhance_contrast", "detect_text_regions", "binarize"),
+}
+
+
+@dataclass
+class StageTiming:
+    name: str
+    seconds: float
+    bytes_allocated: int
+
+
+@dataclass
+class PreprocessResult:
+    """Output of one run of a preprocessing profile"""
+    image: np.ndarray
+    profile: str
+    timings: List[StageTiming] = field(default_factory=list)
+    text_regions: List[BoundingBox] = field(default_factory=list)
+
+    @property
+    def seconds(self) -> float:
+        return sum(t.seconds for t in self.timings)
+
+    @property
+    def bytes_allocated(self) -> int:
+        return sum(t.bytes_allocated for t in self.timings)
+
+
+class BufferPool:
+    """Scratch arrays shared by the stages of one run
+
+    A stage asks for an output buffer that does not alias its input; once the
+    first two or three buffers of a shape exist, later stages ping-pong between
+    them instead of allocating a fresh full-page array each. The caller's input
+    image is never written to.
+    """
+
+    def __init__(self):
+        self._buffers: List[np.ndarray] = []
+        self.bytes_allocated = 0
+
+    def get(self, shape: Tuple[int, ...], dtype=np.uint8, avoid: Sequence[np.ndarray] = ()) -> np.ndarray:
+        for buf in self._buffers:
+            if buf.shape == shape and buf.dtype == dtype and not any(buf is a for a in avoid):
+                return buf
+        buf = np.empty(shape, dtype=dtype)
+        self._buffers.append(buf)
+        self.bytes_allocated += buf.nbytes
+        return buf
+
+    def like(self, image: np.ndarray, *avoid: np.ndarray) -> np.ndarray:
+        return self.get(image.shape, image.dtype, (image,) + avoid)
+
+
+def reading_order(boxes: Sequence[BoundingBox]) -> List[BoundingBox]:
+    """Sort boxes top-to-bottom into rows of vertically overlapping boxes, each row left-to-right"""
+    rows: List[List[BoundingBox]] = []
+    for box in sorted(boxes, key=lambda b: b[1]):
+        row = rows[-1] if rows else None
+        if row is not None:
+            row_bottom = max(y + bh for _, y, _, bh in row)
+            if box[1] < row_bottom - box[3] / 2:
+                row.append(box)
+                continue
+        rows.append([box])
+    return [box for row in rows for box in sorted(row, key=lambda b: b[0])]
+
+
 class ImagePreprocessor:
     """Image preprocessing for better OCR results"""
     
-    def enhance_image(self, image_path: str) -> np.ndarray:
-        """Main preprocessing pipeline"""
+    # Bump whenever the pipeline output changes so cached OCR results are invalidated
+    version = "1"
+    
+    def __init__(self, deskew_mode: str = None, deskew_max_side: int = None, profile: str = None):
+        self.deskew_mode = deskew_mode or settings.deskew_mode
+        self.deskew_max_side = deskew_max_side or settings.deskew_max_side
+        self.profile = profile or settings.preprocess_profile
+        self._clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
+        # Cumulative per-stage totals for this process: name -> calls, seconds, bytes
+        self.stage_stats: Dict[str, Dict[str, float]] = {}
+        self._stages: Dict[str, Callable[[np.ndarray, BufferPool, PreprocessResult], np.ndarray]] = {
+            "remove_stamps_seals": lambda img, pool, res: self.remove_stamps_seals(img, pool),
+            "grayscale": lambda img, pool, res: self.grayscale(img, pool),
+            "deskew": lambda img, pool, res: self.deskew(img, pool.like(img)),
+            "denoise": lambda img, pool, res: self.denoise(img, pool.like(img)),
+            "enhance_contrast": lambda img, pool, res: self.enhance_contrast(img, pool.like(img)),
+            "binarize": lambda img, pool, res: self.binarize(img, pool),
+            "binarize_otsu": lambda img, pool, res: self.binarize_otsu(img, pool.like(img)),
+            "binarize_adaptive": lambda img, pool, res: self.binarize_adaptive(img, pool.like(img)),
+            "detect_text_regions": self._detect_text_regions_stage,
+        }
+    
+    def profile_for(self, document_type: Optional[str] = None) -> str:
+        """Profile configured for a document type, falling back to the default profile"""
+        return settings.document_type_profiles.get(document_type or "", self.profile)
+    
+    def stages(self, profile: Optional[str] = None, detect_regions: bool = False) -> Tuple[str, ...]:
+        """Stage names of a profile, adding text region detection ahead of binarization if asked"""
+        profile = profile or self.profile
+        if profile not in PREPROCESS_PROFILES:
+            raise ValueError(f"Unknown preprocessing profile: {profile}")
+        stages = PREPROCESS_PROFILES[profile]
+        if detect_regions and "detect_text_regions" not in stages:
+            binarize_at = next((i for i, name in enumerate(stages) if name.startswith("binarize")), len(stages))
+            stages = stages[:binarize_at] + ("detect_text_regions",) + stages[binarize_at:]
+        return stages
+    
+    def fingerprint(self, profile: Optional[str] = None, detect_regions: bool = False) -> str:
+        """Identifies the output of a profile; part of the OCR cache key"""
+        return f"{self.version}:{self.deskew_mode}:{'+'.join(self.stages(profile, detect_regions))}"
+    
+    def enhance_image(self, image: ImageSource, profile: Optional[str] = None) -> np.ndarray:
+        """Main preprocessing pipeline, from a path, encoded bytes or a decoded array"""
+        return self.run_image(image, profile).image
+    
+    def enhance_array(self, image: np.ndarray, profile: Optional[str] = None) -> np.ndarray:
+        """Preprocess an already decoded BGR or grayscale image"""
+        return self.run(image, profile).image
+    
+    def run_image(self, image: ImageSource, profile: Optional[str] = None,
+                  detect_regions: bool = False) -> PreprocessResult:
+        # Decoded once (paths straight from a memory map); every stage works on this array
+        return self.run(decode_image(image), profile, detect_regions)
+    
+    def run(self, image: np.ndarray, profile: Optional[str] = None, detect_regions: bool = False) -> PreprocessResult:
+        """Run every stage of a profile, timing each and counting the buffers it allocates"""
+        profile = profile or self.profile
+        stages = self.stages(profile, detect_regions)
+        result = PreprocessResult(image=image, profile=profile)
+        pool = BufferPool()
+        
         try:
-            # Load image
-            image = cv2.imread(image_path)
-            if image is None:
-                raise ValueError(f"Could not load image: {image_path}")
-            
-            # Convert to grayscale
-            gray = cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
-            
-            # Apply preprocessing steps
-            processed = self.deskew(gray)
-            processed = self.denoise(processed)
-            processed = self.enhance_contrast(processed)
-            processed = self.binarize(processed)
-            
-            return processed
+            current = image
+            for name in stages:
+                if name == "grayscale" and current.ndim == 2:
+                    continue  # Already single channel
+                
+                allocated = pool.bytes_allocated
+                start = time.perf_counter()
+                current = self._stages[name](current, pool, result)
+                timing = StageTiming(name, time.perf_counter() - start, pool.bytes_allocated - allocated)
+                result.timings.append(timing)
+                self._record(timing)
             
+            result.image = current
+        
         except Exception as e:
             logger.error(f"Image preprocessing failed: {str(e)}")
             # Return original grayscale as fallback
-            return cv2.cvtColor(cv2.imread(image_path), cv2.COLOR_BGR2GRAY)
+            result.image = image if image.ndim == 2 else cv2.cvtColor(image, cv2.COLOR_BGR2GRAY)
+        
+        return result
+    
+    def _record(self, timing: StageTiming):
+        stats = self.stage_stats.setdefault(timing.name, {"calls": 0, "seconds": 0.0, "bytes_allocated": 0})
+        stats["calls"] += 1
+        stats["seconds"] += timing.seconds
+        stats["bytes_allocated"] += timing.bytes_allocated
     
-    def deskew(self, image: np.ndarray) -> np.ndarray:
+    def grayscale(self, image: np.ndarray, pool: Optional[BufferPool] = None) -> np.ndarray:
+        """Convert a BGR image to grayscale"""
+        if image.ndim == 2:
+            return image
+        dst = pool.get(image.shape[:2], image.dtype) if pool else None
+        return cv2.cvtColor(image, cv2.COLOR_BGR2GRAY, dst=dst)
+    
+    def deskew(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
         """Correct skew in scanned documents"""
+        if self.deskew_mode == "fast":
+            return self.deskew_fast(image, dst)
+        return self.deskew_full(image, dst)
+    
+    def deskew_full(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Deskew using every foreground pixel of the full-resolution image"""
+        return self._rotate(image, self.estimate_skew_full(image), cv2.INTER_CUBIC, dst)
+    
+    def deskew_fast(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        """Estimate the angle on a downscaled copy, then rotate once at full resolution"""
+        return self._rotate(image, self.estimate_skew_fast(image), cv2.INTER_LINEAR, dst)
+    
+    def estimate_skew_full(self, image: np.ndarray) -> float:
+        """Skew angle from the minimum-area rectangle around all non-zero pixels"""
         # Find contours
         coords = np.column_stack(np.where(image > 0))
         
@@ -47,49 +221,80 @@ class ImagePreprocessor:
         else:
             angle = -angle
         
+        return angle
+    
+    def estimate_skew_fast(self, image: np.ndarray) -> float:
+        """Skew angle from the ink pixels of a page downscaled to ``deskew_max_side``"""
+        h, w = image.shape[:2]
+        scale = self.deskew_max_side / max(h, w)
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        # Text is dark on a light page, so invert to make ink the foreground
+        _, ink = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY_INV | cv2.THRESH_OTSU)
+        points = cv2.findNonZero(ink)
+        if points is None or len(points) < 10:
+            return 0.0
+        
+        angle = cv2.minAreaRect(points)[2]
+        # Depending on the OpenCV build the angle is in [-90, 0) or (0, 90]; map both to [-45, 45]
+        if angle < -45:
+            angle += 90
+        elif angle > 45:
+            angle -= 90
+        return angle
+    
+    def _rotate(self, image: np.ndarray, angle: float, interpolation: int,
+                dst: Optional[np.ndarray] = None) -> np.ndarray:
         # Rotate image
         if abs(angle) > 0.5:  # Only rotate if significant skew
             (h, w) = image.shape[:2]
             center = (w // 2, h // 2)
             M = cv2.getRotationMatrix2D(center, angle, 1.0)
-            rotated = cv2.warpAffine(image, M, (w, h), flags=cv2.INTER_CUBIC, borderMode=cv2.BORDER_REPLICATE)
+            rotated = cv2.warpAffine(image, M, (w, h), dst=dst, flags=interpolation, borderMode=cv2.BORDER_REPLICATE)
             return rotated
         
         return image
     
-    def denoise(self, image: np.ndarray) -> np.ndarray:
+    def denoise(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
         """Remove noise from image"""
-        # Apply median blur to remove salt and pepper noise
-        denoised = cv2.medianBlur(image, 3)
-        
-        # Apply Gaussian blur for additional smoothing
-        denoised = cv2.GaussianBlur(denoised, (1, 1), 0)
-        
-        return denoised
+        # Apply median blur to remove salt and pepper noise. The Gaussian blur that
+        # used to follow had a 1x1 kernel, which leaves the image unchanged.
+        return cv2.medianBlur(image, 3, dst=dst)
     
-    def enhance_contrast(self, image: np.ndarray) -> np.ndarray:
+    def enhance_contrast(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
         """Enhance contrast using CLAHE"""
-        clahe = cv2.createCLAHE(clipLimit=2.0, tileGridSize=(8, 8))
-        enhanced = clahe.apply(image)
-        return enhanced
+        return self._clahe.apply(image, dst)
     
-    def binarize(self, image: np.ndarray) -> np.ndarray:
+    def binarize(self, image: np.ndarray, pool: Optional[BufferPool] = None) -> np.ndarray:
         """Convert to binary image using adaptive thresholding"""
+        pool = pool or BufferPool()
+        
         # Otsu's thresholding
-        _, binary1 = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU)
+        binary1 = self.binarize_otsu(image, pool.like(image))
         
         # Adaptive thresholding
-        binary2 = cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2)
+        binary2 = self.binarize_adaptive(image, pool.like(image, binary1))
         
         # Combine both methods
-        combined = cv2.bitwise_and(binary1, binary2)
-        
-        return combined
+        return cv2.bitwise_and(binary1, binary2, dst=binary1)
+    
+    def binarize_otsu(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        _, binary = cv2.threshold(image, 0, 255, cv2.THRESH_BINARY + cv2.THRESH_OTSU, dst=dst)
+        return binary
     
-    def remove_stamps_seals(self, image: np.ndarray) -> np.ndarray:
+    def binarize_adaptive(self, image: np.ndarray, dst: Optional[np.ndarray] = None) -> np.ndarray:
+        return cv2.adaptiveThreshold(image, 255, cv2.ADAPTIVE_THRESH_GAUSSIAN_C, cv2.THRESH_BINARY, 11, 2, dst=dst)
+    
+    def remove_stamps_seals(self, image: np.ndarray, pool: Optional[BufferPool] = None) -> np.ndarray:
         """Remove colored stamps and seals while preserving text"""
+        if image.ndim == 2:
+            return image  # No colour information left to segment on
+        pool = pool or BufferPool()
+        mask_shape = image.shape[:2]
+        
         # Convert to HSV for better color segmentation
-        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV)
+        hsv = cv2.cvtColor(image, cv2.COLOR_BGR2HSV, dst=pool.like(image))
         
         # Define range for red stamps (common in government documents)
         lower_red1 = np.array([0, 50, 50])
@@ -98,27 +303,37 @@ class ImagePreprocessor:
         upper_red2 = np.array([180, 255, 255])
         
         # Create masks for red regions
-        mask1 = cv2.inRange(hsv, lower_red1, upper_red1)
-        mask2 = cv2.inRange(hsv, lower_red2, upper_red2)
-        red_mask = cv2.bitwise_or(mask1, mask2)
+        stamp_mask = cv2.inRange(hsv, lower_red1, upper_red1, dst=pool.get(mask_shape))
+        mask = pool.get(mask_shape, avoid=(stamp_mask,))
+        cv2.bitwise_or(stamp_mask, cv2.inRange(hsv, lower_red2, upper_red2, dst=mask), dst=stamp_mask)
         
         # Define range for blue stamps
         lower_blue = np.array([100, 50, 50])
         upper_blue = np.array([130, 255, 255])
-        blue_mask = cv2.inRange(hsv, lower_blue, upper_blue)
         
         # Combine masks
-        stamp_mask = cv2.bitwise_or(red_mask, blue_mask)
+        cv2.bitwise_or(stamp_mask, cv2.inRange(hsv, lower_blue, upper_blue, dst=mask), dst=stamp_mask)
         
-        # Inpaint to remove stamps
-        result = cv2.inpaint(image, stamp_mask, 3, cv2.INPAINT_TELEA)
+        if not cv2.countNonZero(stamp_mask):
+            return image  # Nothing to inpaint
         
-        return result
+        # Inpaint to remove stamps
+        return cv2.inpaint(image, stamp_mask, 3, cv2.INPAINT_TELEA, dst=pool.like(image, hsv))
     
-    def detect_text_regions(self, image: np.ndarray) -> list:
-        """Detect text regions using MSER or contours"""
-        # Create MSER detector
-        mser = cv2.MSER_create()
+    def detect_text_regions(self, image: np.ndarray, max_side: Optional[int] = None) -> list:
+        """Detect text regions using MSER or contours
+        
+        With ``max_side`` the detector runs on a copy downscaled to at most that many
+        pixels on its long side and the boxes are scaled back to ``image``.
+        """
+        h, w = image.shape[:2]
+        scale = min(1.0, max_side / max(h, w)) if max_side else 1.0
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        
+        # Create MSER detector. The default max_variation (0.25) rejects most glyphs
+        # on noisy scans, whose edges keep growing as the threshold rises.
+        mser = cv2.MSER_create(max_variation=0.5)
         
         # Detect regions
         regions, _ = mser.detectRegions(image)
@@ -127,6 +342,55 @@ class ImagePreprocessor:
         bboxes = []
         for region in regions:
             x, y, w, h = cv2.boundingRect(region.reshape(-1, 1, 2))
-            bboxes.append((x, y, w, h))
+            bboxes.append((int(x / scale), int(y / scale), int(np.ceil(w / scale)), int(np.ceil(h / scale))))
         
-        return bboxes
\ No newline at end of file
+        return bboxes
+    
+    def merge_text_regions(self, regions: Sequence[BoundingBox], shape: Tuple[int, ...],
+                           max_side: int = 1024) -> List[BoundingBox]:
+        """Merge character-level MSER boxes into text blocks, returned in reading order
+        
+        Boxes far taller than a text line (stamps, seals, frames, photos) and long thin
+        boxes (ruled lines) are dropped. The remaining boxes are painted on a mask at
+        most ``max_side`` pixels on its long side and dilated by a fraction of the
+        typical character height, so characters join into words and lines while
+        blank margins and the gaps between form fields stay out of every block.
+        """
+        h, w = shape[:2]
+        max_char_height = max(8, h // 25)
+        chars = [
+            (x, y, bw, bh) for x, y, bw, bh in regions
+            if 2 <= bh <= max_char_height and bw <= 3 * max_char_height and bw <= 15 * bh
+        ]
+        if not chars:
+            return []
+        
+        scale = min(1.0, max_side / max(h, w))
+        mask = np.zeros((max(1, int(h * scale)), max(1, int(w * scale))), dtype=np.uint8)
+        for x, y, bw, bh in chars:
+            cv2.rectangle(mask, (int(x * scale), int(y * scale)),
+                          (int((x + bw) * scale), int((y + bh) * scale)), 255, -1)
+        
+        char_height = float(np.median([bh for _, _, _, bh in chars])) * scale
+        kernel = cv2.getStructuringElement(
+            cv2.MORPH_RECT, (max(1, int(round(char_height * 4))), max(1, int(round(char_height * 0.5))))
+        )
+        mask = cv2.dilate(mask, kernel)
+        
+        count, _, stats, _ = cv2.connectedComponentsWithStats(mask, connectivity=8)
+        pad = max(2, int(char_height / scale * 0.5))
+        blocks = []
+        for x, y, bw, bh, _ in stats[1:count]:
+            if bh * bw < (char_height ** 2):
+                continue  # Isolated speck
+            x0 = max(0, int(x / scale) - pad)
+            y0 = max(0, int(y / scale) - pad)
+            x1 = min(w, int((x + bw) / scale) + pad)
+            y1 = min(h, int((y + bh) / scale) + pad)
+            blocks.append((x0, y0, x1 - x0, y1 - y0))
+        
+        return reading_order(blocks)
+    
+    def _detect_text_regions_stage(self, image: np.ndarray, pool: BufferPool, result: PreprocessResult) -> np.ndarray:
+        result.text_regions = self.detect_text_regions(image, settings.roi_max_side)
+        return image
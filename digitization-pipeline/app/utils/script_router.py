@@ -0,0 +1,161 @@
+import logging
+import threading
+from collections import Counter
+from typing import Dict, FrozenSet, List, Optional, Tuple
+
+import cv2
+import numpy as np
+import pytesseract
+
+logger = logging.getLogger(__name__)
+
+# Script names reported by Tesseract OSD -> smallest language pack that reads it.
+# Indic forms carry English labels and numerals, so eng rides along. Latin is
+# left out on purpose: OSD reports only the dominant script, and bilingual forms
+# whose English labels dominate still carry Devanagari names, so Latin pages
+# keep the default pack.
+SCRIPT_LANGUAGES: Dict[str, str] = {
+    "Devanagari": "hin+eng",
+    "Telugu": "tel+eng",
+    "Bengali": "ben+eng",
+    "Oriya": "ori+eng",
+}
+
+# Unicode blocks used to classify text that never went through OCR (PDF text layers)
+UNICODE_SCRIPTS: List[Tuple[str, int, int]] = [
+    ("Devanagari", 0x0900, 0x097F),
+    ("Bengali", 0x0980, 0x09FF),
+    ("Oriya", 0x0B00, 0x0B7F),
+    ("Telugu", 0x0C00, 0x0C7F),
+]
+
+# Tesseract language codes -> ISO 639-1, as stored in DocumentMetadata.languages
+ISO_639_1: Dict[str, str] = {"eng": "en", "hin": "hi", "tel": "te", "ben": "bn", "ori": "or"}
+
+
+def script_of_text(text: str) -> Optional[str]:
+    """Dominant script of already extracted text, by Unicode block"""
+    counts: Counter = Counter()
+    for ch in text:
+        code = ord(ch)
+        if code < 128:
+            if ch.isalpha():
+                counts["Latin"] += 1
+            continue
+        for script, start, end in UNICODE_SCRIPTS:
+            if start <= code <= end:
+                counts[script] += 1
+                break
+    if not counts:
+        return None
+    # Latin labels are on every form; any real share of an Indic script wins
+    indic = [(n, script) for script, n in counts.items() if script != "Latin"]
+    if indic and max(indic)[0] >= 0.1 * sum(counts.values()):
+        return max(indic)[1]
+    return counts.most_common(1)[0][0]
+
+
+def merge_language_packs(packs: List[str]) -> str:
+    """Union of several ``a+b`` packs, keeping first-seen order"""
+    return "+".join(dict.fromkeys(code for pack in packs for code in pack.split("+") if code))
+
+
+def iso_languages(pack: str) -> List[str]:
+    return [ISO_639_1.get(code, code) for code in pack.split("+") if code]
+
+
+def tesseract_config(oem: int, psm: int, extra: str = "") -> str:
+    return f"--oem {oem} --psm {psm}{' ' + extra if extra else ''}"
+
+
+class ScriptRouter:
+    """Per-page choice of the smallest Tesseract language pack
+
+    A Tesseract OSD pass (``--psm 0``) on a thumbnail of the page reports its
+    dominant script, which maps to a one- or two-language pack instead of the
+    full multi-language default. Each extra language loaded makes recognition
+    slower, so single-script pages OCR considerably faster. Latin pages, and
+    pages where OSD fails or is unsure, use the default pack. When no supported
+    and installed pack adds a language to the default, OSD is skipped.
+
+    The installed language list is queried once per process and the chosen
+    packs are memoised.
+    """
+
+    def __init__(self, default_lang: str, supported: str, max_side: int = 1200, min_confidence: float = 1.0,
+                 script_languages: Optional[Dict[str, str]] = None):
+        self.default_lang = default_lang
+        self.supported = frozenset(supported.split("+"))
+        self.max_side = max_side
+        self.min_confidence = min_confidence
+        self.script_languages = script_languages or SCRIPT_LANGUAGES
+        self._installed: Optional[FrozenSet[str]] = None
+        self._packs: Dict[str, str] = {}
+        self._narrows: Optional[bool] = None
+        self._lock = threading.Lock()
+
+    @property
+    def installed(self) -> FrozenSet[str]:
+        if self._installed is None:
+            with self._lock:
+                if self._installed is None:
+                    try:
+                        self._installed = frozenset(pytesseract.get_languages(config=""))
+                    except Exception as e:
+                        logger.warning(f"Could not list Tesseract languages: {str(e)}")
+                        self._installed = frozenset(self.default_lang.split("+"))
+        return self._installed
+
+    @property
+    def narrows(self) -> bool:
+        """Whether a supported, installed pack outside the default exists, i.e. whether OSD can pay off
+
+        With only eng and hin available, Latin and Devanagari pages end up on
+        the default languages anyway, so an OSD pass per page would be wasted.
+        """
+        if self._narrows is None:
+            default = set(self.default_lang.split("+"))
+            self._narrows = any(
+                set(self.language_for_script(script).split("+")) - default for script in self.script_languages
+            )
+        return self._narrows
+
+    def language_for_script(self, script: Optional[str]) -> str:
+        """Language pack for a script, restricted to supported and installed languages"""
+        if script not in self.script_languages:
+            return self.default_lang
+        if script not in self._packs:
+            codes = [
+                code for code in self.script_languages[script].split("+")
+                if code in self.supported and code in self.installed
+            ]
+            self._packs[script] = "+".join(codes) or self.default_lang
+        return self._packs[script]
+
+    def detect_script(self, image: np.ndarray) -> Tuple[Optional[str], float]:
+        """Dominant script and OSD confidence from a downscaled copy of the page"""
+        h, w = image.shape[:2]
+        scale = self.max_side / max(h, w)
+        if scale < 1.0:
+            image = cv2.resize(image, None, fx=scale, fy=scale, interpolation=cv2.INTER_AREA)
+        try:
+            osd = pytesseract.image_to_osd(
+                image, config=tesseract_config(3, 0, "-c min_characters_to_try=10"),
+                output_type=pytesseract.Output.DICT
+            )
+            return osd.get("script"), float(osd.get("script_conf", 0.0))
+        except Exception as e:
+            # Too little text on the page, or osd.traineddata is not installed
+            logger.debug(f"Script detection failed: {str(e)}")
+            return None, 0.0
+
+    def route(self, image: np.ndarray) -> str:
+        if not self.narrows:
+            return self.default_lang
+        script, confidence = self.detect_script(image)
+        if confidence < self.min_confidence:
+            return self.default_lang
+        return self.language_for_script(script)
+
+    def route_text(self, text: str) -> str:
+        return self.language_for_script(script_of_text(text))
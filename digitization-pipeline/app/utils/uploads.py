@@ -0,0 +1,65 @@
+import asyncio
+import hashlib
+import os
+from dataclasses import dataclass
+from typing import BinaryIO, Optional
+
+from ..config import settings
+
+
+class UploadTooLarge(ValueError):
+    """The upload is bigger than ``max_file_size``; nothing is left on disk"""
+
+
+@dataclass
+class SpooledUpload:
+    path: str
+    size: int
+    digest: str  # SHA-256 of the content, the same value as result_cache.file_digest
+
+
+def spool_stream(source: BinaryIO, path: str, max_bytes: int, chunk_size: int) -> SpooledUpload:
+    """Copy a file object to ``path`` chunk by chunk, hashing as it goes
+
+    At most one chunk is held in memory. The copy stops as soon as it passes
+    ``max_bytes`` and the partial file is removed.
+    """
+    digest = hashlib.sha256()
+    size = 0
+    try:
+        with open(path, "wb") as f:
+            for chunk in iter(lambda: source.read(chunk_size), b""):
+                size += len(chunk)
+                if size > max_bytes:
+                    raise UploadTooLarge(f"File exceeds the {max_bytes} byte limit")
+                digest.update(chunk)
+                f.write(chunk)
+    except BaseException:
+        try:
+            os.remove(path)
+        except FileNotFoundError:
+            pass
+        raise
+    return SpooledUpload(path=path, size=size, digest=digest.hexdigest())
+
+
+async def spool_upload(upload, document_id: str, directory: Optional[str] = None,
+                       max_bytes: Optional[int] = None, chunk_size: Optional[int] = None) -> SpooledUpload:
+    """Spool a FastAPI ``UploadFile`` to ``<directory>/<document_id>_<filename>``
+
+    The size the multipart parser already knows is checked before anything is
+    written; the copy itself runs in a thread so the event loop keeps serving
+    other uploads.
+    """
+    directory = directory or settings.upload_dir
+    max_bytes = max_bytes or settings.max_file_size
+    if getattr(upload, "size", None) is not None and upload.size > max_bytes:
+        raise UploadTooLarge(f"File exceeds the {max_bytes} byte limit")
+
+    os.makedirs(directory, exist_ok=True)
+    path = os.path.join(directory, f"{document_id}_{os.path.basename(upload.filename)}")
+    await upload.seek(0)
+    return await asyncio.to_thread(
+        spool_stream, upload.file, path, max_bytes, chunk_size or settings.upload_chunk_size
+    )
+
@@ -0,0 +1,103 @@
+import asyncio
+import logging
+import os
+import socket
+from typing import Any, Dict, Optional
+
+from .config import settings
+from .services.job_queue import JobQueue, create_job_queue
+from .services.metrics import metrics, register_service_metrics
+from .services.processor import DocumentProcessor
+
+logger = logging.getLogger(__name__)
+
+
+class QueueWorker:
+    """Pulls document jobs from the durable queue and runs them through the pipeline
+
+    Start one or more with ``python -m app.worker``; every worker leases its own
+    batch of ``settings.batch_size`` jobs, so a large ingest spreads across them.
+    """
+
+    def __init__(self, processor: Optional[DocumentProcessor] = None, queue: Optional[JobQueue] = None,
+                 batch_size: Optional[int] = None):
+        self.processor = processor or DocumentProcessor()
+        self.queue = queue or create_job_queue()
+        self.batch_size = batch_size or settings.batch_size
+        self.worker_id = f"{socket.gethostname()}:{os.getpid()}"
+        self._running = False
+
+    async def process_job(self, job: Dict[str, Any]) -> bool:
+        """Process one job; True means it succeeded and can be acked once its writes are flushed"""
+        payload = job["payload"]
+        document_id = payload["document_id"]
+        try:
+            content_key = None
+            if self.processor.result_cache and payload.get("content_digest"):
+                # Hashed by the upload spooler; no need to read the file again
+                profile = self.processor.preprocessor.profile_for(payload.get("document_type"))
+                content_key = await self.processor.cache_key_for(payload["file_path"], profile,
+                                                                 digest=payload["content_digest"])
+            await self.processor.process_document(
+                document_id, payload["file_path"], payload.get("state"), payload.get("district"),
+                raise_errors=True, content_key=content_key, document_type=payload.get("document_type")
+            )
+            return True
+        except Exception as e:
+            dead = self.queue.fail(job["id"], str(e))
+            if dead:
+                logger.error(f"Job {job['id']} for document {document_id} moved to dead-letter list")
+            else:
+                logger.warning(f"Job {job['id']} for document {document_id} failed (attempt {job['attempts']}), retrying")
+            await self.processor.db_service.update_status(document_id, "failed" if dead else "queued", str(e))
+            return False
+
+    async def run(self):
+        self._running = True
+        logger.info(f"Worker {self.worker_id} started (batch size {self.batch_size})")
+        while self._running:
+            jobs = self.queue.dequeue_batch(self.batch_size, self.worker_id)
+            if not jobs:
+                await asyncio.sleep(settings.job_poll_interval)
+                continue
+            succeeded = await asyncio.gather(*(self.process_job(job) for job in jobs))
+            
+            # Ack only once the batch's buffered database writes are durable; unacked
+            # jobs are picked up again when their lease expires
+            try:
+                await self.processor.db_service.flush()
+            except Exception as e:
+                logger.error(f"Could not write results for {len(jobs)} jobs, leaving them to be retried: {str(e)}")
+                continue
+            for job, ok in zip(jobs, succeeded):
+                if ok:
+                    self.queue.ack(job["id"])
+
+    def stop(self):
+        self._running = False
+
+
+def main():
+    logging.basicConfig(level=settings.log_level)
+    worker = QueueWorker()
+    if settings.metrics_port:
+        register_service_metrics(worker.processor, worker.queue)
+        metrics.serve(settings.metrics_port)
+    
+    async def serve():
+        # Close the database on the loop its pooled connections were opened on
+        try:
+            await worker.run()
+        finally:
+            await worker.processor.db_service.close()
+    
+    try:
+        asyncio.run(serve())
+    except KeyboardInterrupt:
+        pass
+    finally:
+        worker.processor.worker_pool.shutdown()
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,76 @@
+"""
+Benchmark: per-document commits vs. write-behind bulk upserts in DatabaseService
+
+Replays the writes a batch makes (queued, processing, the extracted record and
+completed, per document) against a SQLite file, first with a commit per call
+and then through the write-behind buffer, and reports documents and rows per
+second. Pass ``--database-url`` to run against PostgreSQL instead.
+
+    python benchmarks/bench_db_writes.py --documents 5000
+"""
+import argparse
+import asyncio
+import os
+import sys
+import tempfile
+import time
+import uuid
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.models.schemas import DocumentMetadata  # noqa: E402
+from app.services.database import DatabaseService  # noqa: E402
+
+
+def make_metadata(document_id: str) -> DocumentMetadata:
+    return DocumentMetadata(
+        document_id=document_id,
+        source_file=f"/tmp/uploads/{document_id}.pdf",
+        state="Odisha",
+        district="Nayagarh",
+        village="Rampur",
+        patta_holder=["Ramesh Soren"],
+        area_hectares=2.5,
+        plot_number="123/A",
+        ocr_confidence=0.91,
+        ner_confidence=0.8,
+        languages=["or", "en"],
+        raw_ocr_text="Village: Rampur\nDistrict: Nayagarh\n" * 20,
+        extracted_fields={"village": "Rampur", "district": "Nayagarh"},
+    )
+
+
+async def replay(db: DatabaseService, documents: int):
+    for _ in range(documents):
+        document_id = str(uuid.uuid4())
+        await db.update_status(document_id, "queued")
+        await db.update_status(document_id, "processing")
+        await db.save_document(make_metadata(document_id))
+        await db.update_status(document_id, "completed")
+    await db.flush()
+
+
+def run(database_url: str, documents: int, write_behind: bool) -> float:
+    db = DatabaseService(database_url, write_behind=write_behind)
+    start = time.perf_counter()
+    asyncio.run(replay(db, documents))
+    return time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--documents", type=int, default=2000)
+    parser.add_argument("--database-url")
+    args = parser.parse_args()
+
+    # Each document ends up as one fra_records row and one processing_jobs row
+    rows = 2 * args.documents
+    with tempfile.TemporaryDirectory() as tmp:
+        for name, write_behind in (("commit per call", False), ("write-behind", True)):
+            url = args.database_url or f"sqlite:///{os.path.join(tmp, name.replace(' ', '_'))}.db"
+            elapsed = run(url, args.documents, write_behind)
+            print(f"{name:<16} {elapsed:8.2f} s  {args.documents / elapsed:10.0f} docs/s  {rows / elapsed:10.0f} rows/s")
+
+
+if __name__ == "__main__":
+    main()
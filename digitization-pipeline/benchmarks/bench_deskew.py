@@ -0,0 +1,93 @@
+"""
+Benchmark: fast (downscaled) vs. full-resolution deskew in ImagePreprocessor
+
+Builds a synthetic corpus of text pages rotated by known angles and reports,
+per method, the mean time per page, the peak memory allocated while deskewing
+one page (tracemalloc, which sees numpy/OpenCV output arrays) and the mean
+residual skew: the known rotation of each page minus the correction the method
+actually applied.
+
+    python benchmarks/bench_deskew.py --pages 8 --width 2480 --height 3508
+    python benchmarks/bench_deskew.py --width 7016 --height 9921   # A3 at 600 DPI
+"""
+import argparse
+import os
+import random
+import sys
+import time
+import tracemalloc
+
+import cv2
+import numpy as np
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.preprocessing import ImagePreprocessor  # noqa: E402
+
+
+def make_page(width: int, height: int, angle: float, rng: random.Random) -> np.ndarray:
+    """White page with dark text lines, rotated by ``angle`` degrees"""
+    page = np.full((height, width), 255, dtype=np.uint8)
+    margin = width // 10
+    scale = width / 1200
+    line_height = int(40 * scale)
+    for y in range(margin, height - margin, line_height):
+        words = " ".join(rng.choice(["forest", "rights", "claim", "village", "patta", "1234"]) for _ in range(8))
+        cv2.putText(page, words, (margin, y), cv2.FONT_HERSHEY_SIMPLEX, scale, 0, max(1, int(2 * scale)))
+    M = cv2.getRotationMatrix2D((width // 2, height // 2), angle, 1.0)
+    return cv2.warpAffine(page, M, (width, height), flags=cv2.INTER_LINEAR, borderValue=255)
+
+
+def applied_rotation(preprocessor: ImagePreprocessor, page: np.ndarray) -> float:
+    """Angle the method's deskew rotates ``page`` by (0 below the rotation threshold)"""
+    if preprocessor.deskew_mode == "fast":
+        angle = preprocessor.estimate_skew_fast(page)
+    else:
+        angle = preprocessor.estimate_skew_full(page)
+    return angle if abs(angle) > 0.5 else 0.0
+
+
+def measure(fn, page: np.ndarray):
+    tracemalloc.start()
+    start = time.perf_counter()
+    result = fn(page)
+    elapsed = time.perf_counter() - start
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    return result, elapsed, peak
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--pages", type=int, default=8)
+    parser.add_argument("--width", type=int, default=2480)
+    parser.add_argument("--height", type=int, default=3508)
+    parser.add_argument("--max-side", type=int, default=1024)
+    parser.add_argument("--max-angle", type=float, default=8.0)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    angles = [rng.uniform(-args.max_angle, args.max_angle) for _ in range(args.pages)]
+    corpus = [make_page(args.width, args.height, angle, rng) for angle in angles]
+
+    methods = {
+        "full": ImagePreprocessor(deskew_mode="full"),
+        "fast": ImagePreprocessor(deskew_mode="fast", deskew_max_side=args.max_side),
+    }
+
+    print(f"{args.pages} pages of {args.width}x{args.height}, skew in +/-{args.max_angle} degrees")
+    print(f"{'method':<6} {'ms/page':>10} {'peak MiB':>10} {'residual skew':>15}")
+    print(f"{'input':<6} {'':>10} {'':>10} {np.mean(np.abs(angles)):14.2f}°")
+    for name, preprocessor in methods.items():
+        times, peaks, residuals = [], [], []
+        for angle, page in zip(angles, corpus):
+            _, elapsed, peak = measure(preprocessor.deskew, page)
+            times.append(elapsed)
+            peaks.append(peak)
+            # Pages were rotated by +angle, so a perfect correction rotates by -angle
+            residuals.append(abs(angle + applied_rotation(preprocessor, page)))
+        print(f"{name:<6} {np.mean(times) * 1000:10.1f} {max(peaks) / 2 ** 20:10.1f} {np.mean(residuals):14.2f}°")
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,91 @@
+"""
+Benchmark: per-row WKT conversion vs. the vectorised geometry codec
+
+Generates parcel polygons around Indian village centroids and times both
+directions of the database round trip:
+
+  encode  GeoJSON -> stored value (old: shapely.geometry.shape(...).wkt per row;
+          new: encode_geometries, EWKB for the whole column)
+  decode  stored value -> GeoJSON mapping (old: shapely.wkt.loads + mapping per
+          row; new: to_geojson over the whole column)
+  export  stored value -> GeoJSON text, as written by streaming exports (old:
+          json.dumps of the per-row mapping; new: geojson_strings)
+
+    python benchmarks/bench_geometry_codec.py --parcels 100000
+"""
+import argparse
+import json
+import math
+import os
+import random
+import sys
+import time
+
+sys.path.insert(0, os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from app.utils.geometry_codec import encode_geometries, geojson_strings, to_geojson  # noqa: E402
+
+
+def make_parcel(rng: random.Random) -> dict:
+    """Irregular 5-12 vertex polygon of roughly 0.5-5 ha"""
+    lon, lat = rng.uniform(75.0, 88.0), rng.uniform(17.0, 25.0)
+    vertices = rng.randint(5, 12)
+    radius = rng.uniform(0.0004, 0.0012)  # degrees, ~40-130 m
+    ring = []
+    for k in range(vertices):
+        angle = 2 * math.pi * k / vertices
+        r = radius * rng.uniform(0.7, 1.0)
+        ring.append([round(lon + r * math.cos(angle), 7), round(lat + r * math.sin(angle), 7)])
+    ring.append(ring[0])
+    return {"type": "Polygon", "coordinates": [ring]}
+
+
+def per_row_encode(geojsons):
+    from shapely.geometry import shape
+    return [shape(g).wkt for g in geojsons]
+
+
+def per_row_decode(values):
+    from shapely.geometry import mapping
+    from shapely.wkt import loads
+    return [mapping(loads(str(v))) for v in values]
+
+
+def per_row_export(values):
+    return [json.dumps(geojson) for geojson in per_row_decode(values)]
+
+
+def timed(fn, *args):
+    start = time.perf_counter()
+    result = fn(*args)
+    return result, time.perf_counter() - start
+
+
+def main():
+    parser = argparse.ArgumentParser(description=__doc__, formatter_class=argparse.RawDescriptionHelpFormatter)
+    parser.add_argument("--parcels", type=int, default=100000)
+    args = parser.parse_args()
+
+    rng = random.Random(42)
+    parcels = [make_parcel(rng) for _ in range(args.parcels)]
+
+    wkt, old_encode = timed(per_row_encode, parcels)
+    ewkb, new_encode = timed(encode_geometries, parcels)
+    _, old_decode = timed(per_row_decode, wkt)
+    decoded, new_decode = timed(to_geojson, ewkb)
+    _, old_export = timed(per_row_export, wkt)
+    _, new_export = timed(geojson_strings, ewkb)
+
+    # Same vertices after the round trip
+    assert all(d["coordinates"][0][i] == list(p["coordinates"][0][i])
+               for d, p in zip(decoded[:100], parcels[:100]) for i in range(len(p["coordinates"][0])))
+
+    print(f"{args.parcels} parcels")
+    print(f"{'':<8} {'per-row WKT':>12} {'vectorised':>12} {'speedup':>8}")
+    for name, old, new in (("encode", old_encode, new_encode), ("decode", old_decode, new_decode),
+                           ("export", old_export, new_export)):
+        print(f"{name:<8} {old:11.2f}s {new:11.2f}s {old / new:7.1f}x")
+
+
+if __name__ == "__main__":
+    main()
@@ -2,11 +2,18 @@ from fastapi import FastAPI, File, UploadFile
 from fastapi.middleware.cors import CORSMiddleware
 from datetime import datetime
 import pytesseract
-from PIL import Image
-import io
-import re
-import spacy
-import fitz  # PyMuPDF
+import asyncio
+import os
+from typing import List
+
+from app.utils.field_extractor import FieldExtractor, FieldPattern
+from app.utils.image_io import decode_image
+from app.utils.nlp_models import registry as nlp_registry
+from app.utils.pdf_pages import ocr_pdf_pages
+
+PDF_DPI = int(os.getenv("PDF_DPI", "300"))
+SPACY_MODEL = os.getenv("SPACY_MODEL", "en_core_web_sm")
+NER_BATCH_SIZE = int(os.getenv("NER_BATCH_SIZE", "32"))
 
 app = FastAPI(title="FRA Digitization Pipeline")
 
@@ -26,6 +33,14 @@ async def root():
 async def health():
     return {"status": "healthy", "timestamp": str(datetime.utcnow())}
 
+async def extract_text(filename: str, content: bytes) -> str:
+    if filename.lower().endswith('.pdf'):
+        # Use the text layer where present, OCR scanned pages in parallel
+        return await asyncio.to_thread(extract_pdf_text, content)
+    # Decode the uploaded bytes once, straight to grayscale, and OCR the array
+    image = decode_image(content, grayscale=True)
+    return pytesseract.image_to_string(image)
+
 @app.post("/upload")
 async def upload_document(file: UploadFile = File(...)):
     try:
@@ -33,17 +48,7 @@ async def upload_document(file: UploadFile = File(...)):
         content = await file.read()
         
         # Check file type and extract text
-        if file.filename.lower().endswith('.pdf'):
-            # Extract text from PDF
-            pdf_doc = fitz.open(stream=content, filetype="pdf")
-            text = ""
-            for page in pdf_doc:
-                text += page.get_text()
-            pdf_doc.close()
-        else:
-            # Process image with OCR
-            image = Image.open(io.BytesIO(content))
-            text = pytesseract.image_to_string(image)
+        text = await extract_text(file.filename, content)
         
         # Extract FRA information using NER + regex
         fraInfo = extract_fra_entities(text)
@@ -63,55 +68,82 @@ async def upload_document(file: UploadFile = File(...)):
             "message": f"Processing failed: {str(e)}"
         }
 
-def extract_name(text):
-    patterns = [r'Name[:\s]*([A-Za-z\s]+)', r'Applicant[:\s]*([A-Za-z\s]+)']
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return "Unknown"
-
-def extract_village(text):
-    patterns = [r'Village[:\s]*([A-Za-z\s]+)', r'Gram[:\s]*([A-Za-z\s]+)']
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return "Unknown"
-
-def extract_district(text):
-    match = re.search(r'District[:\s]*([A-Za-z\s]+)', text, re.IGNORECASE)
-    return match.group(1).strip() if match else "Unknown"
-
-def extract_state(text):
-    match = re.search(r'State[:\s]*([A-Za-z\s]+)', text, re.IGNORECASE)
-    return match.group(1).strip() if match else "Unknown"
+@app.post("/upload-batch")
+async def upload_batch(files: List[UploadFile] = File(...)):
+    """OCR several documents, then run NER over all of them in one batched spaCy pass"""
+    # Errors are keyed by position: files from different folders can share a name
+    texts, errors = [], {}
+    for index, file in enumerate(files):
+        try:
+            texts.append(await extract_text(file.filename, await file.read()))
+        except Exception as e:
+            texts.append("")
+            errors[index] = str(e)
+    
+    docs = await asyncio.to_thread(
+        lambda: list(nlp_registry.pipe(texts, SPACY_MODEL, batch_size=NER_BATCH_SIZE))
+    )
+    
+    results = []
+    for index, (file, text, doc) in enumerate(zip(files, texts, docs)):
+        if index in errors:
+            results.append({
+                "filename": file.filename,
+                "success": False,
+                "status": "error",
+                "message": f"Processing failed: {errors[index]}"
+            })
+            continue
+        results.append({
+            "filename": file.filename,
+            "success": True,
+            "status": "completed",
+            "confidence": 0.85,
+            "text": text,
+            "fraInfo": extract_fra_entities(text, doc)
+        })
+    
+    return {"success": True, "count": len(results), "results": results}
 
-def extract_area(text):
-    patterns = [r'Area[:\s]*([0-9\.]+\s*[A-Za-z]+)', r'([0-9\.]+\s*hectare)', r'([0-9\.]+\s*acre)']
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return "Unknown"
+def extract_pdf_text(content: bytes) -> str:
+    return "\n".join(
+        page_text for _, page_text in ocr_pdf_pages(content, pytesseract.image_to_string, dpi=PDF_DPI)
+    )
 
-def extract_claim_number(text):
-    match = re.search(r'(IFR|CFR|CR)[/\-\s]*[0-9]+', text, re.IGNORECASE)
-    return match.group(0) if match else "Unknown"
+# Regex fallbacks for every field, compiled once; each pattern stops at its first match.
+# Patterns sharing a key are alternatives; the first one that matches wins.
+SLIM_FIELD_EXTRACTOR = FieldExtractor([
+    FieldPattern("applicantName", r'Name[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("applicantName", r'Applicant[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("village", r'Village[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("village", r'Gram[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("district", r'District[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("state", r'State[:\s]*([A-Za-z\s]+)'),
+    FieldPattern("area", r'Area[:\s]*([0-9\.]+\s*[A-Za-z]+)'),
+    FieldPattern("area", r'([0-9\.]+\s*hectare)'),
+    FieldPattern("area", r'([0-9\.]+\s*acre)'),
+    FieldPattern("claimNumber", r'(IFR|CFR|CR)[/\-\s]*[0-9]+', group=0),
+    FieldPattern("pattaNumber", r'Patta[:\s]*([A-Za-z0-9/\-]+)'),
+    FieldPattern("pattaNumber", r'Plot[:\s]*([A-Za-z0-9/\-]+)'),
+])
 
-def extract_patta_number(text):
-    patterns = [r'Patta[:\s]*([A-Za-z0-9/\-]+)', r'Plot[:\s]*([A-Za-z0-9/\-]+)']
-    for pattern in patterns:
-        match = re.search(pattern, text, re.IGNORECASE)
-        if match:
-            return match.group(1).strip()
-    return "Unknown"
+def extract_regex_fields(text):
+    """Every regex field, "Unknown" where nothing matched"""
+    matches = SLIM_FIELD_EXTRACTOR.extract(text)
+    return {
+        name: matches[name].value.strip() if name in matches else "Unknown"
+        for name in SLIM_FIELD_EXTRACTOR.names
+    }
 
-def extract_fra_entities(text):
+def extract_fra_entities(text, doc=None):
+    fields = extract_regex_fields(text)
     try:
-        # Load spaCy model (fallback to regex if not available)
-        nlp = spacy.load("en_core_web_sm")
-        doc = nlp(text)
+        # Shared spaCy model, loaded once per process (fallback to regex if not available)
+        if doc is None:
+            nlp = nlp_registry.get(SPACY_MODEL)
+            doc = nlp(text) if nlp else None
+        if doc is None:
+            raise ValueError("spaCy model unavailable")
         
         entities = {
             "applicantName": None,
@@ -136,32 +168,19 @@ def extract_fra_entities(text):
                     entities["state"] = ent.text
         
         # Fallback to regex for missing entities
-        if not entities["applicantName"]:
-            entities["applicantName"] = extract_name(text)
-        if not entities["village"]:
-            entities["village"] = extract_village(text)
-        if not entities["district"]:
-            entities["district"] = extract_district(text)
-        if not entities["state"]:
-            entities["state"] = extract_state(text)
+        for key in ("applicantName", "village", "district", "state"):
+            if not entities[key]:
+                entities[key] = fields[key]
         
-        entities["area"] = extract_area(text)
-        entities["claimNumber"] = extract_claim_number(text)
-        entities["pattaNumber"] = extract_patta_number(text)
+        entities["area"] = fields["area"]
+        entities["claimNumber"] = fields["claimNumber"]
+        entities["pattaNumber"] = fields["pattaNumber"]
         
         return entities
         
     except:
         # Fallback to regex-only extraction
-        return {
-            "applicantName": extract_name(text),
-            "village": extract_village(text),
-            "district": extract_district(text),
-            "state": extract_state(text),
-            "area": extract_area(text),
-            "claimNumber": extract_claim_number(text),
-            "pattaNumber": extract_patta_number(text)
-        }
+        return fields
 
 if __name__ == "__main__":
     import uvicorn